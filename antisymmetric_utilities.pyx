@@ -81,6 +81,32 @@ cpdef diagonal_antisort(exponents, int n, int r, tuple positions_list):
                     continue
     return ETuple(_exponents), sign
     
+cdef inline int _diagonal_cmp(list exponents, int n, int r, int j1, int j2):
+    """
+    Inlined version of :func:`utilities.diagonal_cmp`.
+    """
+    cdef int i
+    for i in range(r):
+        a = exponents[i*n+j1]
+        b = exponents[i*n+j2]
+        if a != b:
+            return 1 if a > b else -1
+    return 0
+
+cdef inline bint _is_diagonal_antisorted(list exponents, int n, int r, tuple positions_list):
+    """
+    Inlined version of :func:`is_diagonal_antisorted`.
+
+    Checking consecutive positions is enough since the order is transitive.
+    """
+    cdef int i
+    cdef tuple positions
+    for positions in positions_list:
+        for i in range(1, len(positions)):
+            if _diagonal_cmp(exponents, n, r, positions[i-1], positions[i]) < 0:
+                return False
+    return True
+
 cpdef is_diagonal_antisorted(exponents, int n, int r, tuple positions_list):
     """
     Return True if the columns are decreasingly sorted according to positions.
@@ -102,18 +128,7 @@ cpdef is_diagonal_antisorted(exponents, int n, int r, tuple positions_list):
 
 
     """
-    cdef int i, j
-    cdef tuple positions
-    cdef list _exponents = list(exponents)
-    for positions in positions_list:
-        for i in range(1, len(positions)):
-            for j in range(i-1, -1, -1):
-                c = utilities.diagonal_cmp(_exponents, n, r, positions[j], positions[j+1])
-                if c < 0:
-                    return False
-                else:
-                    continue
-    return True
+    return _is_diagonal_antisorted(list(exponents), n, r, positions_list)
 
 def antisymmetric_normal(p, int n, int r, tuple positions):
     """
@@ -182,8 +197,19 @@ def antisymmetric_normal(p, int n, int r, tuple positions):
             d[exponent] += sign*c
     return R(d)
 
+cdef dict _reduce_antisymmetric_normal_dict(p, int n, int r, tuple positions):
+    """
+    Return the dictionary ``{exponent: coefficient}`` of the antisymmetric
+    normal terms of `p`.
+    """
+    cdef dict d = {}
+    cdef ETuple exponent
+    for exponent, c in utilities.items_of_vector(p):
+        if _is_diagonal_antisorted(list(exponent), n, r, positions):
+            d[exponent] = c
+    return d
+
 def reduce_antisymmetric_normal(p, int n, int r, tuple positions):
-    
     """
     Return the terms of `p` which are antisymmetric normal. 
 
@@ -193,6 +219,9 @@ def reduce_antisymmetric_normal(p, int n, int r, tuple positions):
     - ``r``, ``n`` -- nonnegative integers
     - ``positions`` -- a tuple of tuple of positions
 
+    The result is built in one go from the filtered dictionary of
+    terms of `p`, so that the cost is linear in the number of terms.
+
     EXAMPLES::
 
         sage: load("diagonal_polynomial_ring.py")
@@ -204,22 +233,222 @@ def reduce_antisymmetric_normal(p, int n, int r, tuple positions):
         sage: p = -2*x[0,0]^2*x[0,1]*x[1,1]^3*x[1,2]-2*x[0,0]^2*x[0,1]*x[1,1]^3*x[1,2]
         sage: reduce_antisymmetric_normal(p,4,1,((0,1,2,3),))
         -4*x00^2*x01*x11^3*x12
+        sage: reduce_antisymmetric_normal(x[0,1]*x[0,2], 4, 1, ((0,1,2,3),))
+        0
+
+    Benchmark on polynomials with `10^4` to `10^6` terms::
+
+        sage: P = PolynomialRing(QQ, 12, 'x')                                # not tested
+        sage: for k in [4, 5, 6]:                                            # not tested
+        ....:     p = P.random_element(degree=12, terms=10^k)
+        ....:     %timeit reduce_antisymmetric_normal(p, 4, 3, ((0,1,2,3),))
+    """
+    cdef Parent R = p.parent()
+    return R(_reduce_antisymmetric_normal_dict(p, n, r, positions))
 
+def reduce_antisymmetric_normal_list(ps, int n, int r, tuple positions):
     """
-    X = p.parent().gens()
-    res = 0
-    for exposent, c in utilities.items_of_vector(p) :
-        if is_diagonal_antisorted(exposent,n,r,positions) :
-            product = 1
-            for (x,a) in zip(X,exposent) :
-                product = product*(x**a)
-            res += c*product
-    return res
+    Return the list of the antisymmetric normal terms of each polynomial in ``ps``.
+
+    INPUT:
+
+    - ``ps`` -- an iterable of polynomials in the same ring
+    - ``r``, ``n`` -- nonnegative integers
+    - ``positions`` -- a tuple of tuple of positions
+
+    This is the batch version of :func:`reduce_antisymmetric_normal`.
+
+    EXAMPLES::
+
+        sage: load("diagonal_polynomial_ring.py")
+        sage: R = DiagonalPolynomialRing(QQ, 3, 1)
+        sage: x = R.algebra_generators()
+        sage: reduce_antisymmetric_normal_list([x[0,0]^2*x[0,1] - x[0,0]*x[0,1]^2, x[0,2]], 3, 1, ((0,1,2),))
+        [x00^2*x01, 0]
+    """
+    cdef list result = []
+    cdef Parent R = None
+    for p in ps:
+        if R is None:
+            R = p.parent()
+        result.append(R(_reduce_antisymmetric_normal_dict(p, n, r, positions)))
+    return result
+
+cpdef diagonal_sort(exponents, int n, int r, tuple positions_list):
+    """
+    Sort columns decreasingly at the given positions.
+
+    This is the symmetric analogue of :func:`diagonal_antisort`:
+    there is no sign, and equal columns are allowed.
+
+    INPUT:
+
+    - ``exponents `` -- a list, seen as an `r\times n` array
+    - ``r``, ``n`` -- nonnegative integers
+    - ``positions_list`` -- a tuple of tuples of all distinct column indices
+
+    EXAMPLES::
+
+        sage: diagonal_sort([1,2,3,4], 2, 2, ((0,1),))
+        (2, 1, 4, 3)
+        sage: diagonal_sort([2,2,3,4], 2, 2, ((0,1),))
+        (2, 2, 4, 3)
+        sage: diagonal_sort([1,2,3,4,5,6], 6, 1, ((0,2,4),(1,3,5)))
+        (5, 6, 3, 4, 1, 2)
+    """
+    cdef int i, j
+    cdef tuple positions
+    cdef list _exponents = list(exponents)
+    for positions in positions_list:
+        for i in range(1, len(positions)):
+            for j in range(i-1, -1, -1):
+                if _diagonal_cmp(_exponents, n, r, positions[j], positions[j+1]) < 0:
+                    utilities.diagonal_swap(_exponents, n, r, positions[j], positions[j+1])
+                else:
+                    break
+    return ETuple(_exponents)
+
+cdef int _stabilizer_order(list exponents, int n, int r, tuple positions_list):
+    """
+    Return the order of the stabilizer of ``exponents``, assumed to be sorted.
+
+    Equal columns are consecutive in each tuple of positions, so
+    the order is the product of the factorials of the lengths of
+    the runs of equal columns.
+    """
+    cdef int order = 1
+    cdef int i, run
+    cdef tuple positions
+    for positions in positions_list:
+        run = 1
+        for i in range(1, len(positions)):
+            if _diagonal_cmp(exponents, n, r, positions[i-1], positions[i]) == 0:
+                run += 1
+                order *= run
+            else:
+                run = 1
+    return order
+
+def symmetric_normal(p, int n, int r, tuple positions):
+    """
+    Return the `I` symmetric normal form of `s_I(p)`.
+
+    INPUT:
+
+    - `p` -- a polynomial in `r` sets of `n` variables
+    - `r`, `n` -- nonnegative integers
+    - `positions` -- a tuple of tuples of all distinct column indices `(I_i)_i`
+
+    This is the symmetric analogue of :func:`antisymmetric_normal`.
+    Let `W:=\bigtimes_i S(I_i)` act by permutation of the columns, and
+    `s_I` be the symmetrizer w.r.t. `W`. A polynomial `s_I(p)` can be
+    uniquely written in the form `s_I(q)`, where the monomials of `q`
+    have exponent vectors whose columns are decreasingly sorted at
+    the positions of each `I_i`: one exponent per orbit of `W`.
+
+    Note that `s_I(q)` has coefficient `|W_m| q_m` on the monomial `m`,
+    where `W_m` is the stabilizer of `m`; see
+    :func:`reduce_symmetric_normal` for the converse.
+
+    EXAMPLES::
+
+        sage: load("diagonal_polynomial_ring.py")
+        sage: R = DiagonalPolynomialRing(QQ, 3, 2)
+        sage: X = R.algebra_generators()
+        sage: symmetric_normal(X[0,0]*X[1,1] + X[0,1]*X[1,0] + 2*X[0,2], 3, 2, ((0,1),))
+        2*x00*x11 + 2*x02
+        sage: symmetric_normal(X[0,0]^2*X[0,1] - X[0,0]*X[0,1]^2, 3, 2, ((0,1),))
+        0
+    """
+    cdef Parent R = p.parent()
+    cdef dict d = {}
+    cdef ETuple exponent
+    for exponent, c in utilities.items_of_vector(p):
+        exponent = diagonal_sort(exponent, n, r, positions)
+        d[exponent] = d.get(exponent, 0) + c
+    return R(d)
+
+cdef dict _reduce_symmetric_normal_dict(p, int n, int r, tuple positions):
+    """
+    Return the dictionary ``{exponent: coefficient}`` of the symmetric
+    normal form of the symmetric polynomial `p`.
+    """
+    cdef dict d = {}
+    cdef ETuple exponent
+    cdef list l
+    for exponent, c in utilities.items_of_vector(p):
+        l = list(exponent)
+        if _is_diagonal_antisorted(l, n, r, positions):
+            d[exponent] = c / _stabilizer_order(l, n, r, positions)
+    return d
+
+def reduce_symmetric_normal(p, int n, int r, tuple positions):
+    """
+    Return the symmetric normal form `q` of `p`, assumed to be symmetric.
+
+    INPUT:
+
+    - ``p`` -- a polynomial with `s_I(p) = |W| p`
+    - ``r``, ``n`` -- nonnegative integers
+    - ``positions`` -- a tuple of tuple of positions
+
+    This is the symmetric analogue of :func:`reduce_antisymmetric_normal`:
+    only the sorted terms of `p` are kept, each coefficient being divided
+    by the order of the stabilizer of its exponent, so that `s_I(q) = p`.
+
+    EXAMPLES::
+
+        sage: load("diagonal_polynomial_ring.py")
+        sage: R = DiagonalPolynomialRing(QQ, 3, 1)
+        sage: x = R.algebra_generators()
+        sage: p = x[0,0]^2*x[0,1] + x[0,0]*x[0,1]^2 + 2*x[0,0]*x[0,1]
+        sage: reduce_symmetric_normal(p, 3, 1, ((0,1),))
+        x00^2*x01 + x00*x01
+    """
+    cdef Parent R = p.parent()
+    return R(_reduce_symmetric_normal_dict(p, n, r, positions))
+
+def reduce_symmetric_normal_list(ps, int n, int r, tuple positions):
+    """
+    Return the list of the symmetric normal forms of each polynomial in ``ps``.
+
+    This is the batch version of :func:`reduce_symmetric_normal`.
+
+    EXAMPLES::
+
+        sage: load("diagonal_polynomial_ring.py")
+        sage: R = DiagonalPolynomialRing(QQ, 3, 1)
+        sage: x = R.algebra_generators()
+        sage: reduce_symmetric_normal_list([x[0,0] + x[0,1], x[0,2]], 3, 1, ((0,1),))
+        [x00, 1/2*x02]
+    """
+    cdef list result = []
+    cdef Parent R = None
+    for p in ps:
+        if R is None:
+            R = p.parent()
+        result.append(R(_reduce_symmetric_normal_dict(p, n, r, positions)))
+    return result
 
 def antisymmetries_of_tableau(Q):
     if not isinstance(Q,StandardTableau) :
         Q = Partition(Q).initial_tableau()
     return tuple(tuple(i-1 for i in column) for column in Q.conjugate())
+
+def symmetries_of_tableau(Q):
+    """
+    Return the positions of the rows of ``Q``, the analogue of :func:`antisymmetries_of_tableau`.
+
+    EXAMPLES::
+
+        sage: symmetries_of_tableau(Partition([3,2]))
+        ((0, 1, 2), (3, 4))
+        sage: antisymmetries_of_tableau(Partition([3,2]))
+        ((0, 3), (1, 4), (2,))
+    """
+    if not isinstance(Q,StandardTableau) :
+        Q = Partition(Q).initial_tableau()
+    return tuple(tuple(i-1 for i in row) for row in Q)
     
     
 def row_permutation(n, sigma):
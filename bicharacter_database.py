@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+Indexed queries on the stored bicharacters
+
+The characters stored by :func:`harmonic_character_plain` give the
+coefficients `c_{\lambda,\mu}` of the diagonal harmonic bicharacter
+`\sum c_{\lambda,\mu} s_\lambda \otimes s_\mu`, where `\lambda` is the
+`GL_r` shape and `\mu` the `S_n` shape. They are indexed in a table
+of the result store (see :mod:`funcpersist`), with one row per
+coefficient, and the columns:
+
+- ``sn_shape``, ``gl_shape`` -- the shapes, as strings ``"2,1"``
+- ``degree`` -- the size of the `GL_r` shape
+- ``n`` -- the size of the `S_n` shape
+- ``r`` -- the length of the `GL_r` shape
+- ``coefficient``
+
+The index is updated incrementally before each query: only the values
+of the keys which are not yet indexed, or which were stored again
+since they were indexed (see :meth:`FuncPersistStore.stamps`), are
+loaded. For a versioned function, only the values of its current
+version are indexed.
+
+EXAMPLES::
+
+    sage: from bicharacter_database import *
+    sage: query_bicharacter(gl_shape=[1,1], max_n=5)
+    [((1, 1), (1, 1, 1), 1), ((1, 1), (2, 1, 1), 1), ((1, 1), (3, 1, 1), 1)]
+    sage: bicharacter_series(gl_shape=[1,1], max_n=5)
+    s[1, 1] # s[1, 1, 1] + s[1, 1] # s[2, 1, 1] + s[1, 1] # s[3, 1, 1]
+
+This is `\chi_1([1,1])` in :func:`harmonic_bicharacter_truncated_series`,
+without loading all the stored characters.
+"""
+
+import os
+
+from sage.combinat.partition import Partition
+from sage.combinat.sf.sf import SymmetricFunctions
+from sage.categories.tensor import tensor
+from sage.rings.integer_ring import ZZ
+
+from character import harmonic_character_plain
+
+def _shape_to_string(shape):
+    return ",".join(str(i) for i in shape)
+
+def _shape_from_string(s):
+    return tuple(int(i) for i in s.split(",")) if s else ()
+
+def _function_name(f):
+    """
+    Return the name under which the coefficients of ``f`` are indexed, including its version.
+    """
+    if f._version is None:
+        return f._name
+    return "%s_v%s"%(f._name, f._version)
+
+def _shape(f, key):
+    """
+    Return the `S_n` shape of the key ``key`` of ``f``, or ``None`` if it is of another version.
+    """
+    if f._version is None:
+        return key
+    version, shape = key
+    if version != f._version:
+        return None
+    return shape
+
+def _connection(f):
+    """
+    Return the connection to the store of ``f``, creating the index tables if needed.
+    """
+    connection = f._store.connection()
+    connection.execute("CREATE TABLE IF NOT EXISTS bicharacter ("
+                       "function TEXT NOT NULL, sn_shape TEXT NOT NULL, gl_shape TEXT NOT NULL, "
+                       "degree INTEGER NOT NULL, n INTEGER NOT NULL, r INTEGER NOT NULL, "
+                       "coefficient INTEGER NOT NULL, "
+                       "PRIMARY KEY (function, sn_shape, gl_shape))")
+    connection.execute("CREATE TABLE IF NOT EXISTS bicharacter_indexed ("
+                       "function TEXT NOT NULL, sn_shape TEXT NOT NULL, "
+                       "stamp INTEGER, "
+                       "PRIMARY KEY (function, sn_shape))")
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(bicharacter_indexed)")]
+    if "stamp" not in columns:
+        connection.execute("ALTER TABLE bicharacter_indexed ADD COLUMN stamp INTEGER")
+    for column in ["gl_shape", "degree", "n", "r"]:
+        connection.execute("CREATE INDEX IF NOT EXISTS bicharacter_%s "
+                           "ON bicharacter (function, %s)"%(column, column))
+    return connection
+
+def index_bicharacters(f=harmonic_character_plain):
+    """
+    Index the coefficients of the characters stored by ``f`` which are not yet indexed, or were stored again since.
+
+    INPUT:
+
+    - ``f`` -- a :class:`func_persist` whose keys are the `S_n`
+      shapes, possibly tagged with a version, and values the
+      dictionaries ``{GL_r shape: coefficient}`` (default:
+      :func:`harmonic_character_plain`)
+
+    OUTPUT: the number of newly indexed `S_n` shapes
+
+    EXAMPLES::
+
+        sage: from bicharacter_database import index_bicharacters
+        sage: index_bicharacters() >= 0
+        True
+        sage: index_bicharacters()
+        0
+
+    A character stored again, e.g. by ``set_cache`` or a
+    recomputation, is indexed again::
+
+        sage: from bicharacter_database import query_bicharacter
+        sage: from funcpersist import func_persist
+        sage: def character(mu):
+        ....:     return {(1,): 1}
+        sage: f = func_persist(character, dir=tmp_dir(), hash=str, key=lambda mu: tuple(mu))
+        sage: f([2,1])
+        {(1,): 1}
+        sage: index_bicharacters(f), query_bicharacter(f=f)
+        (1, [((1,), (2, 1), 1)])
+        sage: f.set_cache({(2,): 3}, [2,1])
+        sage: index_bicharacters(f), query_bicharacter(f=f)
+        (1, [((2,), (2, 1), 3)])
+    """
+    connection = _connection(f)
+    name = _function_name(f)
+    # Read before the values, so that a value stored meanwhile is indexed again next time
+    stamps = f._store.stamps(f._name)
+    indexed = dict(connection.execute(
+        "SELECT sn_shape, stamp FROM bicharacter_indexed WHERE function=?", (name,)))
+    def predicate(key):
+        mu = _shape(f, key)
+        if mu is None:
+            return False
+        sn_shape = _shape_to_string(mu)
+        return sn_shape not in indexed or indexed[sn_shape] != stamps.get(str(f._hash(key)))
+    rows = []
+    shapes = []
+    for key, character in f.iteritems(predicate):
+        mu = _shape(f, key)
+        sn_shape = _shape_to_string(mu)
+        shapes.append((name, sn_shape, stamps.get(str(f._hash(key)))))
+        rows.extend((name, sn_shape, _shape_to_string(la), int(sum(la)), int(sum(mu)), len(la), int(c))
+                    for la, c in character.iteritems())
+    if shapes:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("DELETE FROM bicharacter WHERE function=? AND sn_shape=?",
+                                   [(name, sn_shape) for (name, sn_shape, stamp) in shapes])
+            connection.executemany("INSERT OR REPLACE INTO bicharacter VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            connection.executemany("INSERT OR REPLACE INTO bicharacter_indexed (function, sn_shape, stamp) "
+                                   "VALUES (?, ?, ?)", shapes)
+        except:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    return len(shapes)
+
+def query_bicharacter(sn_shape=None, gl_shape=None, degree=None, max_degree=None,
+                      n=None, max_n=None, r=None, max_r=None, f=harmonic_character_plain):
+    """
+    Return the stored coefficients of the bicharacter satisfying the given conditions.
+
+    INPUT:
+
+    - ``sn_shape``, ``gl_shape`` -- partitions, or ``None``
+    - ``degree``, ``max_degree`` -- the (maximal) size of the `GL_r` shape
+    - ``n``, ``max_n`` -- the (maximal) size of the `S_n` shape
+    - ``r``, ``max_r`` -- the (maximal) length of the `GL_r` shape
+    - ``f`` -- see :func:`index_bicharacters`
+
+    OUTPUT: the sorted list of the triples ``(gl_shape, sn_shape, coefficient)``
+
+    EXAMPLES::
+
+        sage: from bicharacter_database import query_bicharacter
+        sage: query_bicharacter(sn_shape=[2,1])
+        [((1,), (2, 1), 1), ((2,), (2, 1), 1)]
+        sage: query_bicharacter(sn_shape=[3,1], max_degree=1)
+        [((1,), (3, 1), 1)]
+    """
+    index_bicharacters(f)
+    conditions = ["function=?"]
+    parameters = [_function_name(f)]
+    for column, operator, value in [("sn_shape", "=", sn_shape), ("gl_shape", "=", gl_shape),
+                                    ("degree", "=", degree), ("degree", "<=", max_degree),
+                                    ("n", "=", n), ("n", "<=", max_n),
+                                    ("r", "=", r), ("r", "<=", max_r)]:
+        if value is None:
+            continue
+        if column.endswith("shape"):
+            value = _shape_to_string(Partition(value))
+        conditions.append("%s%s?"%(column, operator))
+        parameters.append(value)
+    rows = _connection(f).execute(
+        "SELECT gl_shape, sn_shape, coefficient FROM bicharacter WHERE " + " AND ".join(conditions),
+        parameters)
+    return sorted((_shape_from_string(gl), _shape_from_string(sn), c) for gl, sn, c in rows)
+
+def bicharacter_series(**conditions):
+    """
+    Return the sum `\sum c_{\lambda,\mu} s_\lambda \otimes s_\mu` of the coefficients satisfying the conditions.
+
+    See :func:`query_bicharacter` for the conditions.
+
+    EXAMPLES::
+
+        sage: from bicharacter_database import bicharacter_series
+        sage: bicharacter_series(sn_shape=[2,1])
+        s[1] # s[2, 1] + s[2] # s[2, 1]
+    """
+    s = SymmetricFunctions(ZZ).s()
+    ss = tensor([s,s])
+    return ss.sum_of_terms([(Partition(la), Partition(mu)), c]
+                           for la, mu, c in query_bicharacter(**conditions))
+
+def export_bicharacter_columns(filename, **conditions):
+    """
+    Export the coefficients satisfying the conditions to the compressed numpy file ``filename``.
+
+    See :func:`query_bicharacter` for the conditions.
+
+    The file has one integer array per column: ``degree``, ``n``,
+    ``r`` and ``coefficient``, and the two shapes as matrices
+    ``gl_shape`` and ``sn_shape`` with one row per coefficient, padded
+    with zeroes. Use :func:`load_bicharacter_columns` to read it.
+
+    EXAMPLES::
+
+        sage: from bicharacter_database import *
+        sage: filename = os.path.join(tmp_dir(), "bicharacter.npz")
+        sage: export_bicharacter_columns(filename, sn_shape=[2,1])
+        sage: columns = load_bicharacter_columns(filename)
+        sage: columns["gl_shape"]
+        array([[1],
+               [2]], dtype=int16)
+        sage: list(columns["coefficient"])
+        [1, 1]
+    """
+    import numpy
+    rows = query_bicharacter(**conditions)
+    width_gl = max([len(la) for la, mu, c in rows] + [1])
+    width_sn = max([len(mu) for la, mu, c in rows] + [1])
+    gl_shape = numpy.zeros((len(rows), width_gl), dtype=numpy.int16)
+    sn_shape = numpy.zeros((len(rows), width_sn), dtype=numpy.int16)
+    for i, (la, mu, c) in enumerate(rows):
+        gl_shape[i, :len(la)] = la
+        sn_shape[i, :len(mu)] = mu
+    numpy.savez_compressed(filename,
+                           gl_shape=gl_shape, sn_shape=sn_shape,
+                           degree=numpy.array([sum(la) for la, mu, c in rows], dtype=numpy.int16),
+                           n=numpy.array([sum(mu) for la, mu, c in rows], dtype=numpy.int16),
+                           r=numpy.array([len(la) for la, mu, c in rows], dtype=numpy.int16),
+                           coefficient=numpy.array([c for la, mu, c in rows], dtype=numpy.int64))
+
+def load_bicharacter_columns(filename):
+    """
+    Return the dictionary of the columns exported by :func:`export_bicharacter_columns`.
+
+    Benchmark against loading the full series::
+
+        sage: from bicharacter_database import *                               # not tested
+        sage: export_bicharacter_columns("bicharacter.npz")                       # not tested
+        sage: %time _ = load_bicharacter_columns("bicharacter.npz")               # not tested
+        sage: %time _ = harmonic_bicharacter_truncated_series()                   # not tested
+    """
+    import numpy
+    with numpy.load(filename) as data:
+        return {name: data[name] for name in data.files}
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import datetime
 from funcpersist import *
+from scheduler import register_task, calibrated_cost, schedule, format_stats
+from jobqueue import run_on_queue
 from diagonal_polynomial_ring import *
 from derivative_space import *
 from polarization_space import *
@@ -54,33 +55,114 @@ def character(mu):
 # Harmonic characters
 ##################################################
 
-def harmonic_character(P, mu, verbose=False, row_symmetry=None, use_commutativity=False):
+def harmonic_character(P, mu, verbose=False, row_symmetry=None, use_commutativity=False, parallel=False, ncpus=None, warm=False):
     """
     Return the `GL_r` character of the space of diagonal harmonic polynomials
     contributed by a given `S_n` irreducible representation.
 
+    With ``parallel=True``, the computation of a single character is
+    split on ``ncpus`` processes: the higher Specht polynomials are
+    computed independently (see :func:`higher_specht_family`), and the
+    polarization space is computed separately for the generators of
+    each total degree, then merged (see
+    :func:`polarization_space_by_generator_degree`; serially with
+    ``row_symmetry="multipolarization"``). With ``warm=True``, the jobs
+    are run by the long-lived workers of :func:`warm_pool`. This can't
+    be used from a worker of :func:`schedule`.
+
     EXAMPLES::
 
         sage: P = DiagonalPolynomialRing(QQ,5,4)
         sage: harmonic_character(P, Partition([3,2])) #not tested 
         # TODO NICOLAS : don't know how to correct the problem
         s[2] + s[2, 1] + s[2, 2] + s[3] + s[3, 1] + s[4] + s[4, 1] + s[5] + s[6]
+
+    With ``row_symmetry="multipolarization"``, only the highest weight
+    vectors are computed (see :class:`HighestWeightSubspace`)::
+
+        sage: P = DiagonalPolynomialRing(QQ, 4, 3)
+        sage: harmonic_character(P, Partition([2,1,1]), row_symmetry="multipolarization")
+        s[1, 1] + s[2, 1] + s[3] + s[3, 1] + s[4] + s[5]
+
+    With the row symmetries of `\mu` (see :func:`symmetry_reduced_ring`)::
+
+        sage: mu = Partition([3,1])
+        sage: P = symmetry_reduced_ring(QQ, mu, 3)
+        sage: P._symmetries
+        ((0, 1, 2), (3,))
+        sage: harmonic_character(P, mu) == harmonic_character(DiagonalPolynomialRing(QQ, 4, 3), mu)
+        True
+
+    Checking it against the characters stored by
+    :func:`harmonic_character_plain`, for `n\leq 6`::
+
+        sage: for (version, mu), char in harmonic_character_plain.iteritems(lambda key: sum(key[1]) <= 6):   # long time
+        ....:     n = sum(mu)
+        ....:     r = max(n-1 if len(mu) == n else n-2, 1)
+        ....:     P = DiagonalPolynomialRing(QQ, n, r)
+        ....:     result = harmonic_character(P, mu, row_symmetry="multipolarization")
+        ....:     assert {tuple(d): c for d, c in result} == char, mu
+
+    Benchmark of the four strategies::
+
+        sage: for n in range(4, 7):                                        # not tested
+        ....:     P = DiagonalPolynomialRing(QQ, n, n-1)
+        ....:     for mu in Partitions(n):
+        ....:         for row_symmetry in ["permutation", "euler+intersection", "decompose", "multipolarization"]:
+        ....:             t = walltime()
+        ....:             _ = harmonic_character(P, mu, row_symmetry=row_symmetry)
+        ....:             print n, mu, row_symmetry.ljust(20), walltime(t)
+
+    Timings against ``row_symmetry="permutation"``::
+
+        sage: P = DiagonalPolynomialRing(QQ, 6, 5)                                          # not tested
+        sage: %time harmonic_character(P, Partition([3,2,1]), row_symmetry="permutation")      # not tested
+        sage: %time harmonic_character(P, Partition([3,2,1]), row_symmetry="multipolarization") # not tested
+
+    Splitting a single character on several processes::
+
+        sage: P = DiagonalPolynomialRing(QQ, 4, 3)
+        sage: harmonic_character(P, Partition([2,1,1]), row_symmetry="permutation", parallel=True, ncpus=2)
+        s[1, 1] + s[2, 1] + s[3] + s[3, 1] + s[4] + s[5]
+        sage: from scheduler import close_warm_pools
+        sage: harmonic_character(P, Partition([2,1,1]), row_symmetry="permutation", parallel=True, ncpus=2, warm=True)
+        s[1, 1] + s[2, 1] + s[3] + s[3, 1] + s[4] + s[5]
+        sage: close_warm_pools()
+
+    Speedup for `1^6`, the most expensive character for `n=6`::
+
+        sage: P = DiagonalPolynomialRing(QQ, 6, 5)                                                         # not tested
+        sage: %time a = harmonic_character(P, Partition([1]*6), row_symmetry="permutation")                   # not tested
+        sage: %time b = harmonic_character(P, Partition([1]*6), row_symmetry="permutation", parallel=True)    # not tested
+        sage: a == b                                                                                       # not tested
+        True
     """
     mu = Partition(mu)
     n = P._n
     r = P._r
     if isinstance(P, DiagonalAntisymmetricPolynomialRing):
         antisymmetries = P._antisymmetries
-        use_antisymmetry = True
+        symmetries = P._symmetries
+        use_antisymmetry = not symmetries
     else:
         antisymmetries = None
+        symmetries = None
         use_antisymmetry = False
-    generators = [higher_specht(P, t, harmonic=True, use_antisymmetry=use_antisymmetry)
-                  for t in StandardTableaux(mu)]
-    F = polarizationSpace(P, mu, generators, verbose=verbose, 
-                                     antisymmetries=antisymmetries, 
-                                     row_symmetry=row_symmetry, 
-                                     use_commutativity=use_commutativity)
+    H = DerivativeHarmonicSpace(P.base_ring(), n, use_antisymmetry=use_antisymmetry)
+    generators = {}
+    for gen in H.basis_by_shape(mu, parallel=parallel, ncpus=ncpus, warm=warm):
+        gen = P(gen)
+        if symmetries:
+            gen = symmetric_normal(gen, n, r+P._inert, symmetries)
+        generators.setdefault(P.multidegree(gen), []).append(gen)
+    if parallel:
+        F = polarization_space_by_generator_degree(P, generators, ncpus=ncpus, warm=warm, verbose=verbose,
+                                                   row_symmetry=row_symmetry,
+                                                   use_commutativity=use_commutativity)
+    else:
+        F = polarizationSpace(P, generators, verbose=verbose,
+                              row_symmetry=row_symmetry,
+                              use_commutativity=use_commutativity)
     F.finalize()
 
     if row_symmetry != "euler+intersection":
@@ -93,12 +175,9 @@ def harmonic_character(P, mu, verbose=False, row_symmetry=None, use_commutativit
     # We compute the intersection with the highest weight space,
     # i.e. the joint kernel of the f operators of the lie algebra
     # which are the polarization operators of degree 0 with i_2 < i_1
-    operators = [functools.partial(P.polarization, i1=i1, i2=i2, d=1,
-                                   antisymmetries=F._antisymmetries)
-                 for i1 in range(1, r)
-                 for i2 in range(i1)]
-    return F._hilbert_parent({mu: len(annihilator_basis(basis._basis, operators, action=lambda b, op: op(b), ambient=self))
-                              for mu, basis in F._bases.iteritems() if basis._basis})
+    # (one kernel computation per multidegree)
+    return F._hilbert_parent({D: len(P.highest_weight_space(basis.vectors(), F._polarization_cache))
+                              for D, basis in F._bases.iteritems() if basis.vectors()})
 
 # NICOLAS : Cette fonction est-elle devenue inutile ? (voir harmonic_bicharacter plus bas)
 def harmonic_bicharacter_bis(P, verbose=False, row_symmetry=None, antisymmetries=None, use_lie=False):
@@ -132,9 +211,13 @@ def harmonic_bicharacter_bis(P, verbose=False, row_symmetry=None, antisymmetries
     #return sum( res[1] for res in char(Partitions(self._n).list()) )
     return sum(char(mu) for mu in Partitions(P._n))
 
-def harmonic_character_plain(mu, verbose=False, parallel=False):
+def harmonic_character_plain(mu, verbose=False, parallel=False, row_symmetry="permutation"):
     """
-    
+    Return the `GL_r` character of the `\mu`-isotypic component of the
+    diagonal harmonic polynomials, as a dictionary ``{shape: coefficient}``.
+
+    The result is stored on disk, the key being `\mu`: ``row_symmetry``
+    only selects the strategy (see :func:`harmonic_character`).
     """
     import tqdm
     mu = Partition(mu)
@@ -150,18 +233,90 @@ def harmonic_character_plain(mu, verbose=False, parallel=False):
     else:
         progressbar = False
     result = harmonic_character(R, mu, verbose=progressbar,
-                                  row_symmetry="permutation") #TODO NICOLAS : default parameter for row_symmetry ? 
+                                  row_symmetry=row_symmetry) #TODO NICOLAS : default parameter for row_symmetry ? 
                                   #use_antisymmetry=True)
     return {tuple(degrees): dim
             for degrees, dim in result}
 
+def harmonic_character_coefficient(mu, la, verbose=False):
+    """
+    Return the multiplicity of `s_\lambda \otimes s_\mu` in the
+    diagonal harmonic bicharacter.
+
+    INPUT:
+
+    - ``mu`` -- a partition of `n`
+    - ``la`` -- a partition
+
+    This is the coefficient of `s_\lambda` in the `GL_r` character
+    of the `\mu`-isotypic component (see :func:`harmonic_character_plain`).
+
+    If this character is already stored, the coefficient is read from
+    it. Otherwise, only the highest weight vectors are computed (see
+    :class:`HighestWeightSubspace`), with `r = \ell(\lambda)` rows of
+    variables, which is enough for this coefficient; and the closure is
+    pruned of all the vectors of total degree less than `|\lambda|`.
+
+    EXAMPLES::
+
+        sage: harmonic_character_coefficient([2,1,1], [3,1])
+        1
+        sage: harmonic_character_coefficient([2,1,1], [2,2])
+        0
+        sage: harmonic_character_coefficient([3], [])
+        1
+
+    Benchmark against the full computation::
+
+        sage: %time harmonic_character_coefficient([3,2,1], [3,1])          # not tested
+        sage: %time harmonic_character_plain([3,2,1])[(3,1)]                 # not tested
+    """
+    mu = Partition(mu)
+    la = Partition(la)
+    if harmonic_character_plain.is_in_cache(mu):
+        return harmonic_character_plain(mu).get(tuple(la), 0)
+    n = mu.size()
+    r = max(len(la), 1)
+    P = DiagonalPolynomialRing(QQ, n, r)
+    H = DerivativeHarmonicSpace(QQ, n)
+    generators = {}
+    for gen in H.basis_by_shape(mu):
+        gen = P(gen)
+        if gen.total_degree() >= la.size():
+            generators.setdefault(P.multidegree(gen), []).append(gen)
+    if not generators:
+        return 0
+    F = HighestWeightSubspace(generators, P,
+                              min_total_degree=la.size(),
+                              verbose=verbose)
+    target = tuple(la) + (0,)*(r-len(la))
+    return sum(dim for D, dim in F.dimensions().iteritems()
+               if tuple(D) == target)
+
 def harmonic_character_plain_key(mu, **args):
+    """
+    Return the key of :func:`harmonic_character_plain`, which is just `\mu`.
+
+    The other arguments are left out on purpose: the character does
+    not depend on the strategy ``row_symmetry``, so that a value
+    computed with any strategy is served for all of them. The strategy
+    which produced a stored value is recorded in its provenance.
+
+    EXAMPLES::
+
+        sage: harmonic_character_plain_key([2,1], row_symmetry="euler+intersection")
+        (2, 1)
+    """
     return tuple(Partition(mu))
 def harmonic_character_plain_hash(mu):
     return str(list(mu)).replace(" ","")[1:-1]
+# Bump the version, and remove legacy, when the results of
+# harmonic_character_plain change; the former .sobj files hold the
+# values of version 1
 harmonic_character_plain = func_persist(harmonic_character_plain,
                                         hash=harmonic_character_plain_hash,
-                                        key= harmonic_character_plain_key)
+                                        key= harmonic_character_plain_key,
+                                        version=1, legacy=True)
 
 # NICOLAS : Est-ce qu'il faut garder ça dans le code ? 
 """
@@ -231,30 +386,75 @@ def harmonic_character_isotypic(mu):
     s = S.s()
     return s.sum_of_terms([Partition(d), c] for d,c in result.iteritems())
 
-@parallel()
-def harmonic_character_isotypic_paral(mu):
+def harmonic_character_cost_model(mu, r=None):
     r"""
-    Utility to parallelize the computation of the `GL_r` character of
-    the `S_n` isotypic components in the diagonal harmonic
-    polynomials.
+    Return a number roughly proportional to the computation time of the `GL_r` character of the isotypic component `\mu`.
+
+    This is `f^\mu (1+n(\mu))^r`, where `f^\mu` is the dimension of the
+    irreducible representation, and `n(\mu)` the highest degree of the
+    harmonic polynomials in the isotypic component: the expensive
+    components are the large ones, and those of high degree.
+
+    If `r` is not specified, it is the number of rows used by
+    :func:`harmonic_character_plain`.
+
+    EXAMPLES::
+
+        sage: harmonic_character_cost_model([4])
+        1
+        sage: harmonic_character_cost_model([1,1,1,1])
+        343
+        sage: harmonic_character_cost_model([2,1,1])
+        48
     """
-    t1 = datetime.datetime.now()
-    result = harmonic_character_plain(mu, verbose=True, parallel=True)
-    t2 = datetime.datetime.now()
-    return result, t2-t1
+    mu = Partition(mu)
+    n = mu.size()
+    if r is None:
+        r = max(n-1 if len(mu) == n else n-2, 1)
+    return StandardTableaux(mu).cardinality() * (1+mu.weighted_size())**r
+
+register_task("harmonic_character_plain", harmonic_character_plain,
+              cost=calibrated_cost(harmonic_character_plain,
+                                   lambda key: harmonic_character_cost_model(key[1])),
+              is_cached=harmonic_character_plain.is_in_cache)
 
-def harmonic_characters(n):
+def harmonic_characters(n, ncpus=None, memory_limit=None, warm=False, queue=None):
     r"""
     Compute in parallel the `GL_r` character of all `S_n` isotypic
     components in the diagonal harmonic polynomials.
+
+    The components already stored are skipped, and the others are
+    computed from the most expensive to the cheapest (see
+    :func:`schedule` and :func:`harmonic_character_cost_model`).
+
+    INPUT:
+
+    - ``ncpus`` -- the number of processes
+    - ``memory_limit`` -- the maximal memory of each job, in bytes
+    - ``warm`` -- whether to use long-lived workers, which keep their
+      caches between the jobs (see :func:`warm_pool`)
+    - ``queue`` -- the path of a job queue, or ``None``; if specified,
+      the jobs are submitted to this queue, to be run by the workers of
+      any machine sharing it, including the current process (see
+      :func:`run_on_queue`)
     """
     S = SymmetricFunctions(ZZ)
     s = S.s()
-    for (((nu,),_), (result, t)) in harmonic_character_isotypic_paral((tuple(mu),) for mu in Partitions(n)):
-        import tqdm
-        tqdm.tqdm.write("\r%s\t("%Partition(nu)+str(t)[:-7]+"): %s"%
-                                                     s.sum_of_terms([Partition(d), c]
-                                                                    for d,c in result.iteritems()))
+    import tqdm
+    jobs = [("harmonic_character_plain", (tuple(mu),)) for mu in Partitions(n)]
+    if queue is not None:
+        for (_, (nu,)), result in zip(jobs, run_on_queue(queue, jobs)):
+            tqdm.tqdm.write("\r%s\t: %s"%(Partition(nu), s.sum_of_terms([Partition(d), c]
+                                                                       for d,c in result.iteritems())))
+        return
+    for job, result, stats in schedule(jobs, ncpus=ncpus, memory_limit=memory_limit, warm=warm):
+        nu = job.args[0]
+        if result is None:
+            tqdm.tqdm.write("\r%s\t(%s)"%(Partition(nu), format_stats(stats)))
+            continue
+        tqdm.tqdm.write("\r%s\t(%s): %s"%(Partition(nu), format_stats(stats),
+                                          s.sum_of_terms([Partition(d), c]
+                                                         for d,c in result.iteritems())))
 
 def harmonic_bicharacter(n):
     """
@@ -288,6 +488,13 @@ def harmonic_bicharacter_truncated_series():
         sage: chi1([1,1], Harm)
         s[1, 1, 1] + s[2, 1, 1] + s[3, 1, 1] + s[4, 1, 1]
 
+    Such queries can also be done without loading all the stored
+    characters (see :mod:`bicharacter_database`)::
+
+        sage: from bicharacter_database import query_bicharacter
+        sage: [mu for la, mu, c in query_bicharacter(gl_shape=[1,1])]
+        [(1, 1, 1), (2, 1, 1), (3, 1, 1), (4, 1, 1)]
+
     Some steps toward recovering it as a product H * finite sum.
     Let's define `H` and its inverse::
 
@@ -328,7 +535,7 @@ def harmonic_bicharacter_truncated_series():
     s = SymmetricFunctions(ZZ).s()
     ss = tensor([s,s])
     return ss.sum_of_terms([(Partition(mu), Partition(nu)), c]
-                           for nu,d in harmonic_character_plain.dict().iteritems()
+                           for (version, nu), d in harmonic_character_plain.iteritems()
                            for mu,c in d.iteritems())
 
 def truncate(f,d):
@@ -342,12 +549,15 @@ def bitruncate(f,d):
 # Characters for generalized version of Vandermonde with inert variables
 ###########################################################################
 
-def character_with_inert(mu, inert=1, verbose=False, use_antisymmetry=False, row_symmetry=None, quotient=False, parallel=False): 
+def character_with_inert(mu, inert=1, verbose=False, use_antisymmetry=False, row_symmetry=None, quotient=False, parallel=False, warm=False): 
     """
     Return the complete bicharacter of the smallest submodule generated by $\Delta_{\mu}$
     and closed under partial derivatives and polarization operators for the double action
     of $GL_r \times S_n$. 
     The result is given as a sum of tensor product of Schur functions.
+
+    With ``parallel=True``, the isotypic components are computed with
+    :func:`schedule`, on long-lived workers if ``warm=True``.
     
     EXAMPLES::        
         sage: character_with_inert(Partition([3]))
@@ -357,6 +567,13 @@ def character_with_inert(mu, inert=1, verbose=False, use_antisymmetry=False, row
         sage: character_with_inert(Partition([1,1,1]))
         s[] # s[1, 1, 1]
 
+    On long-lived workers::
+
+        sage: from scheduler import close_warm_pools
+        sage: character_with_inert(Partition([2,2]), use_antisymmetry=True, row_symmetry="permutation",
+        ....:                      parallel=True, warm=True)
+        s[] # s[2, 2] + s[1] # s[2, 1, 1] + s[2] # s[1, 1, 1, 1]
+        sage: close_warm_pools()
     """
     if quotient :
         parallel = False
@@ -368,15 +585,20 @@ def character_with_inert(mu, inert=1, verbose=False, use_antisymmetry=False, row
     SymmetricFunctions(QQ).inject_shorthands(verbose=False)
     if parallel:
         charac = 0
-        for (((_,nu),_),res) in character_by_isotypic_paral([(mu, nu) for nu in Partitions(n)]):
+        jobs = [("character_by_isotypic_plain", (mu, nu, inert, 0, use_antisymmetry, row_symmetry))
+                for nu in Partitions(n)]
+        for job, res, stats in schedule(jobs, warm=warm):
+            if verbose:
+                print job.args[1], format_stats(stats)
             if res:
+                nu = job.args[1]
                 result = sum(dim*s(Partition(degrees)) for degrees,dim in res.iteritems())
                 charac += tensor([result,s(nu)])
         return charac
     else:
         return character_by_isotypic(mu, inert=inert, use_antisymmetry=use_antisymmetry, row_symmetry=row_symmetry, quotient=quotient, verbose=verbose)
 
-def character_by_isotypic(mu, inert=1, use_antisymmetry=False, row_symmetry=None, quotient=False, verbose=False):
+def character_by_isotypic(mu, inert=1, use_antisymmetry=False, row_symmetry=None, quotient=False, verbose=False, queue=None):
     """
     Computes the sum of the bicharacters of $Gl_r times S_n$ of the 'nu'-isotypic 
     components of $S_n$ of the module generated by the generalized Vandermonde determinant 
@@ -385,6 +607,9 @@ def character_by_isotypic(mu, inert=1, use_antisymmetry=False, row_symmetry=None
     The resultat is given as a sum of tensor product of Schur functions. 
     
     INPUT : 'mu' -- a partition
+            'queue' -- the path of a job queue, or ``None``; if specified,
+                the isotypic components are computed by the workers of any
+                machine sharing the queue (see :func:`run_on_queue`)
     
     EXAMPLES::
         sage: character_by_isotypic(Partition([3]))
@@ -398,45 +623,20 @@ def character_by_isotypic(mu, inert=1, use_antisymmetry=False, row_symmetry=None
     """
     n = mu.size()
     charac = 0
-    for nu in Partitions(n):
-        res = character_by_isotypic_plain(mu, nu, inert=inert, use_antisymmetry=use_antisymmetry, row_symmetry=row_symmetry, quotient=quotient, verbose=verbose)
+    if queue is not None:
+        jobs = [("character_by_isotypic_plain", (mu, nu, inert, 0, use_antisymmetry, row_symmetry, quotient))
+                for nu in Partitions(n)]
+        results = run_on_queue(queue, jobs)
+    else:
+        results = [character_by_isotypic_plain(mu, nu, inert=inert, use_antisymmetry=use_antisymmetry, row_symmetry=row_symmetry, quotient=quotient, verbose=verbose)
+                   for nu in Partitions(n)]
+    for nu, res in zip(Partitions(n), results):
         if res:
             result = sum(dim*s(Partition(degrees)) for degrees,dim in res.iteritems())
             charac += tensor([result,s(nu)])
     return charac
 
-@parallel
-def character_by_isotypic_paral(mu, nu):
-    """
-    See 'character_by_isotypic_plain'.
-    This function is used for parallel computation. 
-    
-    INPUT: mu, nu -- partitions of the same size
-    
-    EXAMPLES::
-        sage: SymmetricFunctions(QQ).inject_shorthands(verbose=False)
-        sage: mu = Partition([2,1])
-        sage: for nu in Partitions(3):
-        ....:     character_by_isotypic_paral(mu, nu)
-        0
-        {(): 1}
-        {(1,): 1}
-        
-        sage: mu = Partition([2,2])
-        sage: for nu in Partitions(4):
-        ....:     character_by_isotypic_paral(mu, nu)
-        0
-        0
-        {(): 1}
-        {(1,): 1}
-        {(2,): 1}
-    """
-    if mu.size()==nu.size() :
-        return character_by_isotypic_plain(mu, nu, inert=1, use_antisymmetry=True, row_symmetry="permutation", verbose=False)
-    else :
-        return "Error : mu and nu are not the same size."
-    
-def character_by_isotypic_plain(mu, nu, inert=1, r=0, use_antisymmetry=False, row_symmetry=None, quotient=False, use_steenrod_op=False, verbose=False):
+def character_by_isotypic_plain(mu, nu, inert=1, r=0, use_antisymmetry=False, row_symmetry=None, quotient=False, use_steenrod_op=False, verbose=False, parallel=False):
     """
     Computes the character of $Gl_r$ of the 'nu'-isotypic component of $S_n$ 
     of the module generated by the generalized Vandermonde determinant indexed by 
@@ -445,6 +645,10 @@ def character_by_isotypic_plain(mu, nu, inert=1, r=0, use_antisymmetry=False, ro
     INPUT:
         - `nu` -- a partition
         - `basis` -- a dict indexed by tuples of integers and partitions
+        - ``parallel`` -- whether to split the polarization space by
+          degree of the generators on several processes (see
+          :func:`polarization_space_by_generator_degree`); it does not
+          change the result, and is not part of the stored key
 
     EXAMPLES::
         sage: mu = Partition([2,2])
@@ -475,38 +679,30 @@ def character_by_isotypic_plain(mu, nu, inert=1, r=0, use_antisymmetry=False, ro
         if use_antisymmetry: 
             antisymmetries = antisymmetries_of_tableau(nu.initial_tableau())
             P = DiagonalAntisymmetricPolynomialRing(QQ, n, r, inert=1, antisymmetries=antisymmetries)
-            generators = {P.multidegree(P(gen)): [reduce_antisymmetric_normal(P(gen), n, r+inert, antisymmetries) for gen in g] for (d,g) in basis.iteritems()}
+            generators = {P.multidegree(P(gen)): reduce_antisymmetric_normal_list([P(gen) for gen in g], n, r+inert, antisymmetries) for (d,g) in basis.iteritems()}
         else :
             P = DiagonalPolynomialRing(QQ, n, r, inert=1)
             generators = {P.multidegree(P(gen)): [P(gen) for gen in g] for (d,g) in basis.iteritems()}
-        S = polarizationSpace(P, generators, verbose=verbose, row_symmetry=row_symmetry, side=None)
+        if parallel:
+            S = polarization_space_by_generator_degree(P, generators, verbose=verbose, row_symmetry=row_symmetry, side=None)
+        else:
+            S = polarizationSpace(P, generators, verbose=verbose, row_symmetry=row_symmetry, side=None)
         basis_pol = S.basis()
-    
-        print nu
 
         if quotient:
             charac_quotient = character_quotient(P, basis_pol, H.degree_vandermonde(), use_steenrod_op=use_steenrod_op, row_symmetry=row_symmetry)
         
         if row_symmetry=="permutation": 
-            for degree, b in basis_pol.iteritems():
-                charac += s(sum(m(Partition(degree)) for p in b)).restrict_partition_lengths(r,exact=False)
-            print "avant quotient : ", charac
+            charac = s.sum_of_terms([Partition(la), c] for la, c in
+                                    schur_coefficients({degree: len(b) for degree, b in basis_pol.iteritems()}, r).iteritems())
             charac = charac - charac_quotient
         else:
             for degree, b in basis_pol.iteritems():
                 charac += sum(P.multipower(degree) for p in b)
                 
-            if quotient :
-                print "avant quotient : "
-                #print(charac)
-                print s.from_polynomial(charac).restrict_partition_lengths(r,exact=False)
-                print 
             charac = charac - charac_quotient
             charac = (s.from_polynomial(charac)).restrict_partition_lengths(r,exact=False)
     
-    print "charac : ", charac
-    print
-    
     if charac:
         return {tuple(degrees): dim for degrees, dim in charac}
     else:
@@ -533,21 +729,91 @@ def character_quotient(P, basis, degree, use_steenrod_op=False, row_symmetry=Non
     
     if qbasis != {} :
         if row_symmetry=="permutation":
+            dimensions = {}
             for key, b in qbasis.iteritems():
-                charac += s(sum(m(Partition(sorted(P.multidegree(p), reverse=True))) for p in b)).restrict_partition_lengths(P._r,exact=False)
+                for p in b:
+                    degree = tuple(sorted(P.multidegree(p), reverse=True))
+                    dimensions[degree] = dimensions.get(degree, 0) + 1
+            charac = s.sum_of_terms([Partition(la), c] for la, c in
+                                    schur_coefficients(dimensions, P._r).iteritems())
         else:
             for key, b in qbasis.iteritems():
                 charac += sum(P.multipower(P.multidegree(p)) for p in b)
             #charac = s(s.from_polynomial(charac)).restrict_partition_lengths(P._r,exact=False)
-    
-    print "quotient : "
-    print s.from_polynomial(charac).restrict_partition_lengths(r,exact=False)
-    print 
     return charac
 
-def character_isotypic_plain_key(mu, nu, **args):
-    return tuple(Composition(mu)), tuple(Composition(nu))
+def character_isotypic_plain_key(*args, **kwds):
+    """
+    Return the key of :func:`character_by_isotypic_plain` for these arguments.
+
+    All the options which change the result are included, with their
+    default values; the shapes are normalized.
+
+    EXAMPLES::
+
+        sage: key = character_isotypic_plain_key(Partition([2,1]), Partition([2,1]), row_symmetry="permutation", verbose=True)
+        sage: key[:2]
+        ((2, 1), (2, 1))
+        sage: options = dict(key[2])
+        sage: options['row_symmetry'], options['inert'], 'verbose' in options
+        ('permutation', 1, False)
+        sage: character_isotypic_plain_key(Partition([2,1]), Partition([2,1]), parallel=True) == character_isotypic_plain_key(Partition([2,1]), Partition([2,1]))
+        True
+    """
+    options = dict(options_key(character_by_isotypic_plain, args, kwds, ignore=("verbose", "parallel")))
+    mu = options.pop('mu')
+    if isinstance(mu, Diagram):
+        mu = ("diagram",) + tuple(sorted(tuple(c) for c in mu.cells()))
+    else:
+        mu = tuple(Composition(mu))
+    nu = tuple(Composition(options.pop('nu')))
+    return mu, nu, tuple(sorted(options.items()))
 def character_isotypic_plain_hash(p_tuple):
-    mu, nu = p_tuple
-    return str(list(mu)).replace(" ","")[1:-1] + "_" + str(list(nu)).replace(" ","")[1:-1]
-#character_by_isotypic_plain = func_persist(character_by_isotypic_plain, hash=character_isotypic_plain_hash, key=character_isotypic_plain_key) 
+    import hashlib
+    mu, nu, options = p_tuple
+    return str(list(mu)).replace(" ","")[1:-1] + "_" + str(list(nu)).replace(" ","")[1:-1] + "_" + hashlib.md5(repr(options)).hexdigest()[:12]
+# Bump the version when the results of character_by_isotypic_plain change
+character_by_isotypic_plain = func_persist(character_by_isotypic_plain,
+                                           hash=character_isotypic_plain_hash,
+                                           key=character_isotypic_plain_key,
+                                           version=1)
+
+def character_by_isotypic_cost_model(key):
+    """
+    Return a number roughly proportional to the computation time of :func:`character_by_isotypic_plain`.
+
+    INPUT:
+
+    - ``key`` -- a key of :func:`character_by_isotypic_plain`
+
+    See :func:`harmonic_character_cost_model`; the number of rows
+    is the one used by :func:`character_by_isotypic_plain`.
+
+    EXAMPLES::
+
+        sage: key = character_by_isotypic_plain.key(Partition([3]), Partition([2,1]))
+        sage: character_by_isotypic_cost_model(key)
+        8
+
+    For a diagram, the number of rows is computed from its number of columns::
+
+        sage: d = Diagram([(0,0),(1,0),(2,0),(3,0)])
+        sage: d.size(), d.nb_cols()
+        (4, 3)
+        sage: key = character_by_isotypic_plain.key(d, Partition([3,1]))
+        sage: character_by_isotypic_cost_model(key) == harmonic_character_cost_model([3,1], 2)
+        True
+    """
+    version, (mu, nu, options) = key
+    r = dict(options)['r']
+    if r == 0:
+        if mu and mu[0] == "diagram":
+            # The cells are stored as (b, a), as in Diagram.cells()
+            r = min(len(mu)-1, max(j for (i,j) in mu[1:]))-1
+        else:
+            r = min(sum(mu), mu[0])-1
+    return harmonic_character_cost_model(nu, max(r, 1))
+
+register_task("character_by_isotypic_plain", character_by_isotypic_plain,
+              cost=calibrated_cost(character_by_isotypic_plain, character_by_isotypic_cost_model),
+              is_cached=character_by_isotypic_plain.is_in_cache)
@@ -5,6 +5,8 @@ from sage.parallel.decorate import parallel
 from sage.combinat.ranker import rank_from_list
 from sage.combinat.sf.sf import SymmetricFunctions
 
+from funcpersist import func_persist
+from scheduler import register_task, schedule
 from utilities import index_filling
 from antisymmetric_utilities import *
 from diagonal_polynomial_ring import *
@@ -43,10 +45,14 @@ class DerivativeHarmonicSpace():
         """
         return "Derivative space generated by the Vandermonde determinant of degree %s and its derivatives"%(self._n)
         
-    def basis_by_shape(self, mu):
+    def basis_by_shape(self, mu, parallel=False, ncpus=None, warm=False):
         """
         Return the elements of the basis of `self` that are in the isotypic component 
         indexed by `mu`. 
+
+        With ``parallel=True``, the higher Specht polynomials are
+        computed on ``ncpus`` processes, long-lived ones if ``warm=True``
+        (see :func:`higher_specht_family`).
         
         EXAMPLES::
             sage: H = DerivativeHarmonicSpace(QQ, 3, use_antisymmetry=True)
@@ -58,7 +64,12 @@ class DerivativeHarmonicSpace():
 
         """
         mu = Partition(mu)
-        return [self.higher_specht(t, harmonic=True) for t in StandardTableaux(mu)]
+        Q = mu.initial_tableau()
+        X = self._polRing.algebra_generators()
+        R = PolynomialRing(self._polRing.base_ring(), self._n, list(X[0]))
+        F = higher_specht_family(R, mu, harmonic=True, use_antisymmetry=self._use_antisymmetry, Q=Q,
+                                 parallel=parallel, ncpus=ncpus, warm=warm)
+        return [F[t, Q] for t in StandardTableaux(mu)]
 
     def higher_specht(self, P, Q=None, harmonic=False):
         r"""
@@ -250,6 +261,31 @@ def higher_specht(R, P, Q=None, harmonic=False, use_antisymmetry=False):
         sage: for mu in Partitions(6):             # long time
         ....:     for t in StandardTableaux(mu):
         ....:         p = R.higher_specht(t, harmonic=True, use_antisymmetry=True)
+
+    The polynomials are stored on disk by :func:`higher_specht_plain`,
+    so that they are computed only once across sessions and
+    parallel workers; the doctests above thus populate the
+    ``func_persist`` directory of the current directory. Here with a
+    store in a temporary directory::
+
+        sage: from funcpersist import func_persist
+        sage: f = func_persist(higher_specht_plain._func, dir=tmp_dir(),
+        ....:                  hash=higher_specht_plain_hash, key=higher_specht_plain_key)
+        sage: t = Partition([2,1]).initial_tableau()
+        sage: f.is_in_cache(QQ, 3, t, t, True, False)
+        False
+        sage: R = PolynomialRing(QQ, 3, 'x')
+        sage: R(f(QQ, 3, t, t, True, False)) == _higher_specht(R, t, t, harmonic=True)
+        True
+        sage: f.is_in_cache(QQ, 3, t, t, True, False)
+        True
+
+    Cold start of :func:`harmonic_character_plain`, that is with an
+    empty ``func_persist`` directory, and then with the higher Specht
+    polynomials already stored::
+
+        sage: %time harmonic_character_plain(Partition([3,2,1]))            # not tested
+        sage: %time harmonic_character_plain(Partition([4,2,1]))            # not tested
     """
     if not isinstance(P, StandardTableau):
         P = Partition(P).initial_tableau()
@@ -257,6 +293,136 @@ def higher_specht(R, P, Q=None, harmonic=False, use_antisymmetry=False):
     assert (n == R.ngens()),"Given partition doesn't have the right size."
     if Q is None:
         Q = P.shape().initial_tableau()
+    return R(higher_specht_plain(R.base_ring(), n, P, Q, harmonic, use_antisymmetry))
+
+def higher_specht_plain(K, n, P, Q, harmonic=False, use_antisymmetry=False):
+    """
+    Return the higher Specht polynomial `H_{P,Q}` in `n` variables
+    over `K` as a dictionary ``{exponent: coefficient}``.
+
+    See :func:`higher_specht`. The result is stored on disk, the key
+    being ``(K, n, P, Q, harmonic, use_antisymmetry)`` with `P` and
+    `Q` given as tuples of rows.
+
+    EXAMPLES::
+
+        sage: t = StandardTableau([[1,3],[2]])
+        sage: sorted(higher_specht_plain(QQ, 3, t, t).items())
+        [((0, 1, 1), 1), ((1, 0, 1), -1)]
+    """
+    R = PolynomialRing(K, n, 'x')
+    H = _higher_specht(R, P, Q, harmonic, use_antisymmetry)
+    return {tuple(e): c for e, c in H.dict().iteritems()}
+
+def higher_specht_plain_key(K, n, P, Q, harmonic=False, use_antisymmetry=False):
+    return (K, n, tuple(tuple(row) for row in P), tuple(tuple(row) for row in Q),
+            harmonic, use_antisymmetry)
+def higher_specht_plain_hash(key):
+    K, n, P, Q, harmonic, use_antisymmetry = key
+    def tableau_hash(t):
+        return "-".join(",".join(str(i) for i in row) for row in t)
+    return "%s_%s_%s_%s_%s_%s"%("".join(str(K).split()), n,
+                                tableau_hash(P), tableau_hash(Q),
+                                harmonic, use_antisymmetry)
+higher_specht_plain = func_persist(higher_specht_plain,
+                                   hash=higher_specht_plain_hash,
+                                   key=higher_specht_plain_key)
+
+register_task("higher_specht_plain", higher_specht_plain,
+              cost=lambda K, n, P, Q, harmonic=False, use_antisymmetry=False: 1 + P.cocharge(),
+              is_cached=higher_specht_plain.is_in_cache)
+
+def higher_specht_family(R, la, harmonic=False, use_antisymmetry=False, Q=None, parallel=False, ncpus=None, warm=False):
+    """
+    Return the higher Specht polynomials `H_{P,Q}` of shape ``la``.
+
+    INPUT:
+
+    - `R` -- a polynomial ring
+    - ``la`` -- a partition
+    - ``harmonic``, ``use_antisymmetry`` -- see :func:`higher_specht`
+    - `Q` -- a standard tableau of shape ``la``, or :obj:`None` (default)
+    - ``parallel`` -- a boolean (default: ``False``): whether to
+      compute the harmonic polynomials on several processes
+    - ``ncpus`` -- the number of processes (default: the number of cpus)
+    - ``warm`` -- whether to use the long-lived workers of
+      :func:`warm_pool` (default: ``False``)
+
+    OUTPUT: a dictionary ``{(P,Q): H_{P,Q}}``, for all standard tableaux
+    `P` of shape ``la``, and `Q` either all standard tableaux of shape
+    ``la`` or just the given one.
+
+    For ``harmonic=True``, the polynomials are computed by increasing
+    cocharge of `P`, and the products `H_{P_2,Q} m_\nu` of lower
+    cocharge are shared among all the `P` with the same `Q`. The results
+    are stored in the caches of :func:`higher_specht`.
+
+    With ``parallel=True`` and ``harmonic=True``, the polynomials which
+    are not yet stored are instead computed independently, one job per
+    pair `(P, Q)`, by :func:`schedule`; the products are then not
+    shared. This can't be used from a worker of :func:`schedule`.
+
+    EXAMPLES::
+
+        sage: R = PolynomialRing(QQ, 'x,y,z')
+        sage: la = Partition([2,1])
+        sage: F = higher_specht_family(R, la, harmonic=True)
+        sage: len(F)
+        4
+        sage: all(H == higher_specht(R, P, Q, harmonic=True) for (P,Q), H in F.items())
+        True
+
+        sage: R = PolynomialRing(QQ, 'x', 4)
+        sage: F = higher_specht_family(R, Partition([2,1,1]), harmonic=True, parallel=True, ncpus=2)
+        sage: all(H == higher_specht(R, P, Q, harmonic=True) for (P,Q), H in F.items())
+        True
+    """
+    la = Partition(la)
+    n = la.size()
+    K = R.base_ring()
+    tableaux = sorted(StandardTableaux(la), key=lambda t: t.cocharge())
+    if Q is None:
+        Qs = StandardTableaux(la)
+    else:
+        Qs = [Q]
+    if parallel and harmonic is True:
+        jobs = [("higher_specht_plain", (K, n, P, Q, harmonic, use_antisymmetry))
+                for Q in Qs for P in tableaux]
+        for job, H, stats in schedule(jobs, ncpus=ncpus, warm=warm):
+            if H is None:
+                raise RuntimeError("%s: %s"%(job, stats['status']))
+    result = {}
+    for Q in Qs:
+        products = {}
+        for P in tableaux:
+            if harmonic is True and not higher_specht_plain.is_in_cache(K, n, P, Q, harmonic, use_antisymmetry):
+                H = _higher_specht(R, P, Q, harmonic, use_antisymmetry, products)
+                higher_specht_plain.set_cache({tuple(e): c for e, c in H.dict().iteritems()},
+                                              K, n, P, Q, harmonic, use_antisymmetry)
+                higher_specht.set_cache(H, R, P, Q, harmonic, use_antisymmetry)
+            else:
+                H = higher_specht(R, P, Q, harmonic, use_antisymmetry)
+            result[P, Q] = H
+    return result
+
+def _higher_specht(R, P, Q, harmonic=False, use_antisymmetry=False, products=None):
+    """
+    Compute the higher Specht polynomial `H_{P,Q}` in `R`.
+
+    See :func:`higher_specht`. `P` and `Q` are standard tableaux.
+
+    If ``products`` is a dictionary, it is used to share the products
+    `H_{P_2,Q} m_\nu` between calls with the same `Q`
+    (see :func:`higher_specht_family`).
+
+    EXAMPLES::
+
+        sage: R = PolynomialRing(QQ, 'x,y,z')
+        sage: t = Partition([2,1]).initial_tableau()
+        sage: _higher_specht(R, t, t, harmonic=True)
+        -2*x + 2*z
+    """
+    n = P.size()
     if harmonic == "dual":
         # Computes an harmonic polynomial obtained by applying h as
         # differential operator on the van der mond
@@ -266,28 +432,9 @@ def higher_specht(R, P, Q=None, harmonic=False, use_antisymmetry=False):
         vdm = higher_specht(R, Partition([1]*n).initial_tableau())
         return polynomial_derivative(h, vdm)
     elif harmonic:
-        # TODO: normalization
-        n = R.ngens()
-        Sym = SymmetricFunctions(R.base_ring())
-        m = Sym.m()
-        p = Sym.p()
-        d = P.cocharge()
-        B = [higher_specht(R, P, Q, use_antisymmetry=use_antisymmetry)] + \
-            [higher_specht(R, P2, Q, use_antisymmetry=use_antisymmetry) * m[nu].expand(n, R.gens())
-             for P2 in StandardTableaux(P.shape()) if P2.cocharge() < d
-             for nu in Partitions(d-P2.cocharge(), max_length=n)]
-        if use_antisymmetry:
-            antisymmetries = antisymmetries_of_tableau(Q)
-            B = [antisymmetric_normal(b, n, 1, antisymmetries) for b in B]
-        operators = [p[k].expand(n,R.gens()) for k in range(1,n+1)]
-        if use_antisymmetry:
-            def action(e, f):
-                return antisymmetric_normal(polynomial_derivative(e,f), n, 1, antisymmetries)
-        else:
-            action = polynomial_derivative
-        ann = annihilator_basis(B, operators, action=action, side='left')
-        assert len(ann) == 1
-        return ann[0]
+        B = _harmonic_candidates(R, P, Q, use_antisymmetry, products)
+        c = harmonic_projection_coefficients(R.base_ring(), P, use_antisymmetry)
+        return R.sum(ci * b for ci, b in zip(c, B) if ci)
 
     exponents = index_filling(P)
     X = R.gens()
@@ -296,10 +443,264 @@ def higher_specht(R, P, Q=None, harmonic=False, use_antisymmetry=False):
 
 
 
+def _harmonic_candidates(R, P, Q, use_antisymmetry=False, products=None):
+    """
+    Return the family `B` whose span contains the harmonic `H_{P,Q}`.
+
+    The first element is the (non harmonic) higher Specht polynomial
+    `H_{P,Q}`, followed by the products `H_{P_2,Q} m_\nu` of the
+    same degree for `P_2` of lower cocharge. They are put in
+    antisymmetric normal form if ``use_antisymmetry`` is set.
+
+    If ``products`` is a dictionary, it is used to share the products
+    between calls with the same `Q` (see :func:`higher_specht_family`).
+
+    EXAMPLES::
+
+        sage: R = PolynomialRing(QQ, 'x,y,z')
+        sage: t = StandardTableau([[1,3],[2]])
+        sage: _harmonic_candidates(R, t, t)
+        [-x*z + y*z, -2*x^2 + 2*y^2 - 2*x*z + 2*y*z]
+    """
+    n = R.ngens()
+    m = SymmetricFunctions(R.base_ring()).m()
+    d = P.cocharge()
+    if products is None:
+        products = {}
+    B = [higher_specht(R, P, Q, use_antisymmetry=use_antisymmetry)]
+    for P2 in StandardTableaux(P.shape()):
+        k = d - P2.cocharge()
+        if k <= 0:
+            continue
+        if (P2, k) not in products:
+            H2 = higher_specht(R, P2, Q, use_antisymmetry=use_antisymmetry)
+            products[P2, k] = [H2 * m[nu].expand(n, R.gens())
+                               for nu in Partitions(k, max_length=n)]
+        B.extend(products[P2, k])
+    if use_antisymmetry:
+        antisymmetries = antisymmetries_of_tableau(Q)
+        B = [antisymmetric_normal(b, n, 1, antisymmetries) for b in B]
+    return B
+
+def _power_sum_operators(R):
+    """
+    Return the power sums `p_1,\dots,p_n` in the variables of `R`.
+
+    EXAMPLES::
+
+        sage: _power_sum_operators(PolynomialRing(QQ, 'x,y'))
+        [x + y, x^2 + y^2]
+    """
+    n = R.ngens()
+    p = SymmetricFunctions(R.base_ring()).p()
+    return [p[k].expand(n, R.gens()) for k in range(1, n+1)]
+
+@cached_function
+def harmonic_projection_coefficients(K, P, use_antisymmetry=False):
+    r"""
+    Return the coefficients of the harmonic `H_{P,Q}` in the family
+    of :func:`_harmonic_candidates`.
+
+    INPUT:
+
+    - `K` -- a field
+    - `P` -- a standard tableau
+    - ``use_antisymmetry`` -- a boolean (default: ``False``)
+
+    OUTPUT: a tuple `c` with `c_0=1`
+
+    The harmonic higher Specht polynomial is the unique element
+    `\sum_i c_i B_i` of the span of the candidates `B` with `c_0=1`
+    which is killed by the power sums `p_k(\partial)`. Writing `M`
+    for the matrix of the action of the power sums on `B`
+    (see :func:`polynomial_derivative_matrix`), this amounts to
+    solving the sparse system `c' M' = -M_0`, where `M_0` is the first
+    row of `M` and `M'` the others.
+
+    The candidates for another tableau `Q` are obtained from those for
+    the initial tableau by the permutation `\sigma` mapping one to the
+    other, and the power sums are symmetric; so the coefficients do
+    not depend on `Q` and are computed only once per shape and `P`.
+
+    The solution is unique only if the rows of `M'` are linearly
+    independent; otherwise, a :class:`ValueError` is raised.
+
+    EXAMPLES::
+
+        sage: t = StandardTableau([[1,3],[2]])
+        sage: harmonic_projection_coefficients(QQ, t)
+        (1, -1/6)
+
+    Comparison with the computation of the whole kernel::
+
+        sage: R = PolynomialRing(QQ, 'x,y,z,t')
+        sage: all(_higher_specht(R, P, Q, harmonic=True) ==
+        ....:     _harmonic_higher_specht_by_kernel(R, P, Q)
+        ....:     for la in Partitions(4)
+        ....:     for P in StandardTableaux(la) for Q in StandardTableaux(la))
+        True
+
+    and with antisymmetries, for the initial tableaux `Q` used by
+    :meth:`DerivativeHarmonicSpace.basis_by_shape`::
+
+        sage: all(_higher_specht(R, P, la.initial_tableau(), harmonic=True, use_antisymmetry=True) ==
+        ....:     _harmonic_higher_specht_by_kernel(R, P, la.initial_tableau(), use_antisymmetry=True)
+        ....:     for la in Partitions(4) for P in StandardTableaux(la))
+        True
+
+    Benchmark::
+
+        sage: R = PolynomialRing(QQ, 6, 'x')                          # not tested
+        sage: T = StandardTableaux([3,2,1]).list()                    # not tested
+        sage: %time _ = [_higher_specht(R, P, Q, harmonic=True) for P in T for Q in T]    # not tested
+        sage: %time _ = [_harmonic_higher_specht_by_kernel(R, P, Q) for P in T for Q in T] # not tested
+    """
+    n = P.size()
+    R = PolynomialRing(K, n, 'x')
+    Q = P.shape().initial_tableau()
+    B = _harmonic_candidates(R, P, Q, use_antisymmetry)
+    if use_antisymmetry:
+        antisymmetries = antisymmetries_of_tableau(Q)
+    else:
+        antisymmetries = None
+    M = polynomial_derivative_matrix(_power_sum_operators(R), B, antisymmetries)
+    if len(B) == 1:
+        assert M.is_zero()
+        return (K.one(),)
+    M1 = M.matrix_from_rows(range(1, len(B)))
+    if M1.rank() < M1.nrows():
+        raise ValueError("the harmonic higher Specht polynomial for %s is not unique in the span of the candidates"%P)
+    c = M1.solve_left(-M.row(0))
+    return (K.one(),) + tuple(c)
+
+def _harmonic_higher_specht_by_kernel(R, P, Q, use_antisymmetry=False):
+    """
+    Return the harmonic `H_{P,Q}` as the kernel of the power sums on the candidates.
+
+    This is the former implementation of ``higher_specht(harmonic=True)``,
+    kept for checks and benchmarks (see
+    :func:`harmonic_projection_coefficients`).
+
+    EXAMPLES::
+
+        sage: R = PolynomialRing(QQ, 'x,y,z')
+        sage: t = Partition([2,1]).initial_tableau()
+        sage: _harmonic_higher_specht_by_kernel(R, t, t)
+        -2*x + 2*z
+    """
+    B = _harmonic_candidates(R, P, Q, use_antisymmetry)
+    if use_antisymmetry:
+        antisymmetries = antisymmetries_of_tableau(Q)
+    else:
+        antisymmetries = None
+    mat = polynomial_derivative_matrix(_power_sum_operators(R), B, antisymmetries)
+    ann = [sum(c * B[i] for i,c in v.iteritems())
+           for v in mat.left_kernel().basis()]
+    assert len(ann) == 1
+    return ann[0]
+
 #########################################################
 # Derivative Vandermonde Space with Inert Variables
 #########################################################
 
+def alternant_terms(cells, positions=(), r=2):
+    r"""
+    Iterate through the terms of the alternant associated to ``cells``.
+
+    INPUT:
+
+    - ``cells`` -- a list of `n` distinct pairs `(a,b)`
+    - ``positions`` -- a tuple of tuples of column indices (default: ``()``)
+    - ``r`` -- `1` or `2` (default: `2`): the number of rows of
+      exponents used to compare columns
+
+    OUTPUT: pairs ``(exponent, sign)`` where ``exponent`` is a tuple of
+    length `2n`: the exponents of `x_0,\dots,x_{n-1}` followed by those
+    of `\theta_0,\dots,\theta_{n-1}`.
+
+    The alternant is the determinant of the matrix `(x_j^b\theta_j^a)`
+    for `0\leq j<n` and `(a,b)` running through ``cells``, that is the
+    signed sum over `\sigma\in S_n` of the monomials
+    `\prod_j x_j^{b_{\sigma(j)}}\theta_j^{a_{\sigma(j)}}`.
+
+    If ``positions`` is given, only the terms which are antisymmetric
+    normal w.r.t. ``positions`` are produced (see
+    :func:`is_diagonal_antisorted`): the permutations are built column
+    by column, and branches violating the order are pruned.
+
+    EXAMPLES::
+
+        sage: sorted(alternant_terms([(0,0),(0,1)]))
+        [((0, 1, 0, 0), 1), ((1, 0, 0, 0), -1)]
+        sage: list(alternant_terms([(0,0),(0,1)], positions=((0,1),)))
+        [((1, 0, 0, 0), -1)]
+        sage: len(list(alternant_terms(Partition([3,2]).cells())))
+        120
+        sage: list(alternant_terms(Partition([3,2]).cells(), positions=((0,1,2,3,4),)))
+        [((2, 1, 1, 0, 0, 0, 1, 0, 1, 0), -1)]
+    """
+    cells = [tuple(c) for c in cells]
+    n = len(cells)
+    columns = [(c[1], c[0])[:r] for c in cells]
+    # constraints[j]: pairs (k, s) with k < j such that the column j
+    # should be at most (s=1) or at least (s=-1) the column k
+    constraints = [[] for j in range(n)]
+    for pos in positions:
+        for i in range(1, len(pos)):
+            a, b = pos[i-1], pos[i]
+            if a < b:
+                constraints[b].append((a, 1))
+            else:
+                constraints[a].append((b, -1))
+    exponent = [0] * (2*n)
+    assignment = [None] * n
+    used = [False] * n
+
+    def terms(j, inversions):
+        if j == n:
+            yield tuple(exponent), -1 if inversions % 2 else 1
+            return
+        for c in range(n):
+            if used[c]:
+                continue
+            if any(columns[assignment[k]] < columns[c] if s > 0 else columns[c] < columns[assignment[k]]
+                   for k, s in constraints[j]):
+                continue
+            used[c] = True
+            assignment[j] = c
+            exponent[j] = cells[c][1]
+            exponent[n+j] = cells[c][0]
+            for term in terms(j+1, inversions + sum(1 for k in range(j) if assignment[k] > c)):
+                yield term
+            used[c] = False
+        assignment[j] = None
+
+    return terms(0, 0)
+
+def alternant_plain(cells):
+    """
+    Return the alternant associated to the sorted list of ``cells``,
+    as a dictionary ``{exponent: sign}``.
+
+    See :func:`alternant_terms`. The result is stored on disk, the
+    key being the sorted tuple of cells.
+
+    EXAMPLES::
+
+        sage: sorted(alternant_plain([(0,1),(0,0)]).items())
+        [((0, 1, 0, 0), 1), ((1, 0, 0, 0), -1)]
+    """
+    return dict(alternant_terms(sorted(tuple(c) for c in cells)))
+
+def alternant_plain_key(cells):
+    return tuple(sorted(tuple(c) for c in cells))
+def alternant_plain_hash(cells):
+    return "_".join("%s,%s"%c for c in cells)
+alternant_plain = func_persist(alternant_plain,
+                               hash=alternant_plain_hash,
+                               key=alternant_plain_key)
+
+
 
 class DerivativeVandermondeSpaceWithInert(UniqueRepresentation):
     """
@@ -334,6 +735,7 @@ class DerivativeVandermondeSpaceWithInert(UniqueRepresentation):
         """
         return "Derivative space generated by a generalized version of the Vandermonde determinant of degree %s with inert variables and its derivatives"%(self._n)
 
+    @cached_method
     def vandermonde(self):
         """
         Let `mu` be a diagram of $n$ cells and $x = (x_1, x_2, \dots, x_n)$ and
@@ -353,13 +755,30 @@ class DerivativeVandermondeSpaceWithInert(UniqueRepresentation):
             sage: W = DerivativeVandermondeSpaceWithInert(QQ, Partition([1,1,1]))
             sage: W.vandermonde()
             -theta00^2*theta01 + theta00*theta01^2 + theta00^2*theta02 - theta01^2*theta02 - theta00*theta02^2 + theta01*theta02^2
+
+        The alternant is built directly from its terms (see
+        :func:`alternant_terms`) rather than as a determinant::
+
+            sage: mu = Partition([3,1])
+            sage: W = DerivativeVandermondeSpaceWithInert(QQ, mu)
+            sage: X = W._P.variables(); Theta = W._P.inert_variables()
+            sage: W.vandermonde() == matrix([[x**i[1]*theta**i[0] for i in mu.cells()] for x,theta in zip(X[0],Theta[0])]).determinant()
+            True
+
+        Benchmark for `n` up to `9`::
+
+            sage: for n in range(3, 10):                                  # not tested
+            ....:     mu = Partitions(n).random_element()
+            ....:     %time Delta = DerivativeVandermondeSpaceWithInert(QQ, mu).vandermonde()
         """
         n = self._n
-        mu = self._mu
-        X = self._P.variables()
-        Theta = self._P.inert_variables()
-        Delta = matrix([[x**i[1]*theta**i[0] for i in mu.cells()] for x,theta in zip(X[0],Theta[0])]).determinant()
-        return Delta
+        cells = [tuple(c) for c in self._mu.cells()]
+        canonical = sorted(cells)
+        sign = Permutation([canonical.index(c)+1 for c in cells]).sign()
+        R = self._P._P
+        N = R.ngens()
+        return R({tuple(e[:N]) + (0,)*(N-2*n): sign*c
+                  for e, c in alternant_plain(cells).iteritems()})
 
     def degree_vandermonde(self):
         """
@@ -417,6 +836,11 @@ class DerivativeVandermondeSpaceWithInert(UniqueRepresentation):
               [1, 1, 1]): (x01*theta00 - x02*theta00 - x00*theta01 + x02*theta01 + x00*theta02 - x01*theta02,),
              ((0,), [2, 1]): (-theta00 + theta02,)}
 
+        Timings for `\mu` of size 6 and 7::
+
+            sage: for mu in [Partition([6]), Partition([3,2,1]), Partition([7]), Partition([4,2,1])]:  # not tested
+            ....:     W = DerivativeVandermondeSpaceWithInert(QQ, mu)
+            ....:     %time B = W.basis()
         """
         n = self._n
         mu = self._mu
@@ -424,11 +848,13 @@ class DerivativeVandermondeSpaceWithInert(UniqueRepresentation):
         D = self._P._grading_set
         Delta = self.vandermonde()
         dim = self.degree_vandermonde()
+        degree = self._P.multidegree
+        # Each operator computes the derivative once, and dispatches its
+        # projections on all isotypic components in the (degree, nu) buckets
         operators = {}
-        for nu in Partitions(n):
-            operators[(D((-1,)),nu)] = [make_deriv_comp_young(X[0][i], nu) for i in range(0,n)]
-            operators[(D((-1,)),nu)] += [make_deriv_comp_young2(X[0], 2, nu)]
-            operators[(D((-2,)),nu)] = [make_deriv_comp_young2(X[0], 3, nu)]
+        operators[(D((-1,)),None)] = [make_deriv_comp_young_split(X[0][i], n, degree) for i in range(0,n)]
+        operators[(D((-1,)),None)] += [make_deriv_comp_young2_split(X[0], 2, n, degree)]
+        operators[(D((-2,)),None)] = [make_deriv_comp_young2_split(X[0], 3, n, degree)]
         generators={(D((dim,)),Partition([1 for i in range(n)])):[Delta]}
         F = Subspace(generators=generators, operators=operators, add_degrees=add_degree_isotyp, verbose=verbose)
         basis = F.basis()
@@ -439,8 +865,7 @@ class DerivativeVandermondeSpaceWithInert(UniqueRepresentation):
             else:
                 pos = antisymmetries_of_tableau(Partition(mu).initial_tableau())
                 for d,B in basis.iteritems():
-                    res = [reduce_antisymmetric_normal(p,n,1,pos) for p in B]
-                    basis[d] = res
+                    basis[d] = reduce_antisymmetric_normal_list(B, n, 1, pos)
         return basis
     
     @cached_method    
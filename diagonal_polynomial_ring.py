@@ -11,11 +11,13 @@ from sage.parallel.decorate import parallel
 from sage.misc.misc_c import prod
 
 from sage.rings.polynomial.polynomial_ring_constructor import PolynomialRing
+from sage.matrix.constructor import matrix
 from sage.rings.integer_ring import ZZ
 from sage.rings.rational_field import QQ
 from sage.categories.algebras import Algebras
 from sage.categories.cartesian_product import cartesian_product
 from sage.functions.other import binomial
+from sage.arith.all import factorial
 from sage.combinat.words.word import Word
 
 from diagram import *
@@ -444,17 +446,89 @@ class DiagonalPolynomialRing(UniqueRepresentation, Parent):
                         return False
         return True
 
+    def highest_weight_space(self, vectors, cache=None):
+        """
+        Return a basis of the highest weight vectors in the span of ``vectors``.
+
+        INPUT:
+
+        - ``vectors`` -- a list of linearly independent polynomials
+        - ``cache`` -- a dictionary or :obj:`None`
+          (see :meth:`_polarization_cached`)
+
+        This is the joint kernel of the raising polarization operators
+        `x_{i-1}\partial_{i}` for `1 \leq i < r`, computed as the left
+        kernel of a single sparse matrix with one row per vector.
+
+        EXAMPLES::
+
+            sage: P = DiagonalPolynomialRing(QQ, 3, 2)
+            sage: X = P.algebra_generators()
+            sage: P.highest_weight_space([X[0,0], X[1,0]])
+            (x00,)
+            sage: P.highest_weight_space([X[0,0]*X[1,1], X[0,1]*X[1,0]])
+            (x01*x10 - x00*x11,)
+        """
+        vectors = list(vectors)
+        columns = {}
+        entries = {}
+        for i, v in enumerate(vectors):
+            for k in range(1, self._r):
+                w = self._polarization_cached(v, k, k-1, cache)
+                for e, c in w.dict().iteritems():
+                    j = columns.setdefault((k, e), len(columns))
+                    entries[i, j] = c
+        M = matrix(self.base_ring(), len(vectors), len(columns), entries, sparse=True)
+        return tuple(self.sum(c * vectors[i] for i, c in v.iteritems())
+                     for v in M.left_kernel().basis())
+
     def test_highest_weight_vector(self, p):
         """
         # TODO NICOLAS add documentation
         """
         self.is_highest_weight_vector(p, _assert=True)
 
-    def highest_weight_vectors(self, p, i1=None, i2=None):
+    def _polarization_cached(self, p, i1, i2, cache):
+        """
+        Return ``self.polarization(p, i1, i2, 1)``, memoized in ``cache``.
+
+        INPUT:
+
+        - ``cache`` -- a dictionary, or :obj:`None` for no memoization
+
+        This is used by the sl_r weight string computations
+        (:meth:`highest_weight_vectors`,
+        :meth:`strip_highest_weight_vector`), where the same `e` and
+        `f` images are needed repeatedly.
+
+        EXAMPLES::
+
+            sage: P = DiagonalPolynomialRing(QQ, 3, 2)
+            sage: X = P.algebra_generators()
+            sage: cache = {}
+            sage: P._polarization_cached(X[0,0]^2, 0, 1, cache)
+            2*x00*x10
+            sage: list(cache.values())
+            [2*x00*x10]
+        """
+        if cache is None:
+            return self.polarization(p, i1, i2, 1)
+        key = (p, i1, i2)
+        result = cache.get(key)
+        if result is None:
+            result = cache[key] = self.polarization(p, i1, i2, 1)
+        return result
+
+    def highest_weight_vectors(self, p, i1=None, i2=None, cache=None):
         """
         Return the "unique" highest weight vectors `p_j, j\geq 0` such
         that `p = \sum e^j p_j`.
 
+        Without ``i1`` and ``i2``, the vectors are made highest weight
+        for all the pairs of adjacent rows, by sweeping through them
+        until nothing changes. A :class:`RuntimeError` is raised if
+        this takes more than the total degree of `p` times `r` sweeps.
+
         EXAMPLES::
 
             sage: P = DiagonalPolynomialRing(QQ, 4, 2)
@@ -505,25 +579,39 @@ class DiagonalPolynomialRing(UniqueRepresentation, Parent):
         #   HW_{i1',i2'}(q) for i1'<i2' with (i1',i2') <_{revlex} (i1,i2)
         # Define similarly HW_{≤i1,i2}(q)
         if i1 is None and i2 is None:
+            if cache is None:
+                cache = {}
             ps = [p]
             # HR:
             # - p is in the span of ps upon application of e_i,j operators
             # - for any q in ps, HW_{<i1,i2}(q)
-            for zut in range(5):
+            # Sweep until all the vectors are highest weight, that is
+            # until a sweep leaves ps unchanged. This is not proven to
+            # terminate; as a safeguard, the sweeps are bounded by the
+            # maximal length of a string, total degree times r
+            max_sweeps = max(p.total_degree(), 1) * self._r
+            sweeps = 0
+            changed = True
+            while changed:
+                if sweeps == max_sweeps:
+                    raise RuntimeError("the highest weight vectors of %s were not found in %s sweeps"%(p, sweeps))
+                sweeps += 1
+                changed = False
                 for i2 in range(self._r-1):
                     for i1 in range(self._r-2,i2-1,-1):
-                        ps = [r
-                                  for q in ps
-                                  for r in self.highest_weight_vectors(q, i1, i1+1)
-                                  if r]
+                        new_ps = []
+                        for q in ps:
+                            rs = self.highest_weight_vectors(q, i1, i1+1, cache)
+                            if rs != [q]:
+                                changed = True
+                            new_ps.extend(r for r in rs if r)
+                        ps = new_ps
             return ps
 
         # Precondition: HW_{<i1,i2}(p)
         # Goal: produce pjs such that:
         # - p = \sum_j e^j pjs[j]
         # - HW_{≤ i1, i2}(q) for q in pjs
-        e = functools.partial(self.polarization, i1=i1, i2=i2, d=1)
-        f = functools.partial(self.polarization, i1=i2, i2=i1, d=1)
         D = self.multidegree(p)
         w = D[i1] - D[i2]
 
@@ -532,22 +620,20 @@ class DiagonalPolynomialRing(UniqueRepresentation, Parent):
         fis = []
         while fip:
             fis.append(fip)
-            fip = f(fip)
-
-        # Invariants:
-        # pjs[j]: None or p_j
-        # pijs[j]: None or e^(j-i) p_j
-        pjs = [ None for j in range(len(fis)) ]
-        epjs = [ None for j in range(len(fis)) ]
-        for i in range(len(fis)-1, -1, -1):
-            for j in range(i+1, len(pjs)):
-                epjs[j] = e(epjs[j])
-            r = fis[i] - sum(fiej(i,j,w+2*j) * epjs[j] for j in range(i+1, len(epjs)))
-            if r:
-                pjs[i] = r / fiej(i,i,w+2*i)
-            else:
-                pjs[i] = r
-            epjs[i] = pjs[i]
+            fip = self._polarization_cached(fip, i2, i1, cache)
+        l = len(fis)
+
+        # pjs[i] = \sum_{k >= i} M[i,k] e^{k-i} f^k(p), where M is the
+        # inverse of the string matrix (see string_matrix_inverse)
+        # (it vanishes for i < -w)
+        M = string_matrix_inverse(w, l)
+        # Invariant: efis[k]: e^{k-i} f^k(p)
+        efis = list(fis)
+        pjs = [self.zero()] * l
+        for i in range(l-1, min(max(0, -w), l)-1, -1):
+            for k in range(i+1, l):
+                efis[k] = self._polarization_cached(efis[k], i1, i2, cache)
+            pjs[i] = self.sum(M[i,k] * efis[k] for k in range(i, l) if M[i,k])
         # for i2p in range(i2+1):
         #     for i1p in range(i2p):
         #         for q in pjs:
@@ -568,7 +654,20 @@ class DiagonalPolynomialRing(UniqueRepresentation, Parent):
                 pjs[j] = e(pjs[j])
         assert p == sum(pjs)
 
-    def strip_highest_weight_vector(self, p):
+    @cached_method
+    def _long_element_reduced_word(self):
+        """
+        Return a reduced word for the longest element of `S_r`.
+
+        EXAMPLES::
+
+            sage: len(DiagonalPolynomialRing(QQ, 4, 4)._long_element_reduced_word())
+            6
+        """
+        W = SymmetricGroup(range(self._r))
+        return tuple(W.long_element().reduced_word())
+
+    def strip_highest_weight_vector(self, p, cache=None):
         """
         # TODO NICOLAS add documentation
         EXAMPLES::
@@ -584,14 +683,12 @@ class DiagonalPolynomialRing(UniqueRepresentation, Parent):
             sage: R.strip_highest_weight_vector(x20^2)
             (4*x00^2, [[1, 2], [0, 2]], 0)
         """
-        W = SymmetricGroup(range(self._r))
-        w0 = W.long_element().reduced_word()
         word = []
         q = p
-        for i in w0:
+        for i in self._long_element_reduced_word():
             l = 0
             while True:
-                q2 = self.polarization(q, i+1, i, 1)
+                q2 = self._polarization_cached(q, i+1, i, cache)
                 if q2:
                     q = q2
                     l += 1
@@ -604,7 +701,7 @@ class DiagonalPolynomialRing(UniqueRepresentation, Parent):
             D = self.multidegree(q2)
             w = D[i] - D[i+1]
             for l2 in range(l):
-                q2 = self.polarization(q2, i, i+1, 1)
+                q2 = self._polarization_cached(q2, i, i+1, cache)
             q2 /= fiej(l, l, w)
         self.test_highest_weight_vector(q)
         return q, word, p-q2
@@ -666,11 +763,42 @@ class DiagonalPolynomialRing(UniqueRepresentation, Parent):
 
 
         """
-        result = []
-        while p:
-            q, word, p = self.strip_highest_weight_vector(p)
-            result.append([q, word])
-        return result
+        return self.highest_weight_vectors_decompositions([p])[0]
+
+    def highest_weight_vectors_decompositions(self, ps):
+        """
+        Return the highest weight vectors decompositions of the polynomials ``ps``.
+
+        The `e` and `f` images computed along the way are shared among
+        all the decompositions, which is worthwhile when the
+        polynomials are of the same multidegree.
+
+        See :meth:`highest_weight_vectors_decomposition`.
+
+        EXAMPLES::
+
+            sage: R = DiagonalPolynomialRing(QQ, 3, 3)
+            sage: x00, x01, x02, x10, x11, x12, x20, x21, x22 = R._P.gens()
+            sage: R.highest_weight_vectors_decompositions([x00, x20])
+            [[[x00, []]], [[x00, [[1, 1], [0, 1]]]]]
+
+        Benchmark on examples scaled up from the above, for `r=3,4`::
+
+            sage: for r in [3, 4]:                                         # not tested
+            ....:     R = DiagonalPolynomialRing(QQ, 5, r)
+            ....:     ps = [R.random_element((4,2,1)+(0,)*(r-3), l=30) for i in range(20)]
+            ....:     %time _ = [R.highest_weight_vectors_decomposition(p) for p in ps]
+            ....:     %time _ = R.highest_weight_vectors_decompositions(ps)
+        """
+        cache = {}
+        results = []
+        for p in ps:
+            result = []
+            while p:
+                q, word, p = self.strip_highest_weight_vector(p, cache)
+                result.append([q, word])
+            results.append(result)
+        return results
 
 def reverse_sorting_permutation(t): # TODO: put "stable sorting" as keyword somewhere
     r"""
@@ -762,10 +890,27 @@ class DiagonalAntisymmetricPolynomialRing(DiagonalPolynomialRing):
         sage: P
         Diagonal antisymmetric polynomial ring with 3 rows of 4 variables over Rational Field
 
+    The polynomials are represented by their antisymmetric normal form
+    w.r.t. ``antisymmetries`` (see :func:`antisymmetric_normal`), or
+    by their symmetric normal form w.r.t. ``symmetries`` (see
+    :func:`symmetric_normal`), with one exponent per orbit.
+
+    Both can't be used at once: the image of a Young idempotent is
+    antisymmetric under the column stabilizer or symmetric under the
+    row stabilizer, depending on the order of the symmetrizers, but
+    not both; see :func:`symmetry_reduced_ring` for how to choose.
+
+        sage: DiagonalAntisymmetricPolynomialRing(QQ, 4, 3, antisymmetries=((0,1),), symmetries=((0,2),))
+        Traceback (most recent call last):
+        ...
+        ValueError: antisymmetries and symmetries can't be used simultaneously
     """
-    def __init__(self, R, n, r, inert=0, antisymmetries=None):
+    def __init__(self, R, n, r, inert=0, antisymmetries=None, symmetries=None):
+        if antisymmetries and symmetries:
+            raise ValueError("antisymmetries and symmetries can't be used simultaneously")
         DiagonalPolynomialRing.__init__(self, R, n, r, inert=inert)
         self._antisymmetries = antisymmetries
+        self._symmetries = symmetries
 
     def _repr_(self):
         """
@@ -811,17 +956,34 @@ class DiagonalAntisymmetricPolynomialRing(DiagonalPolynomialRing):
             sage: v = -x[0,0]^2*x[0,1] + x[0,0]*x[0,1]^2 + x[0,0]^2*x[0,2] - x[0,1]^2*x[0,2] - x[0,0]*x[0,2]^2 + x[0,1]*x[0,2]^2
             sage: P.polarization(v, 0, 1, 1)
             -12*x00*x01*x10 - 6*x00^2*x11
+
+        With symmetries, the result is in symmetric normal form::
+
+            sage: P = DiagonalAntisymmetricPolynomialRing(QQ, 3, 2, symmetries=((0,1),))
+            sage: x = P.variables()
+            sage: P.polarization(x[0,0]*x[0,1], 0, 1, 1)
+            2*x00*x11
         """
         antisymmetries = self._antisymmetries
         result = super(DiagonalAntisymmetricPolynomialRing,self).polarization(p, i1, i2, d, row_symmetry=row_symmetry)
         if antisymmetries and result:
             result = antisymmetric_normal(result, self._n, self._r+self._inert, antisymmetries)
+        elif self._symmetries and result:
+            result = symmetric_normal(result, self._n, self._r+self._inert, self._symmetries)
         return result
 
     def multi_polarization(self, p, D, i2, antisymmetries=None): 
         """
         Return the multi polarization `P_{D,i_2}. p` of `p`.
         The result is reduced with respect to the given antisymmetries.
+
+        By default, `p` is assumed to be antisymmetric, and only the
+        terms of the result which are in antisymmetric normal form are
+        kept (see :func:`reduce_antisymmetric_normal`). If
+        ``antisymmetries`` is given, `p` may be any polynomial, e.g. an
+        antisymmetric normal form, and the result is the antisymmetric
+        normal form of `b_I(P_{D,i_2}. p)` (see :func:`antisymmetric_normal`),
+        as for :meth:`polarization`.
         
         EXAMPLES::
             sage: mu = Partition([2,1])
@@ -832,10 +994,92 @@ class DiagonalAntisymmetricPolynomialRing(DiagonalPolynomialRing):
             sage: v = -x[0,0]^2*x[0,1] + x[0,0]*x[0,1]^2 + x[0,0]^2*x[0,2] - x[0,1]^2*x[0,2] - x[0,0]*x[0,2]^2 + x[0,1]*x[0,2]^2
             sage: P.multi_polarization(v, [1,0,0], 1)
                 -2*x00*x01*x10 + x01^2*x10 + 2*x00*x02*x10 - x00^2*x11 + 2*x00*x01*x11 + x00^2*x12
+            sage: P.multi_polarization(v, [1,0,0], 1, antisymmetries=antisymmetries) == P.polarization(v, 0, 1, 1)
+            True
         """
-        antisymmetries = self._antisymmetries
         result = super(DiagonalAntisymmetricPolynomialRing,self).multi_polarization(p,D,i2)
         if antisymmetries and result:
-            result = reduce_antisymmetric_normal(result, self._n, self._r+self._inert, antisymmetries)
+            result = antisymmetric_normal(result, self._n, self._r+self._inert, antisymmetries)
+        elif self._antisymmetries and result:
+            result = reduce_antisymmetric_normal(result, self._n, self._r+self._inert, self._antisymmetries)
+        elif self._symmetries and result:
+            result = symmetric_normal(result, self._n, self._r+self._inert, self._symmetries)
         return result
 
+    def normal_form(self, p):
+        """
+        Return the normal form of the polynomial `p`, assumed to be in the image of the Young idempotent.
+
+        The polynomial `p` is antisymmetric (resp. symmetric) w.r.t.
+        the antisymmetries (resp. symmetries) of ``self``; only one
+        term per orbit is kept (see :func:`reduce_antisymmetric_normal`
+        and :func:`reduce_symmetric_normal`).
+
+        EXAMPLES::
+
+            sage: P = DiagonalAntisymmetricPolynomialRing(QQ, 3, 1, symmetries=((0,1),))
+            sage: x = P.variables()
+            sage: P.normal_form(x[0,0]*x[0,1] + x[0,2])
+            1/2*x00*x01 + 1/2*x02
+            sage: P = DiagonalAntisymmetricPolynomialRing(QQ, 3, 1, antisymmetries=((0,1),))
+            sage: P.normal_form(x[0,0]^2*x[0,1] - x[0,0]*x[0,1]^2)
+            x00^2*x01
+        """
+        p = self(p)
+        if self._antisymmetries:
+            return reduce_antisymmetric_normal(p, self._n, self._r+self._inert, self._antisymmetries)
+        if self._symmetries:
+            return reduce_symmetric_normal(p, self._n, self._r+self._inert, self._symmetries)
+        return p
+
+def symmetry_reduced_ring(R, mu, r, inert=0):
+    """
+    Return the ring with the largest symmetry reduction for the isotypic component `mu`.
+
+    INPUT:
+
+    - ``R`` -- a ring
+    - ``mu`` -- a partition of `n`
+    - ``r``, ``inert`` -- as for :class:`DiagonalPolynomialRing`
+
+    The multiplicity of `mu` in a module is the dimension of its
+    image by any primitive idempotent of type `mu`. Using the Young
+    idempotent `a_C s_R` (columns last), the images are antisymmetric
+    under the column stabilizer; using `s_R a_C` (rows last), they are
+    symmetric under the row stabilizer. The normal forms keep one term
+    per orbit, so the symmetry with the largest stabilizer is chosen.
+    The polarizations commute with the action of `S_n`, and `s_R` is a
+    bijection from the first image to the second: the symmetric normal
+    form of `s_R(p)` is :func:`symmetric_normal` of `p` itself (see
+    :meth:`DiagonalAntisymmetricPolynomialRing.normal_form` for
+    polynomials that are already symmetric).
+
+    EXAMPLES::
+
+        sage: P = symmetry_reduced_ring(QQ, Partition([2,2,2]), 2)
+        sage: P._antisymmetries, P._symmetries
+        (((0, 2, 4), (1, 3, 5)), None)
+        sage: P = symmetry_reduced_ring(QQ, Partition([4,2]), 2)
+        sage: P._antisymmetries, P._symmetries
+        (None, ((0, 1, 2, 3), (4, 5)))
+
+    Benchmark of the term counts and closure times for the three
+    strategies::
+
+        sage: for mu in [[2,2,2], [3,3], [4,2]]:                               # not tested
+        ....:     mu = Partition(mu)
+        ....:     n = mu.size()
+        ....:     Ps = [DiagonalPolynomialRing(QQ, n, n-1),
+        ....:           DiagonalAntisymmetricPolynomialRing(QQ, n, n-1, antisymmetries=antisymmetries_of_tableau(mu)),
+        ....:           DiagonalAntisymmetricPolynomialRing(QQ, n, n-1, symmetries=symmetries_of_tableau(mu))]
+        ....:     for P in Ps:
+        ....:         t = walltime()
+        ....:         F = harmonic_character(P, mu)
+        ....:         print mu, P._repr_()[:40], walltime(t)
+    """
+    mu = Partition(mu)
+    n = mu.size()
+    if prod(factorial(l) for l in mu) > prod(factorial(l) for l in mu.conjugate()):
+        return DiagonalAntisymmetricPolynomialRing(R, n, r, inert=inert, symmetries=symmetries_of_tableau(mu))
+    return DiagonalAntisymmetricPolynomialRing(R, n, r, inert=inert, antisymmetries=antisymmetries_of_tableau(mu))
+
@@ -1,9 +1,437 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+r"""
+Persistent caching of function values on disk
+
+All the values of all the functions cached in a directory are stored
+in a single SQLite database ``store.db`` in that directory, with one
+row per key. The keys are pickled separately from the values, so that
+the index of the computed keys can be read without unpickling any
+value; the values are stored as compressed pickles.
+
+Each write is a transaction, and SQLite locks the database file, so
+that several processes (e.g. ``@parallel`` workers) can read and
+write the same store concurrently.
+
+On a single machine, the store is used in WAL mode and read through a
+memory mapping. Both rely on a memory shared by all the processes,
+which the machines sharing a store on a network file system (e.g. the
+workers of :mod:`jobqueue`) don't have: there, a committed value may
+be missed by the readers, or the database corrupted. Such stores are
+used in the default rollback journal mode, without memory mapping,
+after calling :func:`set_shared`, or when the environment variable
+``FUNC_PERSIST_SHARED`` is set::
+
+    sage: from funcpersist import store, set_shared
+    sage: d = tmp_dir()
+    sage: store(d).connection().execute("PRAGMA journal_mode").fetchone()
+    ('wal',)
+    sage: set_shared()
+    sage: store(d).connection().execute("PRAGMA journal_mode").fetchone()
+    ('delete',)
+    sage: store(d).connection().execute("PRAGMA mmap_size").fetchone()
+    (0,)
+    sage: set_shared(False)
+
+The stores used to be one ``.sobj`` file per key; such files are
+imported into the database when looked up, or all at once with
+:meth:`func_persist.migrate` or :func:`migrate`.
+
+EXAMPLES::
+
+    sage: from funcpersist import func_persist, options_key
+    sage: d = tmp_dir()
+    sage: def square(x):
+    ....:     return x^2
+    sage: square = func_persist(square, dir=d, hash=str)
+    sage: square(3)
+    9
+    sage: square.is_in_cache(3), square.is_in_cache(4)
+    (True, False)
+    sage: square.keys()
+    [((3,), ())]
+    sage: square.set_cache(17, 4)
+    sage: square(4)
+    17
+    sage: sorted(square.dict().items())
+    [(((3,), ()), 9), (((4,), ()), 17)]
+
+The values are kept in memory in a least recently used cache of
+bounded size, in front of the store. Beware that the same object is
+then returned by consecutive calls::
+
+    sage: square.cache_info()
+    {'hits': 1, 'maxsize': 128, 'misses': 2, 'size': 2}
+    sage: square(3)
+    9
+    sage: square.cache_info()['hits']
+    2
+
+The stored values can be iterated through lazily, and filtered
+according to their keys, without loading the other values::
+
+    sage: list(square.iteritems(lambda key: key[0][0] > 3))
+    [(((4,), ()), 17)]
+
+With a ``version``, the keys are tagged by it, so that the values
+computed by another version of the algorithm are not served. The
+provenance of each computed value is stored along with it::
+
+    sage: def cube(x, verbose=False):
+    ....:     return x^3
+    sage: cube = func_persist(cube, dir=d, version=2,
+    ....:                     key=lambda *args, **kwds: options_key(cube, args, kwds))
+    sage: cube(2, verbose=True)
+    8
+    sage: cube.keys()
+    [(2, (('x', 2),))]
+    sage: sorted(cube.provenance(2))
+    [u'cpu_time', u'date', u'host', u'options', u'platform', u'version', u'wall_time']
+
+The provenance includes the options of the call which produced the
+value, normalized by :func:`options_key`, so that the strategy used
+is known even when it is not part of the key::
+
+    sage: cube.provenance(2)['options']
+    {u'x': u'2'}
+
+The values of the former ``.sobj`` files, written before the function
+was versioned, are only served with ``legacy=True``::
+
+    sage: import os
+    sage: d = tmp_dir()
+    sage: save((((5,), ()), 10), os.path.join(d, "double_5"))
+    sage: def double(x):
+    ....:     return 2*x
+    sage: h = lambda key: str(key[0][0])
+    sage: func_persist(double, dir=d, hash=h, version=1).is_in_cache(5)
+    False
+    sage: double = func_persist(double, dir=d, hash=h, version=1, legacy=True)
+    sage: double.is_in_cache(5), double.keys()
+    (True, [(1, ((5,), ()))])
+
+Timings of the store against the former ``.sobj`` files, on 654 keys
+whose values are dictionaries of 20 entries, without the in-memory
+cache, with a warm page cache. They were measured under Python 2.7.18
+on a single-cpu x86_64 Xeon, with :mod:`sage.misc.persist` replaced
+by the plain zlib-compressed pickles it writes. Each value is the
+median of 5 runs; the ranges cover several sessions:
+
+================================  ================  ==========
+operation                         ``.sobj`` files   store
+================================  ================  ==========
+looking up a stored value         117-140 us        102-160 us
+loading all the values            79-92 ms          77-96 ms
+listing the stored keys           63-89 ms          14 ms
+checking whether a key is stored  92-137 us         33 us
+================================  ================  ==========
+
+Looking up and loading values takes about as long as before. Listing
+and checking the keys is faster, because no value is unpickled.
+
+Benchmark of the lookup latency, and of the loading time of all the
+stored characters, before and after the migration::
+
+    sage: from character import harmonic_character_plain            # not tested
+    sage: %timeit harmonic_character_plain([3,2,1])                    # not tested
+    sage: %time _ = harmonic_bicharacter_truncated_series()            # not tested
+    sage: migrate(harmonic_character_plain)                            # not tested
+    sage: %timeit harmonic_character_plain([3,2,1])                    # not tested
+    sage: %time _ = harmonic_bicharacter_truncated_series()            # not tested
+
+This module does not load Sage when imported: the pickles are only
+read and written with :mod:`sage.misc.persist` when values are
+actually loaded or stored. Neither do :mod:`scheduler`,
+:mod:`jobqueue` and :mod:`harmonic_modules`. A process can thus check
+which values are stored from their hashes, or parse the command line,
+without importing Sage. This does not help the processes running the
+computations: a worker running a task registered by :mod:`character`
+still imports Sage and all the mathematical modules, with their star
+imports. Under Python 2.7.18, without Sage, each of these four modules
+is imported in 20 to 50 ms, including about 10 ms of interpreter
+startup::
+
+    sage: import os, subprocess, sys, funcpersist
+    sage: subprocess.check_output([sys.executable, "-c",
+    ....:     "import sys, funcpersist, scheduler, jobqueue, harmonic_modules; print 'sage' in sys.modules"],
+    ....:     cwd=os.path.dirname(os.path.abspath(funcpersist.__file__))).strip()
+    'False'
+
+Benchmark of the startup time, against importing the computations::
+
+    sage: import time                                                                # not tested
+    sage: def startup(statement):                                                    # not tested
+    ....:     t = time.time()
+    ....:     subprocess.check_call([sys.executable, "-c", statement])
+    ....:     return time.time() - t
+    sage: startup("from funcpersist import store; store('func_persist').hashes('harmonic_character_plain')")  # not tested
+    sage: startup("from character import harmonic_character_plain")                 # not tested
+"""
+
+__all__ = ["FuncPersistStore", "store", "set_shared", "func_persist", "options_key", "migrate"]
+
+import collections
+import glob
 import inspect
+import json
 import os
-import sage.misc.persist as persist
+import platform
+import sqlite3
+import time
+
+def _persist():
+    """
+    Return the module :mod:`sage.misc.persist`, which is imported on first use.
+    """
+    import sage.misc.persist
+    return sage.misc.persist
+
+# The maximal number of bytes of the store which are memory mapped
+MMAP_SIZE = 2**30
+
+# Whether the stores are shared by several machines; see :func:`set_shared`
+_shared = bool(os.environ.get("FUNC_PERSIST_SHARED"))
+
+class FuncPersistStore(object):
+    """
+    A SQLite database storing the values of the functions cached in a directory.
+
+    The connection is reopened after a fork, as SQLite connections
+    can't be shared between processes, and after :func:`set_shared`.
+
+    EXAMPLES::
+
+        sage: from funcpersist import FuncPersistStore
+        sage: store = FuncPersistStore(tmp_dir())
+        sage: store.set("f", "1", (1,), 2)
+        sage: store.get("f", "1")
+        ((1,), 2)
+        sage: store.get("f", "2")
+        sage: store.keys("f")
+        [(1,)]
+    """
+    def __init__(self, dir):
+        self._path = os.path.join(dir, "store.db")
+        self._connection = None
+        self._pid = None
+
+    def connection(self):
+        """
+        Return the connection to the database for the current process.
+        """
+        if self._pid != os.getpid():
+            # Autocommit mode: the transactions are explicit
+            connection = sqlite3.connect(self._path, timeout=600, isolation_level=None)
+            connection.text_factory = str
+            if _shared:
+                # WAL and memory mapping need a memory shared by all
+                # the processes, hence a single machine
+                connection.execute("PRAGMA journal_mode=DELETE")
+            else:
+                connection.execute("PRAGMA journal_mode=WAL")
+                # Read the database through a memory mapping, shared by
+                # all the processes through the page cache
+                connection.execute("PRAGMA mmap_size=%s"%MMAP_SIZE)
+            connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                               "function TEXT NOT NULL, hash TEXT NOT NULL, "
+                               "key BLOB NOT NULL, value BLOB NOT NULL, "
+                               "provenance TEXT, "
+                               "PRIMARY KEY (function, hash))")
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(results)")]
+            if "provenance" not in columns:
+                connection.execute("ALTER TABLE results ADD COLUMN provenance TEXT")
+            # A counter incremented by each write, in a separate table
+            # so that it can be read without reading the values
+            connection.execute("CREATE TABLE IF NOT EXISTS stamps ("
+                               "function TEXT NOT NULL, hash TEXT NOT NULL, "
+                               "stamp INTEGER NOT NULL, "
+                               "PRIMARY KEY (function, hash))")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def close(self):
+        """
+        Close the connection of the current process; it is reopened when needed.
+        """
+        if self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid = None
+
+    def get(self, function, hash):
+        """
+        Return the pair ``(key, value)`` stored for ``function`` and ``hash``, or ``None``.
+        """
+        row = self.connection().execute(
+            "SELECT key, value FROM results WHERE function=? AND hash=?",
+            (function, hash)).fetchone()
+        if row is None:
+            return None
+        return _persist().loads(str(row[0]), compress=False), _persist().loads(str(row[1]))
+
+    def get_key(self, function, hash):
+        """
+        Return the key stored for ``function`` and ``hash``, or ``None``, without loading the value.
+        """
+        row = self.connection().execute(
+            "SELECT key FROM results WHERE function=? AND hash=?",
+            (function, hash)).fetchone()
+        if row is None:
+            return None
+        return _persist().loads(str(row[0]), compress=False)
+
+    def contains(self, function, hash):
+        """
+        Return whether a value is stored for ``function`` and ``hash``, without loading it.
+        """
+        return self.connection().execute(
+            "SELECT 1 FROM results WHERE function=? AND hash=?",
+            (function, hash)).fetchone() is not None
+
+    def hashes(self, function):
+        """
+        Return the set of the hashes of the keys stored for ``function``, without loading the keys or the values.
+
+        EXAMPLES::
+
+            sage: from funcpersist import FuncPersistStore
+            sage: store = FuncPersistStore(tmp_dir())
+            sage: store.set("f", "1", (1,), 2)
+            sage: store.hashes("f"), store.contains("f", "1"), store.contains("f", "2")
+            (set(['1']), True, False)
+        """
+        return set(hash for (hash,) in self.connection().execute(
+            "SELECT hash FROM results WHERE function=?", (function,)))
+
+    def stamps(self, function):
+        """
+        Return a dictionary mapping the hashes of the keys stored for ``function`` to their stamps.
+
+        The stamp of a key changes each time its value is stored
+        again, e.g. by :meth:`func_persist.set_cache`. The values
+        stored before the stamps were introduced have none.
+
+        EXAMPLES::
+
+            sage: from funcpersist import FuncPersistStore
+            sage: store = FuncPersistStore(tmp_dir())
+            sage: store.set("f", "1", (1,), 2)
+            sage: stamps = store.stamps("f")
+            sage: store.set("f", "1", (1,), 3)
+            sage: stamps == store.stamps("f")
+            False
+        """
+        return dict(self.connection().execute(
+            "SELECT hash, stamp FROM stamps WHERE function=?", (function,)))
+
+    def get_provenance(self, function, hash):
+        """
+        Return the provenance stored for ``function`` and ``hash``, as a dictionary, or ``None``.
+        """
+        row = self.connection().execute(
+            "SELECT provenance FROM results WHERE function=? AND hash=?",
+            (function, hash)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def iterprovenance(self, function):
+        """
+        Iterate through the pairs ``(key, provenance)`` stored for ``function``, without loading the values.
+
+        The keys without provenance are skipped.
+        """
+        for (key, provenance) in self.connection().execute(
+                "SELECT key, provenance FROM results WHERE function=? AND provenance IS NOT NULL",
+                (function,)):
+            yield _persist().loads(str(key), compress=False), json.loads(provenance)
+
+    def set(self, function, hash, key, value, provenance=None):
+        """
+        Store ``(key, value)`` for ``function`` and ``hash``, in a single transaction.
+
+        ``provenance`` is a dictionary which can be serialized in JSON, or ``None``.
+        """
+        row = (function, hash,
+               sqlite3.Binary(_persist().dumps(key, compress=False)),
+               sqlite3.Binary(_persist().dumps(value)),
+               None if provenance is None else json.dumps(provenance, sort_keys=True))
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT OR REPLACE INTO results (function, hash, key, value, provenance) "
+                               "VALUES (?, ?, ?, ?, ?)", row)
+            connection.execute("INSERT OR REPLACE INTO stamps (function, hash, stamp) "
+                               "SELECT ?, ?, IFNULL(MAX(stamp), 0)+1 FROM stamps", (function, hash))
+        except:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def iterkeys(self, function, predicate=None):
+        """
+        Iterate through the keys stored for ``function``, without loading the values.
+
+        If ``predicate`` is not ``None``, only the keys satisfying it are returned.
+        """
+        for (key,) in self.connection().execute(
+                "SELECT key FROM results WHERE function=?", (function,)):
+            key = _persist().loads(str(key), compress=False)
+            if predicate is None or predicate(key):
+                yield key
+
+    def iteritems(self, function, predicate=None):
+        """
+        Iterate through the pairs ``(key, value)`` stored for ``function``.
+
+        If ``predicate`` is not ``None``, only the values whose key
+        satisfies it are loaded and returned.
+        """
+        connection = self.connection()
+        for (hash, key) in connection.execute(
+                "SELECT hash, key FROM results WHERE function=?", (function,)):
+            key = _persist().loads(str(key), compress=False)
+            if predicate is None or predicate(key):
+                (value,) = connection.execute(
+                    "SELECT value FROM results WHERE function=? AND hash=?",
+                    (function, hash)).fetchone()
+                yield key, _persist().loads(str(value))
+
+    def keys(self, function):
+        """
+        Return the list of the keys stored for ``function``, without loading the values.
+        """
+        return list(self.iterkeys(function))
+
+_stores = {}
+def store(dir):
+    """
+    Return the store of the directory ``dir``, creating it if needed.
+    """
+    dir = os.path.abspath(dir)
+    if dir not in _stores:
+        _stores[dir] = FuncPersistStore(dir)
+    return _stores[dir]
+
+def set_shared(shared=True):
+    """
+    Set whether the stores are shared by several machines, e.g. on a network file system.
+
+    The shared stores are used in rollback journal mode, without
+    memory mapping; this is slower, but safe when the processes
+    writing to a store don't share their memory. The connections of
+    the current process are reopened accordingly.
+
+    This is called by the workers of :mod:`jobqueue`. The stores are
+    also shared when the environment variable ``FUNC_PERSIST_SHARED``
+    is set when this module is imported.
+    """
+    global _shared
+    _shared = shared
+    for s in _stores.values():
+        s.close()
 
 class func_persist:
     r"""
@@ -11,21 +439,50 @@ class func_persist:
     definition to cache values it computes to disk.
 
     -- ``key`` - a function that normalizes the input arguments into a unique key
-    -- ``hash`` - a function that takes this key and make it into a string (will be used for the name of the file name storing the result) # TODO: file_name? cache_name?
+    -- ``hash`` - a function that takes this key and make it into a string (will be used as index in the store, and formerly for the name of the file storing the result)
                   TODO: Document that it shall be injective
+    -- ``maxsize`` - the maximal number of values kept in memory (default: 128); ``0`` to disable
+    -- ``version`` - a tag of the version of the algorithm, or ``None``; it is
+                     included in the keys, and shall be changed when the
+                     results of the function change
+    -- ``legacy`` - whether the former ``.sobj`` files, written before
+                    the function was versioned, hold values of the current
+                    version (default: ``False``); they are then imported
+                    with it. Remove it when changing the version.
 
+    To take into account all the options that change the results,
+    ``key`` can be built with :func:`options_key`.
     """
-    def __init__(self, f, dir='func_persist', prefix=None, hash=hash, key=None):
-        from sage.misc.misc import sage_makedirs
+    def __init__(self, f, dir='func_persist', prefix=None, hash=hash, key=None, maxsize=128, version=None, legacy=False):
         self._func = f
         self._dir  = dir
         if prefix is None:
             prefix = f.__name__
+        self._name = prefix
         self._prefix = dir+"/"+prefix
         self._hash = hash
         if key is not None:
             self.key = key
-        sage_makedirs(dir)
+        self._version = version
+        if version is not None:
+            unversioned_key = self.key
+            self.key = lambda *args, **kwds: (version, unversioned_key(*args, **kwds))
+            self._hash = lambda key: "v%s_%s"%(key[0], hash(key[1]))
+        self._legacy = legacy and version is not None
+        self._legacy_hash = hash
+        if not os.path.isdir(dir):
+            try:
+                os.makedirs(dir)
+            except OSError:
+                # Created meanwhile by another process
+                if not os.path.isdir(dir):
+                    raise
+        self._store = store(dir)
+        self._migrated = False
+        self._maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
         self.__doc__ = '%s%s%s'%(\
             f.__name__,
             inspect.formatargspec(*inspect.getargs(f.__code__)),
@@ -34,28 +491,276 @@ class func_persist:
     def key(self, *args, **kwds):
         return (tuple(args), tuple(kwds.items()))
 
-    def __call__(self, *args, **kwds):
-        key = self.key(*args, **kwds)
-        h = self._hash(key)
-        name = '%s_%s.sobj'%(self._prefix, h)
+    def _file_name(self, key):
+        """
+        Return the name of the ``.sobj`` file formerly used to store the value for ``key``.
+        """
+        if self._legacy:
+            # The former files were named after the unversioned key
+            return '%s_%s.sobj'%(self._prefix, self._legacy_hash(key[1]))
+        return '%s_%s.sobj'%(self._prefix, self._hash(key))
+
+    def _load_file(self, name):
+        """
+        Return the key and the value of the former ``.sobj`` file ``name``.
+
+        For a ``legacy`` function, the key is tagged with the current version.
+        """
+        key, val = _persist().load(name)
+        if self._legacy:
+            key = (self._version, key)
+        return key, val
+
+    def _remember(self, key, value):
+        """
+        Put ``value`` in the in-memory cache, evicting the least recently used value if needed.
+        """
+        if not self._maxsize:
+            return
+        try:
+            self._cache[key] = value
+        except TypeError: # unhashable key
+            return
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+
+    def cache_info(self):
+        """
+        Return the statistics of the in-memory cache.
+        """
+        return {'hits': self._hits, 'misses': self._misses,
+                'maxsize': self._maxsize, 'size': len(self._cache)}
 
+    def cache_clear(self):
+        """
+        Clear the in-memory cache and its statistics; the store is untouched.
+        """
+        self._cache.clear()
+        self._hits = self._misses = 0
+
+    def _lookup(self, key):
+        """
+        Return the pair ``(True, value)`` if a value is stored for ``key``, and ``(False, None)`` otherwise.
+
+        A value found in a former ``.sobj`` file is imported into the store.
+        """
+        try:
+            value = self._cache.pop(key)
+        except (KeyError, TypeError):
+            pass
+        else:
+            self._cache[key] = value
+            self._hits += 1
+            return True, value
+        self._misses += 1
+        h = str(self._hash(key))
+        result = self._store.get(self._name, h)
+        # We save and test equality of keys to avoid
+        # the (extremely remote) possibility of a hash
+        # collision.  Correctness is crucial in mathematics.
+        if result is not None and result[0] == key:
+            self._remember(key, result[1])
+            return True, result[1]
+        name = self._file_name(key)
         if os.path.exists(name):
-            key2, val = persist.load(name)
+            key2, val = self._load_file(name)
             if key == key2:
-                # We save and test equality of keys to avoid
-                # the (extremely remote) possibility of a hash
-                # collision.  Correctness is crucial in mathematics.
-                return val
+                self._store.set(self._name, h, key, val)
+                self._remember(key, val)
+                return True, val
+        return False, None
 
+    def __call__(self, *args, **kwds):
+        key = self.key(*args, **kwds)
+        found, val = self._lookup(key)
+        if found:
+            return val
+        wall_time = time.time()
+        cpu_time = time.clock()
         val = self._func(*args, **kwds)
-        persist.save((key, val), name)
+        provenance = {'version': self._version,
+                      'options': _json_options(self._func, args, kwds),
+                      'wall_time': time.time() - wall_time,
+                      'cpu_time': time.clock() - cpu_time,
+                      'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                      'host': platform.node(),
+                      'platform': platform.platform()}
+        self._store.set(self._name, str(self._hash(key)), key, val, provenance)
+        self._remember(key, val)
         return val
 
+    def provenance(self, *args, **kwds):
+        """
+        Return the provenance of the value stored for these arguments, or ``None``.
+
+        This is a dictionary with the version of the algorithm, the
+        options of the call (see :func:`options_key`; those which can't
+        be serialized in JSON are given by their representation), the
+        wall and cpu times of the computation (in seconds), its date,
+        and the machine it was run on. It is ``None`` for values stored
+        with :meth:`set_cache` or imported from former ``.sobj`` files.
+        """
+        key = self.key(*args, **kwds)
+        return self._store.get_provenance(self._name, str(self._hash(key)))
+
+    def iterprovenance(self):
+        """
+        Iterate through the pairs ``(key, provenance)`` of the computed values which have a provenance.
+
+        See :meth:`provenance`.
+        """
+        return self._store.iterprovenance(self._name)
+
+    def is_in_cache(self, *args, **kwds):
+        """
+        Return whether the value for these arguments is stored on disk.
+        """
+        key = self.key(*args, **kwds)
+        if self._store.get_key(self._name, str(self._hash(key))) == key:
+            return True
+        return self._lookup(key)[0]
+
+    def set_cache(self, value, *args, **kwds):
+        """
+        Store ``value`` on disk as the value for these arguments.
+        """
+        key = self.key(*args, **kwds)
+        self._store.set(self._name, str(self._hash(key)), key, value)
+        self._remember(key, value)
+
+    def migrate(self):
+        """
+        Import the values of the former ``.sobj`` files into the store.
+
+        The files are left in place. Files of other functions whose
+        name starts with the same prefix are skipped, by checking the
+        hash of their key. The files of an unversioned function are
+        only imported by a versioned one if it is ``legacy``.
+
+        OUTPUT: the number of imported values
+        """
+        imported = 0
+        for name in glob.glob("%s_*.sobj"%self._prefix):
+            h = name[len(self._prefix)+1:-len(".sobj")]
+            if self._legacy:
+                h = "v%s_%s"%(self._version, h)
+            if self._store.get_key(self._name, h) is not None:
+                continue
+            key, val = self._load_file(name)
+            try:
+                if name != self._file_name(key):
+                    continue
+            except Exception:
+                continue
+            self._store.set(self._name, h, key, val)
+            imported += 1
+        self._migrated = True
+        return imported
+
+    def iterkeys(self, predicate=None):
+        """
+        Iterate through the keys of the already computed values, without loading the values.
+
+        INPUT:
+
+        - ``predicate`` -- a function on keys, or ``None``; if
+          specified, only the keys satisfying it are returned
+        """
+        if not self._migrated:
+            self.migrate()
+        return self._store.iterkeys(self._name, predicate)
+
+    def iteritems(self, predicate=None):
+        """
+        Iterate through the already computed pairs ``(key, value)``.
+
+        INPUT:
+
+        - ``predicate`` -- a function on keys, or ``None``; if
+          specified, only the values whose key satisfies it are
+          loaded and returned
+        """
+        if not self._migrated:
+            self.migrate()
+        return self._store.iteritems(self._name, predicate)
+
+    def keys(self, predicate=None):
+        """
+        Return the keys of the already computed values, without loading the values.
+        """
+        return list(self.iterkeys(predicate))
+
+    def items(self, predicate=None):
+        """
+        Return the list of the already computed pairs ``(key, value)``.
+        """
+        return list(self.iteritems(predicate))
+
     def dict(self):
         """
         Return the already computed values
         """
-        import glob
-        return dict(persist.load(name)
-                    for name in glob.glob("%s*.sobj"%self._prefix))
+        return dict(self.iteritems())
+
+def options_key(f, args, kwds, ignore=("verbose",)):
+    """
+    Return the normalized full set of arguments of the call ``f(*args, **kwds)``.
+
+    INPUT:
+
+    - ``f`` -- a function, or a :class:`func_persist` wrapping it
+    - ``args``, ``kwds`` -- the arguments of the call
+    - ``ignore`` -- the names of the arguments which don't change the result
+
+    OUTPUT: the sorted tuple of the pairs ``(name, value)``, including
+    the default values of the arguments which are not specified
+
+    EXAMPLES::
+
+        sage: from funcpersist import options_key
+        sage: def f(mu, r=0, row_symmetry=None, verbose=False): pass
+        sage: options_key(f, ([2,1],), {'verbose': True})
+        (('mu', [2, 1]), ('r', 0), ('row_symmetry', None))
+        sage: options_key(f, ([2,1], 0), {}) == options_key(f, (), {'mu': [2,1], 'r': 0})
+        True
+    """
+    if isinstance(f, func_persist):
+        f = f._func
+    options = inspect.getcallargs(f, *args, **kwds)
+    return tuple(sorted((name, value) for name, value in options.iteritems()
+                        if name not in ignore))
+
+def _json_options(f, args, kwds):
+    """
+    Return the normalized options of the call ``f(*args, **kwds)``, as a dictionary which can be serialized in JSON, or ``None``.
+
+    See :func:`options_key`; the values which can't be serialized are
+    replaced by their representation.
+    """
+    try:
+        options = options_key(f, args, kwds)
+    except TypeError: # not a Python function
+        return None
+    result = {}
+    for name, value in options:
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            value = repr(value)
+        result[name] = value
+    return result
+
+def migrate(*functions):
+    """
+    Import the former ``.sobj`` files of the given :class:`func_persist` functions into their stores.
+
+    OUTPUT: a dictionary mapping the name of each function to the number of imported values
+
+    EXAMPLES::
+
+        sage: from character import harmonic_character_plain          # not tested
+        sage: migrate(harmonic_character_plain)                        # not tested
+        {'harmonic_character_plain': ...}
+    """
+    return {f._name: f.migrate() for f in functions}
 
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+Command line driver for the computation of the characters
+
+Computing the characters of all the isotypic components of the
+diagonal harmonic polynomials for `n=6`, on 8 processes, with a memory
+and time budget per job::
+
+    sage -python -m harmonic_modules compute --n 6 --kind harmonic --jobs 8 \
+        --memory-limit 16000 --time-limit 86400 --output harmonic6.jsonl
+
+and those of the module generated by the generalized Vandermonde
+determinant of `\mu = (2,2)`, with inert variables::
+
+    sage -python -m harmonic_modules compute --kind inert --mu 2,2 --antisymmetry \
+        --row-symmetry permutation
+
+The results are stored by :class:`func_persist`, so that an
+interrupted run is resumed by launching the same command again: the
+jobs whose result is stored are not run again. Each job is written as
+a line of JSON, in the order of completion, e.g.::
+
+    {"type": "job", "kind": "harmonic", "mu": [2, 1], "status": "done",
+     "character": [[[1], 1], [[2], 1]], "stats": {"wall_time": 0.3, ...}}
+
+followed by a summary line::
+
+    {"type": "summary", "jobs": 3, "status": {"cached": 1, "done": 2}, "wall_time": 1.2}
+
+The ``character`` of a job is the list of the pairs ``[shape,
+coefficient]`` of its `GL_r` character, and the ``stats`` are those of
+:func:`schedule`.
+
+The strategy is selected by ``--row-symmetry`` and ``--antisymmetry``.
+There is no option for computing the ranks modulo a prime: they are
+computed over `\QQ`. A rank modulo `p` is only a lower bound of the
+rational one, and the stored characters are keyed by the shapes alone
+(see :func:`harmonic_character_plain_key`), so that a character
+computed modulo `p` would be served as the rational one.
+
+For ``--kind harmonic``, the characters do not depend on the
+strategy, and a stored character is served whatever the strategy
+used to compute it. To run a given strategy on shapes whose character
+is stored, use ``--recompute``.
+
+EXAMPLES::
+
+    sage: from harmonic_modules import *
+    sage: import StringIO
+    sage: output = StringIO.StringIO()
+    sage: summary = compute("harmonic", n=3, ncpus=1, output=output)
+    sage: summary['jobs']
+    3
+    sage: records = [json.loads(line) for line in output.getvalue().splitlines()[:-1]]
+    sage: for record in sorted(records, key=lambda record: record['mu']):
+    ....:     print record['mu'], record['character']
+    [1, 1, 1] [[[1, 1], 1], [[3], 1]]
+    [2, 1] [[[1], 1], [[2], 1]]
+    [3] [[[], 1]]
+
+With ``recompute=True``, the stored results are computed again::
+
+    sage: output = StringIO.StringIO()
+    sage: summary = compute("inert", mu=[2,1], ncpus=1, recompute=True, output=output)
+    sage: summary['status']
+    {'done': 3}
+    sage: records = [json.loads(line) for line in output.getvalue().splitlines()]
+    sage: for record in sorted(records[:-1], key=lambda record: record['nu']):
+    ....:     print record['nu'], record['status'], record['character']
+    [1, 1, 1] done [[[1], 1]]
+    [2, 1] done [[[], 1]]
+    [3] done []
+
+The workers write nothing else on the standard output, so that it can
+be parsed line by line; here with an empty store::
+
+    sage: import os, subprocess, sys
+    sage: import harmonic_modules
+    sage: env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(harmonic_modules.__file__)))
+    sage: lines = subprocess.check_output([sys.executable, "-m", "harmonic_modules", "compute",
+    ....:                                  "--kind", "inert", "--mu", "2,1", "--jobs", "1"],
+    ....:                                 cwd=tmp_dir(), env=env).splitlines()
+    sage: records = [json.loads(line) for line in lines]
+    sage: [record['status'] for record in records[:-1]]
+    [u'done', u'done', u'done']
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from scheduler import register_task, tasks, schedule
+
+# Sage and the computations are only imported once the command line is
+# parsed, so that the help and the argument errors are immediate
+
+def _harmonic_character(mu, row_symmetry):
+    from character import harmonic_character_plain
+    return harmonic_character_plain(mu, row_symmetry=row_symmetry)
+
+def _harmonic_character_is_cached(mu, row_symmetry):
+    # The character does not depend on the strategy
+    from character import harmonic_character_plain
+    return harmonic_character_plain.is_in_cache(mu)
+
+register_task("harmonic_character_by_strategy", _harmonic_character,
+              cost=lambda mu, row_symmetry: tasks["harmonic_character_plain"].estimate_cost((mu,)),
+              is_cached=_harmonic_character_is_cached)
+
+def parse_partition(s):
+    """
+    Return the partition given as a string of comma separated parts.
+
+    EXAMPLES::
+
+        sage: from harmonic_modules import parse_partition
+        sage: parse_partition("3,2,1")
+        [3, 2, 1]
+        sage: parse_partition("")
+        []
+    """
+    from sage.combinat.partition import Partition
+    return Partition([int(i) for i in s.split(",") if i.strip()])
+
+def jobs(kind, n=None, mu=None, row_symmetry=None, use_antisymmetry=False, inert=1):
+    """
+    Return the jobs computing the characters of ``kind``, as pairs ``(task, args)``.
+
+    INPUT:
+
+    - ``kind`` -- ``"harmonic"`` or ``"inert"``
+    - ``n`` -- an integer
+    - ``mu`` -- a partition, or ``None``
+    - ``row_symmetry``, ``use_antisymmetry`` -- the strategy
+
+    For ``kind="harmonic"``, there is one job per `S_n` isotypic
+    component of the diagonal harmonic polynomials (see
+    :func:`harmonic_character_plain`), or just the one of `\mu` if
+    given; ``row_symmetry`` defaults to ``"permutation"``, and
+    ``use_antisymmetry`` is not supported.
+
+    For ``kind="inert"``, there is one job per `S_n` isotypic
+    component of the module generated by the generalized Vandermonde
+    determinant of ``mu``, with ``inert`` sets of inert variables
+    (see :func:`character_by_isotypic_plain`).
+
+    EXAMPLES::
+
+        sage: from harmonic_modules import jobs
+        sage: jobs("harmonic", 3)
+        [('harmonic_character_by_strategy', ((3,), 'permutation')),
+         ('harmonic_character_by_strategy', ((2, 1), 'permutation')),
+         ('harmonic_character_by_strategy', ((1, 1, 1), 'permutation'))]
+        sage: jobs("inert", mu=[2,1])
+        [('character_by_isotypic_plain', ([2, 1], [3], 1, 0, False, None)),
+         ('character_by_isotypic_plain', ([2, 1], [2, 1], 1, 0, False, None)),
+         ('character_by_isotypic_plain', ([2, 1], [1, 1, 1], 1, 0, False, None))]
+    """
+    from sage.combinat.partition import Partition, Partitions
+    import character # registers the tasks
+    if kind == "harmonic":
+        if use_antisymmetry:
+            raise ValueError("use_antisymmetry is only supported for kind='inert'")
+        if row_symmetry is None:
+            row_symmetry = "permutation"
+        if mu is not None:
+            shapes = [Partition(mu)]
+        else:
+            shapes = Partitions(n)
+        return [("harmonic_character_by_strategy", (tuple(nu), row_symmetry)) for nu in shapes]
+    elif kind == "inert":
+        if mu is None:
+            raise ValueError("mu must be specified for kind='inert'")
+        mu = Partition(mu)
+        if n is not None and n != mu.size():
+            raise ValueError("mu should be a partition of n")
+        return [("character_by_isotypic_plain", (mu, nu, inert, 0, use_antisymmetry, row_symmetry))
+                for nu in Partitions(mu.size())]
+    raise ValueError("kind should be 'harmonic' or 'inert'")
+
+def job_record(kind, job, result, stats):
+    """
+    Return the description of a job run by :func:`schedule`, as a dictionary which can be serialized in JSON.
+    """
+    record = {'type': 'job', 'kind': kind, 'status': stats['status'],
+              'mu': [int(i) for i in job.args[0]]}
+    if kind == "inert":
+        record['nu'] = [int(i) for i in job.args[1]]
+    if result is not None:
+        # character_by_isotypic_plain returns 0 for an empty component
+        record['character'] = sorted([[int(i) for i in shape], int(c)]
+                                     for shape, c in (result or {}).iteritems())
+    record['stats'] = {key: float(value) if key == 'estimated_cost' else value
+                       for key, value in stats.iteritems() if key != 'status'}
+    return record
+
+def compute(kind, n=None, mu=None, row_symmetry=None, use_antisymmetry=False, inert=1,
+            ncpus=None, memory_limit=None, time_limit=None, warm=False, recompute=False, output=sys.stdout):
+    """
+    Run the jobs computing the characters of ``kind``, and write their results as lines of JSON.
+
+    INPUT:
+
+    - ``kind``, ``n``, ``mu``, ``row_symmetry``, ``use_antisymmetry``,
+      ``inert`` -- see :func:`jobs`
+    - ``ncpus``, ``memory_limit``, ``time_limit``, ``warm`` -- see :func:`schedule`
+    - ``recompute`` -- whether to run again the jobs whose result is stored
+    - ``output`` -- a file
+
+    Unless ``recompute`` is set, the jobs whose result is already
+    stored are not run again; they are reported with the status
+    ``"cached"``.
+
+    OUTPUT: the summary, which is also written as the last line
+    """
+    start = time.time()
+    status = {}
+    for job, result, stats in schedule(jobs(kind, n, mu, row_symmetry, use_antisymmetry, inert),
+                                       ncpus=ncpus, memory_limit=memory_limit,
+                                       time_limit=time_limit, warm=warm,
+                                       skip_cached=not recompute):
+        status[stats['status']] = status.get(stats['status'], 0) + 1
+        output.write(json.dumps(job_record(kind, job, result, stats), sort_keys=True) + "\n")
+        output.flush()
+    summary = {'type': 'summary',
+               'jobs': sum(status.values()),
+               'status': status,
+               'wall_time': time.time() - start}
+    output.write(json.dumps(summary, sort_keys=True) + "\n")
+    output.flush()
+    return summary
+
+def main(argv=None):
+    """
+    Run the command line driver; see the documentation of the module.
+
+    OUTPUT: the exit status: ``0`` if all the jobs are done, ``1`` otherwise
+    """
+    parser = argparse.ArgumentParser(prog="harmonic_modules",
+                                     description="Compute characters of harmonic modules")
+    commands = parser.add_subparsers(dest="command")
+    parser_compute = commands.add_parser("compute", help="compute and store characters")
+    parser_compute.add_argument("--n", type=int, default=None, help="the size of the partitions")
+    parser_compute.add_argument("--kind", choices=["harmonic", "inert"], default="harmonic")
+    parser_compute.add_argument("--mu", type=parse_partition, default=None,
+                                help="a partition, e.g. 3,2,1")
+    parser_compute.add_argument("--jobs", type=int, default=None,
+                                help="the number of processes (default: the number of cpus)")
+    parser_compute.add_argument("--memory-limit", type=int, default=None,
+                                help="the maximal memory of each job, in MB")
+    parser_compute.add_argument("--time-limit", type=float, default=None,
+                                help="the maximal wall time of each job, in seconds")
+    parser_compute.add_argument("--row-symmetry", default=None,
+                                choices=["permutation", "euler+intersection", "decompose", "multipolarization"],
+                                help="the strategy (default: permutation for kind harmonic); "
+                                "for kind harmonic, the stored characters are served whatever "
+                                "the strategy which computed them: use --recompute to run it anyway")
+    parser_compute.add_argument("--antisymmetry", action="store_true",
+                                help="use the antisymmetries of the isotypic components (kind inert)")
+    parser_compute.add_argument("--inert", type=int, default=1,
+                                help="the number of sets of inert variables (kind inert)")
+    parser_compute.add_argument("--warm", action="store_true",
+                                help="use long-lived workers")
+    parser_compute.add_argument("--recompute", action="store_true",
+                                help="compute again the stored results")
+    parser_compute.add_argument("--output", default=None,
+                                help="the file to append the results to (default: the standard output)")
+    options = parser.parse_args(argv)
+    if options.n is None and options.mu is None:
+        parser.error("--n or --mu is required")
+    output = sys.stdout if options.output is None else open(options.output, "a")
+    try:
+        summary = compute(options.kind, n=options.n, mu=options.mu,
+                          row_symmetry=options.row_symmetry,
+                          use_antisymmetry=options.antisymmetry,
+                          inert=options.inert,
+                          ncpus=options.jobs,
+                          memory_limit=None if options.memory_limit is None else options.memory_limit * 2**20,
+                          time_limit=options.time_limit,
+                          warm=options.warm,
+                          recompute=options.recompute,
+                          output=output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0 if set(summary['status']) <= set(['done', 'cached']) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+A job queue shared by several machines
+
+The jobs are stored in a SQLite database, which can be put on a file
+system shared by several machines. Any number of workers, on any
+machine, claim the jobs from the most expensive to the cheapest, run
+them, and mark them as completed. Their results are written by the
+tasks themselves in the result store of :class:`func_persist`, which
+shall then be shared as well.
+
+A claimed job is leased to its worker for some time; the worker
+renews the lease regularly (heartbeat) while running the job. If the
+worker is killed, the lease expires and the job can be claimed again
+by another worker.
+
+As in :mod:`scheduler`, the jobs are pairs ``(task, args)`` where
+``task`` is the name of a registered task (see :func:`register_task`).
+
+.. NOTE::
+
+    SQLite relies on the locks of the file system, which are not
+    reliable on all network file systems; the database is therefore
+    used in the default rollback journal mode, and not in WAL mode.
+    For the same reason, :func:`work` and :func:`run_on_queue` switch
+    the result stores of :class:`func_persist` to that mode (see
+    :func:`set_shared`), unless ``shared=False``.
+
+Running a worker from the command line, in the directory of the
+shared queue and result store::
+
+    sage -python jobqueue.py --import character queue.db
+
+EXAMPLES::
+
+    sage: from jobqueue import *
+    sage: from scheduler import register_task
+    sage: import multiprocessing, os, time
+    sage: _ = register_task("square", lambda x: x^2, cost=lambda x: x)
+    sage: queue = JobQueue(os.path.join(tmp_dir(), "queue.db"))
+    sage: [queue.submit("square", (i,)) for i in range(3)]
+    [1, 2, 3]
+    sage: queue.submit("square", (1,))
+    2
+    sage: job = queue.claim("worker 1", lease=0.1)
+    sage: job
+    (3, 'square', (2,))
+    sage: time.sleep(0.2)
+
+The lease of the first worker has expired; the job is claimed again::
+
+    sage: queue.claim("worker 2")
+    (3, 'square', (2,))
+    sage: queue.heartbeat(3, "worker 1")
+    False
+    sage: queue.complete(3, "worker 2")
+    True
+    sage: queue.counts()
+    {'done': 1, 'pending': 2}
+
+Several worker processes on the same machine::
+
+    sage: workers = [multiprocessing.Process(target=work, args=(queue.path, "worker %s"%i))
+    ....:            for i in range(3)]
+    sage: for w in workers: w.start()
+    sage: for w in workers: w.join()
+    sage: queue.counts()
+    {'done': 3}
+
+A worker killed while running a job stops renewing its lease, which
+then expires; until then, the job is not claimed by the other workers::
+
+    sage: import signal
+    sage: _ = register_task("sleep", lambda x: time.sleep(x), cost=lambda x: x)
+    sage: queue = JobQueue(os.path.join(tmp_dir(), "queue.db"))
+    sage: queue.submit("sleep", (60,))
+    1
+    sage: worker = multiprocessing.Process(target=work, args=(queue.path, "worker 1", 1))
+    sage: worker.start()
+    sage: while queue.status([1])[1] != 'running': time.sleep(0.1)
+    sage: time.sleep(2)
+    sage: queue.claim("worker 2") is None
+    True
+    sage: os.kill(worker.pid, signal.SIGKILL); worker.join()
+    sage: queue.claim("worker 2") is None
+    True
+    sage: time.sleep(1.5)
+    sage: queue.claim("worker 2")
+    (1, 'sleep', (60,))
+    sage: queue.heartbeat(1, "worker 1")
+    False
+    sage: queue.complete(1, "worker 2")
+    True
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import threading
+import time
+
+from funcpersist import _persist, set_shared
+from scheduler import tasks, register_task, format_stats, _run_job
+
+__all__ = ["JobQueue", "work", "run_on_queue"]
+
+class JobQueue(object):
+    """
+    A queue of jobs stored in the SQLite database ``path``.
+
+    The connection is reopened after a fork, as SQLite connections
+    can't be shared between processes.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    def connection(self):
+        """
+        Return the connection to the database for the current process.
+        """
+        if self._pid != os.getpid():
+            # Autocommit mode: the transactions are explicit
+            connection = sqlite3.connect(self.path, timeout=600, isolation_level=None)
+            connection.text_factory = str
+            connection.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                               "id INTEGER PRIMARY KEY, "
+                               "task TEXT NOT NULL, args BLOB NOT NULL, "
+                               "key TEXT NOT NULL UNIQUE, "
+                               "priority REAL NOT NULL, "
+                               "status TEXT NOT NULL, "
+                               "worker TEXT, lease_expires REAL, "
+                               "attempts INTEGER NOT NULL DEFAULT 0, "
+                               "stats TEXT)")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority)")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _transaction(self, f):
+        """
+        Run ``f(connection)`` in a transaction holding the write lock, and return its result.
+        """
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = f(connection)
+        except:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    def submit(self, task, args, priority=None):
+        """
+        Add the job ``(task, args)`` to the queue, and return its id.
+
+        If the job is already in the queue, it is not added again.
+        The jobs with the highest ``priority`` are claimed first; by
+        default, this is the cost estimated by the task.
+        """
+        args = tuple(args)
+        if priority is None:
+            priority = tasks[task].estimate_cost(args)
+        key = "%s%s"%(task, args)
+        def submit(connection):
+            connection.execute("INSERT OR IGNORE INTO jobs (task, args, key, priority, status) "
+                               "VALUES (?, ?, ?, ?, 'pending')",
+                               (task, sqlite3.Binary(_persist().dumps(args)), key, float(priority)))
+            return connection.execute("SELECT id FROM jobs WHERE key=?", (key,)).fetchone()[0]
+        return self._transaction(submit)
+
+    def claim(self, worker, lease=600):
+        """
+        Claim the pending job of highest priority for ``worker``.
+
+        INPUT:
+
+        - ``worker`` -- a string identifying the worker
+        - ``lease`` -- the duration of the lease, in seconds
+
+        The jobs whose lease has expired are put back in the queue
+        beforehand.
+
+        OUTPUT: the triple ``(id, task, args)``, or ``None`` if there is no pending job
+        """
+        def claim(connection):
+            now = time.time()
+            connection.execute("UPDATE jobs SET status='pending', worker=NULL "
+                               "WHERE status='running' AND lease_expires<?", (now,))
+            row = connection.execute("SELECT id, task, args FROM jobs WHERE status='pending' "
+                                     "ORDER BY priority DESC, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE jobs SET status='running', worker=?, lease_expires=?, "
+                               "attempts=attempts+1 WHERE id=?", (worker, now+lease, row[0]))
+            return row[0], row[1], _persist().loads(str(row[2]))
+        return self._transaction(claim)
+
+    def heartbeat(self, id, worker, lease=600):
+        """
+        Renew the lease of the job ``id`` by ``worker``.
+
+        OUTPUT: whether the job is still leased to ``worker``
+        """
+        def heartbeat(connection):
+            return connection.execute("UPDATE jobs SET lease_expires=? "
+                                      "WHERE id=? AND worker=? AND status='running'",
+                                      (time.time()+lease, id, worker)).rowcount == 1
+        return self._transaction(heartbeat)
+
+    def complete(self, id, worker, stats=None, status='done'):
+        """
+        Mark the job ``id`` as completed by ``worker``.
+
+        INPUT:
+
+        - ``stats`` -- a dictionary which can be serialized in JSON, or ``None``
+        - ``status`` -- ``'done'`` or ``'failed'``
+
+        OUTPUT: whether the job was still leased to ``worker``; if
+        not, it is left untouched
+        """
+        def complete(connection):
+            return connection.execute("UPDATE jobs SET status=?, stats=?, lease_expires=NULL "
+                                      "WHERE id=? AND worker=? AND status='running'",
+                                      (status, None if stats is None else json.dumps(stats), id, worker)).rowcount == 1
+        return self._transaction(complete)
+
+    def counts(self):
+        """
+        Return the number of jobs by status.
+        """
+        return dict(self.connection().execute("SELECT status, count(*) FROM jobs GROUP BY status"))
+
+    def status(self, ids):
+        """
+        Return the status of the jobs ``ids``, as a dictionary.
+        """
+        ids = list(ids)
+        return {id: status for id, status in self.connection().execute(
+            "SELECT id, status FROM jobs WHERE id IN (%s)"%",".join("?"*len(ids)), ids)}
+
+    def stats(self, id):
+        """
+        Return the statistics recorded when the job ``id`` was completed, or ``None``.
+        """
+        (stats,) = self.connection().execute("SELECT stats FROM jobs WHERE id=?", (id,)).fetchone()
+        return None if stats is None else json.loads(stats)
+
+def _heartbeats(path, id, worker, lease, stop):
+    """
+    Renew the lease of a job every third of its duration, until ``stop`` is set.
+    """
+    queue = JobQueue(path)
+    while not stop.wait(lease/3.):
+        queue.heartbeat(id, worker, lease)
+
+def work(path, worker=None, lease=600, max_jobs=None, verbose=False, shared=True):
+    """
+    Run the jobs of the queue ``path`` until there are no pending jobs left.
+
+    INPUT:
+
+    - ``path`` -- the path of the queue (see :class:`JobQueue`)
+    - ``worker`` -- a string identifying the worker (default: the
+      host name and process id)
+    - ``lease`` -- the duration of the leases, in seconds; they are
+      renewed every third of it while the job is running
+    - ``max_jobs`` -- the maximal number of jobs to run, or ``None``
+    - ``shared`` -- whether the result stores are shared with other
+      machines (default: ``True``); see :func:`set_shared`
+
+    The jobs whose result is already stored are completed without
+    being run. A job raising an exception is marked as failed, and
+    not claimed again.
+
+    OUTPUT: the number of jobs run
+    """
+    if worker is None:
+        worker = "%s:%s"%(platform.node(), os.getpid())
+    set_shared(shared)
+    queue = JobQueue(path)
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        job = queue.claim(worker, lease)
+        if job is None:
+            break
+        id, task, args = job
+        if tasks[task].is_cached is not None and tasks[task].is_cached(*args):
+            queue.complete(id, worker, {'status': 'cached'})
+            continue
+        stop = threading.Event()
+        heartbeats = threading.Thread(target=_heartbeats, args=(path, id, worker, lease, stop))
+        heartbeats.daemon = True
+        heartbeats.start()
+        try:
+            _, _, stats = _run_job((id, task, args, None, None))
+        finally:
+            stop.set()
+            heartbeats.join()
+        stats['worker'] = worker
+        queue.complete(id, worker, stats, status='done' if stats['status'] == 'done' else 'failed')
+        if verbose:
+            print "%s%s"%(task, args), format_stats(stats)
+        done += 1
+    return done
+
+def run_on_queue(path, jobs, work_locally=True, poll=10, lease=600, shared=True):
+    """
+    Submit the jobs to the queue ``path``, wait for their completion, and return their results.
+
+    INPUT:
+
+    - ``jobs`` -- a list of pairs ``(task, args)``
+    - ``work_locally`` -- whether the current process shall run jobs of the queue while waiting
+    - ``poll`` -- the delay between two checks of the completion of the jobs, in seconds
+    - ``lease``, ``shared`` -- see :func:`work`
+
+    The results are read back from the stored values of the tasks,
+    which shall thus be :class:`func_persist` functions.
+
+    OUTPUT: the list of the results, in the order of ``jobs``
+
+    EXAMPLES::
+
+        sage: from jobqueue import *
+        sage: from scheduler import register_task
+        sage: from funcpersist import func_persist
+        sage: import os
+        sage: f = func_persist(lambda x: x+1, dir=tmp_dir(), hash=str)
+        sage: _ = register_task("increment", f, is_cached=f.is_in_cache)
+        sage: run_on_queue(os.path.join(tmp_dir(), "queue.db"), [("increment", (i,)) for i in range(3)])
+        [1, 2, 3]
+    """
+    set_shared(shared)
+    queue = JobQueue(path)
+    ids = [queue.submit(task, args) for task, args in jobs]
+    while True:
+        if work_locally:
+            work(path, lease=lease, shared=shared)
+        status = queue.status(ids)
+        failed = [id for id in ids if status[id] == 'failed']
+        if failed:
+            raise RuntimeError("jobs %s failed: %s"%(failed, [queue.stats(id)['status'] for id in failed]))
+        if all(status[id] == 'done' for id in ids):
+            break
+        time.sleep(poll)
+    return [tasks[task].function(*args) for task, args in jobs]
+
+if __name__ == "__main__":
+    import argparse
+    import importlib
+    parser = argparse.ArgumentParser(description="Run the jobs of a queue")
+    parser.add_argument("queue", help="the path of the queue")
+    parser.add_argument("--import", dest="modules", action="append", default=[],
+                        help="a module registering the tasks, e.g. character")
+    parser.add_argument("--lease", type=float, default=600, help="the duration of the leases, in seconds")
+    parser.add_argument("--max-jobs", type=int, default=None)
+    options = parser.parse_args()
+    for module in options.modules:
+        importlib.import_module(module)
+    work(options.queue, lease=options.lease, max_jobs=options.max_jobs, verbose=True)
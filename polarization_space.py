@@ -4,16 +4,106 @@
 from sage.combinat.sf.sf import SymmetricFunctions
 from sage.combinat.ranker import rank_from_list
 
+from funcpersist import func_persist
+from scheduler import register_task, schedule
 from diagonal_polynomial_ring import *
 from add_degree import *
 
+####################################################
+# Characters from dimensions in dominant degrees
+####################################################
+
+def inverse_kostka_table_plain(d, r):
+    """
+    Return the expansion in the Schur basis of the monomial symmetric
+    functions of degree `d` in `r` variables.
+
+    OUTPUT: a dictionary ``{la: {mu: c}}`` such that
+    `m_\lambda = \sum_\mu c_\mu s_\mu` in `r` variables, for `\lambda`
+    and `\mu` partitions of `d` of length at most `r`.
+
+    The coefficients are those of the inverse of the Kostka matrix.
+    The tables are stored on disk, with key `(d, r)`.
+
+    EXAMPLES::
+
+        sage: sorted(inverse_kostka_table_plain(2, 2).items())
+        [((1, 1), {(1, 1): 1}), ((2,), {(1, 1): -1, (2,): 1})]
+        sage: inverse_kostka_table_plain(2, 1)
+        {(2,): {(2,): 1}}
+    """
+    S = SymmetricFunctions(QQ)
+    s = S.s()
+    m = S.m()
+    return {tuple(la): {tuple(mu): c for mu, c in s(m[la]) if len(mu) <= r}
+            for la in Partitions(d, max_length=r)}
+
+def inverse_kostka_table_plain_key(d, r):
+    return (d, r)
+def inverse_kostka_table_plain_hash(key):
+    return "%s_%s"%key
+inverse_kostka_table_plain = func_persist(inverse_kostka_table_plain,
+                                          hash=inverse_kostka_table_plain_hash,
+                                          key=inverse_kostka_table_plain_key)
+
+@cached_function
+def inverse_kostka_table(d, r):
+    """
+    Return the table of :func:`inverse_kostka_table_plain`, kept in memory.
+
+    EXAMPLES::
+
+        sage: inverse_kostka_table(3, 2)[(2, 1)]
+        {(2, 1): 1}
+    """
+    return inverse_kostka_table_plain(d, r)
+
+def schur_coefficients(dimensions, r):
+    """
+    Return the Schur expansion of a character given by its weight multiplicities.
+
+    INPUT:
+
+    - ``dimensions`` -- a dictionary ``{degree: dim}`` where the
+      degrees are dominant (weakly decreasing) multidegrees
+    - `r` -- a nonnegative integer
+
+    OUTPUT: a dictionary ``{mu: c}`` such that
+    `\sum_\lambda \dim_\lambda m_\lambda = \sum_\mu c_\mu s_\mu`
+    in `r` variables, indexed by tuples
+
+    The expansion goes through the tables of :func:`inverse_kostka_table`,
+    once per character instead of converting each degree separately.
+
+    EXAMPLES::
+
+        sage: sorted(schur_coefficients({(2,0): 1, (1,1): 2}, 2).items())
+        [((1, 1), 1), ((2,), 1)]
+        sage: sorted(schur_coefficients({(1,1,1): 1, (3,0,0): 1}, 2).items())
+        [((2, 1), -1), ((3,), 1)]
+
+    Timing of the bicharacter of `n=6` (with an empty cache)::
+
+        sage: %time character_with_inert(Partition([3,2,1]), row_symmetry="permutation")   # not tested
+    """
+    result = {}
+    for la, c in dimensions.iteritems():
+        if not c:
+            continue
+        la = tuple(Partition(la))
+        if len(la) > r:
+            continue
+        for mu, k in inverse_kostka_table(sum(la), r)[la].iteritems():
+            result[mu] = result.get(mu, 0) + c * k
+    return {mu: c for mu, c in result.iteritems() if c}
+
 ####################################################
 # Polarization Space
 ####################################################
 
 #TODO use_symmetry a implementer
 
-def polarizationSpace(P, generators, verbose=False, row_symmetry=None, use_commutativity=False, side="down"):
+def polarizationSpace(P, generators, verbose=False, row_symmetry=None, use_commutativity=False, side="down", new_rows_from=None, minimal_operators=False, closed=False):
     """
     Starting from  polynomials (generators)of the polynomial ring in one 
     set of variables (possibly with additional inert variables), constructs
@@ -27,9 +117,39 @@ def polarizationSpace(P, generators, verbose=False, row_symmetry=None, use_commu
     
         - `P` -- a diagonal polynomial ring (or assymmetric version)
         - `generators`: polynomials in one set of variables (and possibly inert variables) 
+        - ``new_rows_from`` -- an integer `r_0` or :obj:`None` (default):
+          if given, the generators are assumed to be stable under the
+          operators acting only on the first `r_0` rows, and only the
+          operators involving the other rows are applied to them
+          (see :func:`polarization_space_add_row`); not supported
+          with ``row_symmetry="multipolarization"``, for which a
+          :class:`ValueError` is raised
+        - ``use_commutativity`` -- ``False``, ``True`` or ``"pbw"``:
+          if ``True``, only the words of operators with sorted ranks
+          are applied; if ``"pbw"``, only the consecutive operators of
+          degree `1` are required to be sorted: they span the Lie
+          algebra of lower triangular matrices of `gl_r`, so that
+          by Poincaré-Birkhoff-Witt, any other order differs from the
+          sorted one by shorter words. This requires the operators of
+          degree `1` to span this whole Lie algebra, so ``"pbw"`` can't
+          be used with ``minimal_operators``; a :class:`ValueError` is
+          raised then
+        - ``minimal_operators`` -- a boolean (default: ``False``):
+          whether to only use the polarization operators between
+          adjacent rows (see :func:`polarization_operators_by_multidegree`);
+          only for ``row_symmetry=None``
+        - ``closed`` -- a boolean (default: ``False``): whether the
+          generators already span a space stable under the operators;
+          then no operator is applied to them, and only their ranks
+          are computed (see :func:`polarization_space_by_generator_degree`);
+          not supported with ``row_symmetry="multipolarization"``, for
+          which a :class:`ValueError` is raised
             
     OUTPUT: `F`  -- a Subspace
 
+    See :func:`verify_polarization_space` to compare the result with
+    the full set of operators and unrestricted words.
+
     EXAMPLES::
         sage: load("derivative_space.py")
         sage: P = DiagonalPolynomialRing(QQ, 3, 2, inert=1)
@@ -94,35 +214,56 @@ def polarizationSpace(P, generators, verbose=False, row_symmetry=None, use_commu
                                    for d,c in dimensions.iteritems() if c)
     elif row_symmetry == "permutation":
         def hilbert_parent(dimensions):
-            return s(m.sum_of_terms([Partition(d), c]
-                                     for d,c in dimensions.iteritems())
-                    ).restrict_partition_lengths(r, exact=False)
+            return s.sum_of_terms([Partition(mu), c]
+                                  for mu, c in schur_coefficients(dimensions, r).iteritems())
     else:
         def hilbert_parent(dimensions):
             return s(S.from_polynomial(P._hilbert_parent(dimensions))
                     ).restrict_partition_lengths(r,exact=False)
 
-    operators = polarization_operators_by_multidegree(P, side=side, row_symmetry=row_symmetry, min_degree=1 if row_symmetry and row_symmetry!="permutation" else 0)
+    if minimal_operators and row_symmetry is not None:
+        raise ValueError("minimal_operators is only valid with row_symmetry=None")
+    if minimal_operators and use_commutativity == "pbw":
+        # The operators between adjacent rows only generate the Lie
+        # algebra: the words in the other operators are needed
+        raise ValueError("use_commutativity='pbw' is not valid with minimal_operators")
+    operators = polarization_operators_by_multidegree(P, side=side, row_symmetry=row_symmetry, min_degree=1 if row_symmetry and row_symmetry!="permutation" else 0,
+                                                      minimal=minimal_operators)
     #ajout operateurs Steenrod
     #for i in range(1, r):
     #    for d in [2,3]:
     #        operators[P._grading_set((-d+1 if j==i else 0 for j in range(0,r)))] = [functools.partial(P.steenrod_op, i=i, k=d)]
     
+    # e and f images shared by the Lie strategies
+    cache = {}
     if row_symmetry == "euler+intersection":
+        def euler(v, i):
+            return P._polarization_cached(P._polarization_cached(v, i+1, i, cache), i, i+1, cache)
         operators[P._grading_set.zero()] = [
-            functools.partial(lambda v,i: P.polarization(P.polarization(v, i+1, i, 1, antisymmetries=antisymmetries), i, i+1, 1, antisymmetries=antisymmetries), i=i)
+            functools.partial(euler, i=i)
             for i in range(r-1)]
     elif row_symmetry == "decompose":
+        # The highest weight components are dispatched in their own
+        # multidegree (see Subspace)
         def post_compose(f):
-            return lambda x: [q for (q,word) in P.highest_weight_vectors_decomposition(f(x))]
+            def op(x):
+                result = {}
+                y = f(x)
+                if y:
+                    for (q, word) in P.highest_weight_vectors_decompositions([y])[0]:
+                        result.setdefault(P.multidegree(q), []).append(q)
+                return result
+            return op
         operators = {d: [post_compose(op) for op in ops]for d, ops in operators.iteritems()}
     elif row_symmetry == "multipolarization":
-        F = HighestWeightSubspace(generators,
-                 ambient=self,
-                 add_degrees=add_degree, degree=P.multidegree,
+        if new_rows_from is not None:
+            raise ValueError("new_rows_from is not supported with row_symmetry='multipolarization'")
+        if closed:
+            raise ValueError("closed is not supported with row_symmetry='multipolarization'")
+        F = HighestWeightSubspace(generators, P,
                  hilbert_parent = hilbert_parent,
-                 antisymmetries=antisymmetries,
                  verbose=verbose)
+        F._antisymmetries = antisymmetries
         return F
         
     operators_by_degree = {}
@@ -138,7 +279,12 @@ def polarizationSpace(P, generators, verbose=False, row_symmetry=None, use_commu
             ranks[op] = (d, ranker(op))
     ranker = ranks.__getitem__
     def extend_word(word, op):
-        new_word = word + [ranker(op)]
+        rank = ranker(op)
+        if use_commutativity == "pbw":
+            if word and rank[0] == 0 and word[-1][0] == 0 and rank < word[-1]:
+                return None
+            return word + [rank]
+        new_word = word + [rank]
         if use_commutativity and sorted(new_word) != new_word:
             return None
         return new_word
@@ -147,12 +293,234 @@ def polarizationSpace(P, generators, verbose=False, row_symmetry=None, use_commu
         add_deg = add_degree_symmetric
     else:
         add_deg = add_degree
+
+    if closed:
+        generator_operators = {}
+    elif new_rows_from is None:
+        generator_operators = None
+    else:
+        # The operators of degree zero are kept, as they are not
+        # attached to specific rows
+        generator_operators = {d: ops for d, ops in operators.iteritems()
+                               if not any(d) or any(d[i] for i in range(new_rows_from, r))}
     
     F = Subspace(generators, operators=operators,
                  add_degrees=add_deg, degree=P.multidegree,
                  hilbert_parent = hilbert_parent,
-                 extend_word=extend_word, verbose=verbose) 
+                 extend_word=extend_word,
+                 generator_operators=generator_operators,
+                 verbose=verbose) 
     F._antisymmetries = antisymmetries
+    F._polarization_cache = cache
+    F._ring = P
+    F._polarization_options = dict(row_symmetry=row_symmetry,
+                                   use_commutativity=use_commutativity,
+                                   side=side,
+                                   minimal_operators=minimal_operators)
+    return F
+
+def verify_polarization_space(P, generators, **options):
+    """
+    Compare a polarization space with the one computed with all the operators and words.
+
+    INPUT:
+
+    - ``P``, ``generators``, ``options`` -- as for :func:`polarizationSpace`
+
+    The space is computed twice: with the given options, and with
+    ``use_commutativity=False`` and ``minimal_operators=False``. An
+    assertion error is raised if the dimensions differ.
+
+    OUTPUT: a dictionary with the number of operator applications
+    for both computations, and the number of applications saved
+
+    EXAMPLES::
+
+        sage: load("derivative_space.py")
+        sage: P = DiagonalPolynomialRing(QQ, 3, 3)
+        sage: basis = DerivativeHarmonicSpace(QQ, 3).basis_by_shape(Partition([1,1,1]))
+        sage: generators = {P.multidegree(P(gen)): [P(gen)] for gen in basis}
+        sage: stats = verify_polarization_space(P, generators, minimal_operators=True)
+        sage: stats["saved"] == stats["full"] - stats["applications"] > 0
+        True
+        sage: stats = verify_polarization_space(P, generators, use_commutativity="pbw")
+        sage: stats["saved"] == stats["full"] - stats["applications"] > 0
+        True
+
+    The PBW normal form of the words needs all the operators of degree `1`::
+
+        sage: verify_polarization_space(P, generators, minimal_operators=True, use_commutativity="pbw")
+        Traceback (most recent call last):
+        ...
+        ValueError: use_commutativity='pbw' is not valid with minimal_operators
+    """
+    F = polarizationSpace(P, generators, **options)
+    options = dict(options, use_commutativity=False, minimal_operators=False)
+    G = polarizationSpace(P, generators, **options)
+    assert F.dimensions_isotyp() == G.dimensions_isotyp()
+    applications = F._stats.get('applications', 0)
+    full = G._stats.get('applications', 0)
+    return {'applications': applications, 'full': full, 'saved': full - applications}
+
+def _polarization_space_bucket(P, generators, options):
+    """
+    Return the basis of the polarization space of ``generators``, as a dictionary of lists.
+
+    See :func:`polarization_space_by_generator_degree`.
+    """
+    F = polarizationSpace(P, generators, **dict(options))
+    return {d: list(vectors) for d, vectors in F.basis().iteritems()}
+
+register_task("polarization_space_bucket", _polarization_space_bucket,
+              cost=lambda P, generators, options: sum(len(gens) * (1 + sum(d))
+                                                      for d, gens in generators.iteritems()))
+
+def polarization_space_by_generator_degree(P, generators, ncpus=None, warm=False, verbose=False, **options):
+    """
+    Return the polarization space of ``generators``, computed on several processes.
+
+    INPUT:
+
+    - ``P``, ``generators``, ``options`` -- as for :func:`polarizationSpace`
+    - ``ncpus`` -- the number of processes (default: the number of cpus)
+    - ``warm`` -- whether to use the long-lived workers of
+      :func:`warm_pool` (default: ``False``)
+
+    The generators are split into buckets by total degree, and the
+    space spanned by each bucket is computed by a separate job of
+    :func:`schedule`. The space is linear in its generators, so it is
+    the sum of these spaces: their bases are merged by rank, degree by
+    degree, with ``closed=True``. The vectors of the bases are sent
+    back from the workers, which costs time and memory for large spaces.
+
+    This can't be used from a worker of :func:`schedule`. With
+    ``row_symmetry="multipolarization"``, whose subspaces only contain
+    highest weight vectors and can't be merged, the space is computed
+    serially by :func:`polarizationSpace`.
+
+    EXAMPLES::
+
+        sage: load("derivative_space.py")
+        sage: P = DiagonalPolynomialRing(QQ, 4, 3)
+        sage: basis = DerivativeHarmonicSpace(QQ, 4).basis_by_shape(Partition([2,1,1]))
+        sage: generators = {}
+        sage: for gen in basis:
+        ....:     generators.setdefault(P.multidegree(P(gen)), []).append(P(gen))
+        sage: F = polarization_space_by_generator_degree(P, generators, ncpus=2, row_symmetry="permutation")
+        sage: F.hilbert_polynomial() == polarizationSpace(P, generators, row_symmetry="permutation").hilbert_polynomial()
+        True
+        sage: F = polarization_space_by_generator_degree(P, generators, ncpus=2, row_symmetry="multipolarization")
+        sage: F.hilbert_polynomial() == polarizationSpace(P, generators, row_symmetry="permutation").hilbert_polynomial()
+        True
+    """
+    buckets = {}
+    for d, gens in generators.iteritems():
+        buckets.setdefault(sum(d), {})[d] = gens
+    if len(buckets) <= 1 or options.get("row_symmetry") == "multipolarization":
+        return polarizationSpace(P, generators, verbose=verbose, **options)
+    jobs = [("polarization_space_bucket", (P, bucket, tuple(sorted(options.items()))))
+            for bucket in buckets.values()]
+    merged = {}
+    for job, basis, stats in schedule(jobs, ncpus=ncpus, skip_cached=False, warm=warm):
+        if basis is None:
+            raise RuntimeError("polarization space of a bucket: %s"%stats['status'])
+        for d, vectors in basis.iteritems():
+            merged.setdefault(d, []).extend(vectors)
+    return polarizationSpace(P, merged, verbose=verbose, closed=True, **options)
+
+def polarization_space_add_row(F, verbose=False):
+    """
+    Return the extension of the polarization space ``F`` to one more row of variables.
+
+    INPUT:
+
+    - ``F`` -- a subspace returned by :func:`polarizationSpace`,
+      for a diagonal polynomial ring `P` with `r` rows
+
+    The basis of ``F`` is embedded in the ring with `r+1` rows, and
+    the closure is resumed from there: only the operators involving
+    the new row are applied to the embedded basis, which is already
+    stable under the others.
+
+    EXAMPLES::
+
+        sage: load("derivative_space.py")
+        sage: P = DiagonalPolynomialRing(QQ, 3, 1)
+        sage: basis = DerivativeHarmonicSpace(QQ, 3).basis_by_shape(Partition([2,1]))
+        sage: generators = {P.multidegree(P(gen)): [P(gen)] for gen in basis}
+        sage: F = polarizationSpace(P, generators)
+        sage: G = polarization_space_add_row(F)
+        sage: G._ring
+        Diagonal polynomial ring with 2 rows of 3 variables over Rational Field
+        sage: sorted(tuple(d) for d in G.basis())
+        [(0, 1), (0, 2), (1, 0), (1, 1), (2, 0)]
+    """
+    P = F._ring
+    r = P._r
+    if isinstance(P, DiagonalAntisymmetricPolynomialRing):
+        P2 = DiagonalAntisymmetricPolynomialRing(P.base_ring(), P._n, r+1, inert=P._inert,
+                                                 antisymmetries=P._antisymmetries,
+                                                 symmetries=P._symmetries)
+    else:
+        P2 = DiagonalPolynomialRing(P.base_ring(), P._n, r+1, inert=P._inert)
+    generators = {}
+    for vectors in F.basis().itervalues():
+        for v in vectors:
+            v = P2(v)
+            generators.setdefault(P2.multidegree(v), []).append(v)
+    return polarizationSpace(P2, generators, verbose=verbose, new_rows_from=r,
+                             **F._polarization_options)
+
+def polarization_space_up_to_stabilization(P, generators, verbose=False, stop="bound", **options):
+    """
+    Return the polarization space of ``generators``, adding rows until the character stabilizes.
+
+    INPUT:
+
+    - ``P``, ``generators``, ``options`` -- as for :func:`polarizationSpace`;
+      ``row_symmetry="multipolarization"`` is not supported
+    - ``stop`` -- ``"bound"`` (default) or ``"heuristic"``
+
+    Starting from the `r` rows of ``P``, rows are added one at a time
+    with :func:`polarization_space_add_row`, until `r \geq n`: the
+    highest weights of `GL_r` in polynomials in `r\times n` variables
+    have length at most `n` (Howe duality), so the character, as a
+    symmetric function, can't change any more.
+
+    With ``stop="heuristic"``, the computation also stops as soon as
+    the last added row brought no Schur function of length `r` in the
+    character. This is a heuristic: it is not proven that no further
+    row would bring one.
+
+    EXAMPLES::
+
+        sage: load("derivative_space.py")
+        sage: P = DiagonalPolynomialRing(QQ, 3, 1)
+        sage: basis = DerivativeHarmonicSpace(QQ, 3).basis_by_shape(Partition([2,1]))
+        sage: generators = {P.multidegree(P(gen)): [P(gen)] for gen in basis}
+        sage: F = polarization_space_up_to_stabilization(P, generators)
+        sage: F._ring._r
+        3
+        sage: F.hilbert_polynomial()
+        s[1] + s[2]
+        sage: F = polarization_space_up_to_stabilization(P, generators, stop="heuristic")
+        sage: F._ring._r
+        2
+        sage: F.hilbert_polynomial()
+        s[1] + s[2]
+    """
+    if stop not in ("bound", "heuristic"):
+        raise ValueError("stop should be 'bound' or 'heuristic'")
+    if options.get("row_symmetry") == "multipolarization":
+        raise ValueError("row_symmetry='multipolarization' is not supported: rows can't be added")
+    F = polarizationSpace(P, generators, verbose=verbose, **options)
+    n = P._n
+    while F._ring._r < n:
+        r = F._ring._r + 1
+        G = polarization_space_add_row(F, verbose=verbose)
+        if stop == "heuristic" and not any(len(la) == r for la in G.hilbert_polynomial().support()):
+            return G
+        F = G
     return F
     
         
@@ -160,7 +528,7 @@ def polarizationSpace(P, generators, verbose=False, row_symmetry=None, use_commu
 ####################################################
 # Polarization Operators
 ####################################################
-def polarization_operators_by_multidegree(P, side=None, row_symmetry=None, use_lie=False, min_degree=0):
+def polarization_operators_by_multidegree(P, side=None, row_symmetry=None, use_lie=False, min_degree=0, minimal=False):
     """
     Return the collection of polarization operators acting on harmonic polynomials,
     indexed by multi-degree.
@@ -176,6 +544,12 @@ def polarization_operators_by_multidegree(P, side=None, row_symmetry=None, use_l
     If ``side`` is `down` (the only implemented choice), only
     the operators from `X_{i1}` to `X_{i2}` for `i1<i2` are returned.
 
+    If ``minimal`` is ``True``, only the operators between adjacent
+    rows (`|i_1-i_2|=1`) are returned. They generate the others, as
+    `[P_{1,i_2,i_2+1}, P_{d,i_1,i_2}] = P_{d,i_1,i_2+1}`; so they
+    give the same closure, as long as the operators are not composed
+    with a permutation of the rows.
+
     EXAMPLES::
 
         sage: P = DiagonalPolynomialRing(QQ, 4, 2)
@@ -217,9 +591,11 @@ def polarization_operators_by_multidegree(P, side=None, row_symmetry=None, use_l
         6*x00^2*x10*x11
         sage: ops[(0,-1,1)][0](p)
         3*x00*x10^2*x11*x20 + x00*x10^3*x21
+
+        sage: sorted(polarization_operators_by_multidegree(P, side="down", minimal=True))
+        [(-3, 1, 0), (-2, 1, 0), (-1, 1, 0), (0, -3, 1), (0, -2, 1), (0, -1, 1)]
     """
     n = P._n
-    n=2
     r = P._r
     grading_set = P._grading_set
     return {grading_set([-d if i==i1 else 1 if i==i2 else 0 for i in range(r)]):
@@ -229,6 +605,7 @@ def polarization_operators_by_multidegree(P, side=None, row_symmetry=None, use_l
             for i2 in range(0, r)
             if ((i1==i2+1 if d==1 else i1<i2) if use_lie else i1<i2 if side == 'down' else i1!=i2)
             if (i1<i2 if side == 'down' else i1!=i2)
+            if not minimal or abs(i1-i2) == 1
            }
 
 def polarization_operators_by_degree(P, side=None, row_symmetry=None, use_lie=False, min_degree=0):
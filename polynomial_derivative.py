@@ -2,16 +2,101 @@
 # -*- coding: utf-8 -*-
 
 from sage.misc.misc_c import prod
+from sage.misc.cachefunc import cached_function
 from sage.functions.other import factorial
 
 from sage.structure.element import have_same_parent
+from sage.matrix.constructor import matrix
 from matrix_of_vectors import items_of_vector
+from antisymmetric_utilities import antisymmetric_normal
 from diagonal_polynomial_ring import *
 
 ##############################################################################
 # Polynomials as differential operators
 ##############################################################################
 
+_falling_factorials = [[1]]
+def falling_factorial_table(d):
+    """
+    Return the table of falling factorials up to `d`.
+
+    OUTPUT: a list `T` such that `T[f][e] = f (f-1) \cdots (f-e+1) = f!/(f-e)!`
+    for `0 \leq e \leq f`, with `f \leq d` at least.
+
+    The table is shared and extended on demand.
+
+    EXAMPLES::
+
+        sage: T = falling_factorial_table(4)
+        sage: T[4]
+        [1, 4, 12, 24, 24]
+        sage: T[3][2]
+        6
+    """
+    T = _falling_factorials
+    while len(T) <= d:
+        f = len(T)
+        row = [1]
+        for e in range(f):
+            row.append(row[-1] * (f-e))
+        T.append(row)
+    return T
+
+def _derivative_coefficient(e, f):
+    """
+    Return the coefficient `c` such that `X^e(\partial)(X^f) = c X^{f-e}`.
+
+    This is `0` if `X^e` does not divide `X^f`.
+
+    EXAMPLES::
+
+        sage: from sage.rings.polynomial.polydict import ETuple
+        sage: _derivative_coefficient(ETuple((2,1)), ETuple((4,3)))
+        36
+        sage: _derivative_coefficient(ETuple((1,3)), ETuple((1,2)))
+        0
+    """
+    T = _falling_factorials
+    c = 1
+    for i, k in e.sparse_iter():
+        j = f[i]
+        if j < k:
+            return 0
+        if j >= len(T):
+            T = falling_factorial_table(j)
+        c *= T[j][k]
+    return c
+
+def _polynomial_derivative_dict(p, q):
+    """
+    Return `p(\partial)(q)` as a dictionary of exponents.
+
+    INPUT:
+
+    - `p`, `q` -- two dictionaries ``{exponent: coefficient}``,
+      as returned by ``p.dict()`` for a multivariate polynomial `p`
+
+    EXAMPLES::
+
+        sage: R = QQ['x,y']
+        sage: x,y = R.gens()
+        sage: _polynomial_derivative_dict((x+y).dict(), (x^3*y^3).dict())
+        {(2, 3): 3, (3, 2): 3}
+    """
+    result = {}
+    for e1, c1 in p.iteritems():
+        for e2, c2 in q.iteritems():
+            c = _derivative_coefficient(e1, e2)
+            if not c:
+                continue
+            e3 = e2.esub(e1)
+            c = result.get(e3, 0) + c*c1*c2
+            if c:
+                result[e3] = c
+            else:
+                del result[e3]
+    return result
+
 def polynomial_derivative_on_basis(e, f):
     """
     Return the differentiation of `f` by `e`.
@@ -50,10 +135,10 @@ def polynomial_derivative_on_basis(e, f):
         sage: polynomial_derivative_on_basis(ETuple((1,3)), ETuple((1,2)))
         sage: polynomial_derivative_on_basis(ETuple((2,0)), ETuple((1,2)))
     """
-    g = f.esub(e)
-    if any(i < 0 for i in g):
+    c = _derivative_coefficient(e, f)
+    if not c:
         return None
-    return (g, prod(factorial(i)/factorial(j) for (i,j) in zip(f,g)))
+    return (f.esub(e), c)
 
 def polynomial_derivative(p, q): # this just extends a function by bilinearity; we would want it to be built using ModulesWithBasis
     """
@@ -96,15 +181,72 @@ def polynomial_derivative(p, q): # this just extends a function by bilinearity;
     if not have_same_parent(p,q):
         raise ValueError("p and q should have the same parent")
     R = p.parent()
-    result = R.zero() # We would want to use R.sum_of_terms_if_not_None
-    for (e1, c1) in items_of_vector(p):
-        for (e2, c2) in items_of_vector(q):
-            m = polynomial_derivative_on_basis(e1,e2)
-            if m is None:
-                continue
-            (e3,c3) = m
-            result += R({e3: c1*c2*c3})
-    return result
+    return R(_polynomial_derivative_dict(p.dict(), q.dict()))
+
+def polynomial_derivative_matrix(S, B, antisymmetries=None):
+    """
+    Return the matrix of the action of the differential operators `S` on `B`.
+
+    INPUT:
+
+    - `S` -- a list of polynomials, seen as differential operators
+    - `B` -- a list of polynomials in the same ring `R` as `S`
+    - ``antisymmetries`` -- a tuple of tuples of positions, or
+      :obj:`None` (default): if given, each derivative is put in
+      antisymmetric normal form w.r.t. ``antisymmetries``
+      (with `r=1`, as in :func:`higher_specht`)
+
+    OUTPUT:
+
+    A sparse matrix with one row per element `b` of `B`, obtained
+    by concatenating the coordinates of `s(\partial)(b)` for `s` in
+    `S`. This is the matrix built by :func:`annihilator_basis` with
+    ``action=polynomial_derivative`` and ``side='left'``, up to a
+    permutation of the columns; its left kernel describes the
+    elements of the span of `B` killed by all of `S`.
+
+    All pairs are computed on the dictionaries of exponents, and no
+    intermediate polynomial is constructed (except for the normal
+    form, which is computed once per pair).
+
+    EXAMPLES::
+
+        sage: R = QQ['x,y']
+        sage: x,y = R.gens()
+        sage: M = polynomial_derivative_matrix([x, y], [x^2, x*y, y^2]); M
+        [2 0 0 0]
+        [0 1 1 0]
+        [0 0 0 2]
+        sage: M.left_kernel().dimension()
+        0
+        sage: polynomial_derivative_matrix([x+y], [x-y, x+y]).left_kernel().basis()
+        [
+        (1, 0)
+        ]
+
+    With antisymmetries::
+
+        sage: R = QQ['x,y,z']
+        sage: x,y,z = R.gens()
+        sage: polynomial_derivative_matrix([x+y+z], [x^2*y - x*y^2], antisymmetries=((0,1),))
+        [2]
+    """
+    R = B[0].parent()
+    if antisymmetries is not None:
+        n = R.ngens()
+    S = [s.dict() for s in S]
+    columns = {}
+    entries = {}
+    for i, b in enumerate(B):
+        b = b.dict()
+        for k, s in enumerate(S):
+            d = _polynomial_derivative_dict(s, b)
+            if antisymmetries is not None and d:
+                d = antisymmetric_normal(R(d), n, 1, antisymmetries).dict()
+            for e, c in d.iteritems():
+                j = columns.setdefault((k, e), len(columns))
+                entries[i, j] = c
+    return matrix(R.base_ring(), len(B), len(columns), entries, sparse=True)
 
 def fiej(i, j, d): # fiejcoeff_on_highest_weight
     """
@@ -177,6 +319,7 @@ def fiej(i, j, d): # fiejcoeff_on_highest_weight
     return binomial(j, i) * binomial(d-j+i,i) * factorial(i)**2
     #return prod( k*d - 2*binomial(k,2) for k in range(j-i+1,j+1) )
 
+@cached_function
 def string_matrix(d, l):
     """
     Return the string matrix for `d`, `l`
@@ -189,34 +332,66 @@ def string_matrix(d, l):
     This return a matrix whose `i`-th row contains the coefficients of
     the expansion of `f^i(p)` as a linear combination of the
     `e^(j-i)p^{(j)}`.
+
+    EXAMPLES::
+
+        sage: string_matrix(3, 3)
+        [1 1  1]
+        [0 5 12]
+        [0 0 84]
     """
-    return matrix(l, l, lambda i,j: fiej(i,j,d+2*j))
+    M = matrix(l, l, lambda i,j: fiej(i,j,d+2*j))
+    M.set_immutable()
+    return M
 
-"""
+@cached_function
+def string_matrix_inverse(d, l):
+    r"""
+    Return the inverse of the string matrix for `d`, `l`
 
-Consistency checks::
-    sage: P = DiagonalPolynomialRing(QQ,2,1) #not tested
-    sage: for mu in Partitions(2): #not tested
-    ....:     assert P.harmonic_space_by_shape(mu,use_lie='multipolarization').hilbert_polynomial() == harmonic_character(mu) #not tested
+    Let `p = \sum_j e^j p^{(j)}` be of weight `d`, with `f^l(p)=0`.
+    Then `p^{(j)}=0` for `j < -d`, and `e^j` is injective on highest
+    weight vectors of weight `d+2j` for `j\geq -d`. Applying `e^i` to
+    the rows of :func:`string_matrix` gives
 
-    sage: P = DiagonalPolynomialRing(QQ,3,2) #not tested
-    sage: for mu in Partitions(3): #not tested
-    ....:     assert P.harmonic_space_by_shape(mu,use_lie='multipolarization').hilbert_polynomial() == harmonic_character(mu) #not tested
+    .. MATH:: p^{(i)} = \sum_{k\geq i} M_{i,k} e^{k-i} f^k(p)
 
-This does not work yet::
+    where `M` is the inverse of the string matrix restricted to the
+    indices `j\geq \max(0,-d)`; the other rows and columns of the
+    returned matrix are zero.
 
-    sage: P = DiagonalPolynomialRing(QQ,4,3) #not tested
-    sage: for mu in Partitions(4): #not tested
-    ....:     assert P.harmonic_space_by_shape(mu,use_lie='multipolarization').hilbert_polynomial() == harmonic_character(mu) #not tested
-    AssertionError
+    EXAMPLES::
 
-    sage: mu #not tested
-    [2, 1, 1]
-    sage: harmonic_character(mu) #not tested
-    s[1, 1] + s[2, 1] + s[3] + s[3, 1] + s[4] + s[5]
-    sage: P.harmonic_space_by_shape(mu,use_lie='multipolarization').hilbert_polynomial() #not tested
-    s[1, 1] + s[2, 1] + s[3] + s[4] + s[5]
+        sage: string_matrix_inverse(3, 3)
+        [1 -1/5  1/60]
+        [0  1/5 -1/35]
+        [0    0  1/84]
+        sage: string_matrix_inverse(-1, 2)
+        [0 0]
+        [0 1]
+    """
+    j0 = min(max(0, -d), l)
+    M = matrix(QQ, l, l)
+    if j0 < l:
+        M.set_block(j0, j0, string_matrix(d, l).submatrix(j0, j0).inverse())
+    M.set_immutable()
+    return M
+
+"""
 
-Somehow missing 3,1 by polarizing from 5???
+Consistency checks::
 
+    sage: from character import harmonic_character
+    sage: for n in range(2, 5):                                         # long time
+    ....:     P = DiagonalPolynomialRing(QQ, n, max(n-1, 1))
+    ....:     for mu in Partitions(n):
+    ....:         assert harmonic_character(P, mu, row_symmetry="multipolarization") == harmonic_character(P, mu, row_symmetry="permutation")
+
+This used to miss `s[3, 1]` for `\mu=[2, 1, 1]`, as the highest weight
+subspace was intersected with the highest weight space instead of
+being split into its highest weight components::
+
+    sage: P = DiagonalPolynomialRing(QQ, 4, 3)
+    sage: harmonic_character(P, Partition([2,1,1]), row_symmetry="multipolarization")
+    s[1, 1] + s[2, 1] + s[3] + s[3, 1] + s[4] + s[5]
 """
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+Scheduling of long computations on several processes
+
+The computation times of the characters of the isotypic components
+differ by orders of magnitude. Starting them in an arbitrary order,
+the whole run is dominated by the expensive jobs which start last.
+
+:func:`schedule` estimates the cost of each job beforehand, skips the
+jobs whose result is already stored, and runs the others from the most
+expensive to the cheapest on a pool of processes. Each worker takes
+the next job as soon as it is done with the previous one. Each job
+runs in a fresh process, with optional memory and time limits, and its
+wall time, cpu time and peak memory usage are reported.
+
+The jobs are pairs ``(task, args)``, where ``task`` is the name of a
+task registered with :func:`register_task`; only the names and
+arguments are sent to the workers, which are forked from the current
+process.
+
+With ``warm=True``, the jobs are instead run by the long-lived workers
+of :func:`warm_pool`, which keep their caches (rings, higher Specht
+polynomials, bases, operators, ...) from one job to the next. Nothing
+else is shared between the workers: each of them unpickles its own
+copy of the values it loads from the store of :class:`func_persist`
+(e.g. the inverse Kostka tables), and only the pages of the database
+file are shared, through the page cache of the system.
+
+EXAMPLES::
+
+    sage: from scheduler import *
+    sage: _ = register_task("square", lambda x: x^2, cost=lambda x: x)
+    sage: for job, result, stats in schedule([("square", (i,)) for i in range(4)], ncpus=1):
+    ....:     print job, result, stats['status']
+    square(3,) 9 done
+    square(2,) 4 done
+    square(1,) 1 done
+    square(0,) 0 done
+    sage: sorted(stats)
+    ['calibrated', 'cpu_time', 'estimated_cost', 'maxrss', 'status', 'wall_time', 'warm', 'worker']
+"""
+
+__all__ = ["Task", "tasks", "register_task", "Job", "calibrated_cost", "TimeLimitExceeded",
+           "warm_pool", "close_warm_pools", "cold_warm_summary", "schedule", "format_stats"]
+
+import multiprocessing
+import os
+import resource
+import signal
+import time
+
+class Task(object):
+    """
+    A function which can be scheduled, with its cost model.
+
+    INPUT:
+
+    - ``name`` -- a string
+    - ``function`` -- the function to be run on the arguments of the jobs
+    - ``cost`` -- a function estimating the cost of a job from its
+      arguments, or ``None`` for a constant cost
+    - ``is_cached`` -- a function telling whether the result for the
+      arguments of a job is already stored, or ``None``
+    """
+    def __init__(self, name, function, cost=None, is_cached=None):
+        self.name = name
+        self.function = function
+        self.cost = cost
+        self.is_cached = is_cached
+
+    def estimate_cost(self, args):
+        if self.cost is None:
+            return 1
+        return self.cost(*args)
+
+    def is_calibrated(self):
+        """
+        Return whether the estimated costs are computation times in seconds (see :func:`calibrated_cost`).
+        """
+        return getattr(self.cost, "calibrated", False)
+
+tasks = {}
+def register_task(name, function, cost=None, is_cached=None):
+    """
+    Register a task to be used by :func:`schedule`, and return it.
+
+    See :class:`Task` for the arguments. A task registered with the
+    same name is replaced.
+    """
+    tasks[name] = Task(name, function, cost=cost, is_cached=is_cached)
+    return tasks[name]
+
+class Job(object):
+    """
+    A task to be run on some arguments, with its estimated cost.
+    """
+    def __init__(self, task, args, cost):
+        self.task = task
+        self.args = tuple(args)
+        self.cost = cost
+
+    def __repr__(self):
+        return "%s%s"%(self.task, self.args)
+
+def calibrated_cost(f, model):
+    """
+    Return a cost function for the :class:`func_persist` function ``f``, calibrated on its stored timings.
+
+    INPUT:
+
+    - ``f`` -- a :class:`func_persist`
+    - ``model`` -- a function taking a key of ``f`` and returning a
+      positive number, proportional to the expected computation time
+
+    The returned function takes the arguments of ``f``. Its values are
+    the model multiplied by the median of the ratios between the wall
+    times stored in the provenance of the computed values (see
+    :meth:`func_persist.provenance`) and the model; they estimate
+    the computation time in seconds. Without stored timings, the
+    model is used as is, and the estimates are in arbitrary units.
+    The calibration is done on the first call; then, the attribute
+    ``calibrated`` of the returned function tells whether there were
+    stored timings.
+
+    EXAMPLES::
+
+        sage: from funcpersist import func_persist
+        sage: from scheduler import calibrated_cost
+        sage: f = func_persist(lambda x: x, dir=tmp_dir(), hash=str)
+        sage: cost = calibrated_cost(f, lambda key: key[0][0])
+        sage: cost(5), cost.calibrated
+        (5, False)
+    """
+    ratio = []
+    def cost(*args, **kwds):
+        if not ratio:
+            ratios = sorted(provenance['wall_time'] / model(key)
+                            for key, provenance in f.iterprovenance()
+                            if provenance.get('wall_time') is not None)
+            ratio.append(ratios[len(ratios)//2] if ratios else 1)
+            cost.calibrated = bool(ratios)
+        return ratio[0] * model(f.key(*args, **kwds))
+    cost.calibrated = False
+    return cost
+
+# The number of jobs run by the current worker process
+_jobs_run = [0]
+
+class TimeLimitExceeded(Exception):
+    pass
+
+def _time_limit_exceeded(signum, frame):
+    raise TimeLimitExceeded()
+
+def _run_job(job):
+    """
+    Run a job in a worker process, and return its index, result and statistics.
+
+    The time limit is checked by the Python interpreter, between two
+    Python instructions: a job spending a long time in a single call
+    to compiled code exceeds it.
+    """
+    i, task, args, memory_limit, time_limit = job
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    warm = _jobs_run[0] > 0
+    _jobs_run[0] += 1
+    wall_time = time.time()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    result = None
+    if time_limit is not None:
+        handler = signal.signal(signal.SIGALRM, _time_limit_exceeded)
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        result = tasks[task].function(*args)
+        status = "done"
+    except MemoryError:
+        status = "memory limit exceeded"
+    except TimeLimitExceeded:
+        status = "time limit exceeded"
+    except Exception as e:
+        status = "error: %s"%e
+    finally:
+        if time_limit is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, handler)
+    end = resource.getrusage(resource.RUSAGE_SELF)
+    stats = {'status': status,
+             'wall_time': time.time() - wall_time,
+             'cpu_time': end.ru_utime + end.ru_stime - usage.ru_utime - usage.ru_stime,
+             'maxrss': end.ru_maxrss,
+             'warm': warm,
+             'worker': os.getpid()}
+    return i, result, stats
+
+def _initialize_warm_worker(memory_limit):
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+_warm_pools = {}
+def warm_pool(ncpus=None, memory_limit=None):
+    """
+    Return a pool of long-lived worker processes, creating it on the first call.
+
+    INPUT:
+
+    - ``ncpus`` -- the number of workers (default: the number of cpus)
+    - ``memory_limit`` -- the maximal size in bytes of the address
+      space of each worker, or ``None`` for no limit
+
+    The workers are forked when the pool is created: the tasks shall
+    be registered before (see :func:`register_task`). They stay alive,
+    with their caches, until :func:`close_warm_pools` is called.
+    """
+    if ncpus is None:
+        ncpus = multiprocessing.cpu_count()
+    key = (ncpus, memory_limit)
+    if key not in _warm_pools:
+        _warm_pools[key] = multiprocessing.Pool(ncpus, initializer=_initialize_warm_worker,
+                                                initargs=(memory_limit,))
+    return _warm_pools[key]
+
+def close_warm_pools():
+    """
+    Terminate the pools created by :func:`warm_pool`.
+    """
+    for pool in _warm_pools.values():
+        pool.terminate()
+        pool.join()
+    _warm_pools.clear()
+
+def cold_warm_summary(stats):
+    """
+    Return the number of jobs and their mean wall time, for the jobs run by a fresh worker and the others.
+
+    INPUT:
+
+    - ``stats`` -- a list of statistics of jobs (see :func:`schedule`)
+
+    EXAMPLES::
+
+        sage: from scheduler import cold_warm_summary
+        sage: cold_warm_summary([{'warm': False, 'wall_time': 3.}, {'warm': True, 'wall_time': 1.},
+        ....:                    {'warm': True, 'wall_time': 2.}, {'status': 'cached'}])
+        {'cold': {'jobs': 1, 'wall_time': 3.0}, 'warm': {'jobs': 2, 'wall_time': 1.5}}
+    """
+    result = {}
+    for name, warm in [('cold', False), ('warm', True)]:
+        times = [s['wall_time'] for s in stats if s.get('warm', None) is warm]
+        result[name] = {'jobs': len(times),
+                        'wall_time': sum(times)/len(times) if times else None}
+    return result
+
+def schedule(jobs, ncpus=None, memory_limit=None, skip_cached=True, warm=False, time_limit=None):
+    """
+    Run the jobs in parallel, the most expensive first, and iterate through their results.
+
+    INPUT:
+
+    - ``jobs`` -- an iterable of pairs ``(task, args)``, where
+      ``task`` is the name of a registered task (see :func:`register_task`)
+    - ``ncpus`` -- the number of worker processes (default: the number of cpus)
+    - ``memory_limit`` -- the maximal size in bytes of the address
+      space of each job, or ``None`` for no limit
+    - ``skip_cached`` -- whether to skip the jobs whose result is
+      already stored (default: ``True``)
+    - ``warm`` -- whether to run the jobs on the long-lived workers of
+      :func:`warm_pool` instead of a fresh process per job
+      (default: ``False``)
+    - ``time_limit`` -- the maximal wall time of each job, in seconds,
+      or ``None`` for no limit
+
+    OUTPUT:
+
+    An iterator through the triples ``(job, result, stats)``, in the
+    order of completion. The skipped jobs come first, with their stored
+    result. ``stats`` is a dictionary with:
+
+    - ``status`` -- ``"done"``, ``"cached"``, ``"memory limit exceeded"``,
+      ``"time limit exceeded"`` or ``"error: ..."``; the result is
+      ``None`` for the last three
+    - ``estimated_cost`` -- the cost estimated by the task
+    - ``calibrated`` -- whether this cost is a time in seconds, or in
+      arbitrary units (see :func:`calibrated_cost`)
+    - ``wall_time``, ``cpu_time`` -- in seconds
+    - ``maxrss`` -- the peak resident set size of the worker, in kilobytes
+    - ``warm`` -- whether the worker had already run a job before
+    - ``worker`` -- the process id of the worker
+
+    Unless ``warm`` is set, each job runs in a fresh process, so that
+    its memory statistics and limit are not affected by the previous
+    jobs. Otherwise, the memory limit applies to each worker, and
+    ``maxrss`` is the peak over all the jobs run so far by the worker.
+
+    EXAMPLES::
+
+        sage: from scheduler import *
+        sage: _ = register_task("fails", lambda x: 1/x)
+        sage: [(job.args, stats['status']) for job, result, stats in schedule([("fails", (0,))])]
+        [((0,), 'error: Rational division by zero')]
+        sage: _ = register_task("sleep", sleep)
+        sage: [stats['status'] for job, result, stats in schedule([("sleep", (10,))], time_limit=0.5)]
+        ['time limit exceeded']
+
+    With the long-lived workers, only the first job of each worker
+    starts cold::
+
+        sage: _ = register_task("cube", lambda x: x^3)
+        sage: results = list(schedule([("cube", (i,)) for i in range(4)], ncpus=1, warm=True))
+        sage: [(result, stats['warm']) for job, result, stats in results]
+        [(0, False), (1, True), (8, True), (27, True)]
+        sage: close_warm_pools()
+
+    Benchmark of the cold and warm jobs::
+
+        sage: from character import *                                              # not tested
+        sage: stats = [stats for job, result, stats in                             # not tested
+        ....:          schedule([("harmonic_character_plain", (tuple(mu),)) for mu in Partitions(5)],
+        ....:                   skip_cached=False, warm=True)]
+        sage: cold_warm_summary(stats)                                             # not tested
+    """
+    jobs = [Job(task, args, tasks[task].estimate_cost(args)) for task, args in jobs]
+    jobs.sort(key=lambda job: job.cost, reverse=True)
+    todo = []
+    for job in jobs:
+        task = tasks[job.task]
+        if skip_cached and task.is_cached is not None and task.is_cached(*job.args):
+            yield job, task.function(*job.args), {'status': 'cached', 'estimated_cost': job.cost,
+                                                  'calibrated': task.is_calibrated()}
+        else:
+            todo.append(job)
+    if not todo:
+        return
+    if warm:
+        pool = warm_pool(ncpus, memory_limit)
+        for i, result, stats in pool.imap_unordered(
+                _run_job,
+                [(i, job.task, job.args, None, time_limit) for i, job in enumerate(todo)],
+                chunksize=1):
+            stats['estimated_cost'] = todo[i].cost
+            stats['calibrated'] = tasks[todo[i].task].is_calibrated()
+            yield todo[i], result, stats
+        return
+    if ncpus is None:
+        ncpus = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(min(ncpus, len(todo)), maxtasksperchild=1)
+    try:
+        for i, result, stats in pool.imap_unordered(
+                _run_job,
+                [(i, job.task, job.args, memory_limit, time_limit) for i, job in enumerate(todo)],
+                chunksize=1):
+            stats['estimated_cost'] = todo[i].cost
+            stats['calibrated'] = tasks[todo[i].task].is_calibrated()
+            yield todo[i], result, stats
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def format_stats(stats):
+    """
+    Return a short description of the statistics of a job.
+
+    The estimated cost is only given as a time if it is ``calibrated``
+    (see :func:`calibrated_cost`), and omitted if it is not known.
+
+    EXAMPLES::
+
+        sage: from scheduler import format_stats
+        sage: format_stats({'status': 'done', 'estimated_cost': 2.5, 'calibrated': True,
+        ....:               'wall_time': 1.25, 'cpu_time': 1.0, 'maxrss': 204800})
+        'done, estimated 2.5s, wall 1.2s, cpu 1.0s, 200 MB'
+        sage: format_stats({'status': 'done', 'estimated_cost': 343, 'calibrated': False,
+        ....:               'wall_time': 1.25, 'cpu_time': 1.0, 'maxrss': 204800})
+        'done, estimated cost 343.0 (uncalibrated), wall 1.2s, cpu 1.0s, 200 MB'
+        sage: format_stats({'status': 'done', 'wall_time': 1.25, 'cpu_time': 1.0, 'maxrss': 204800})
+        'done, wall 1.2s, cpu 1.0s, 200 MB'
+        sage: format_stats({'status': 'cached', 'estimated_cost': 2.5})
+        'cached'
+    """
+    if 'wall_time' not in stats:
+        return stats['status']
+    if stats.get('estimated_cost') is None:
+        estimated = ""
+    elif stats.get('calibrated'):
+        estimated = ", estimated %.1fs"%stats['estimated_cost']
+    else:
+        estimated = ", estimated cost %.1f (uncalibrated)"%stats['estimated_cost']
+    return "%s%s, wall %.1fs, cpu %.1fs, %d MB%s"%(
+        stats['status'], estimated, stats['wall_time'], stats['cpu_time'],
+        stats['maxrss'] // 1024, ", warm" if stats.get('warm') else "")
@@ -7,6 +7,7 @@ from sage.misc.constant_function import ConstantFunction
 from sage.misc.cachefunc import cached_method, cached_function
 from sage.structure.parent import Parent
 from sage.combinat.partition import Partition, Partitions
+from sage.combinat.integer_vector import IntegerVectors
 from sage.rings.semirings.non_negative_integer_semiring import NN
 from sage.rings.rational_field import QQ
 
@@ -29,6 +30,11 @@ class Subspace(object):
     iven the dimensions of the subspaces
       given as a dictionary { degree: dim } returns the hilbert polynomial
 
+    - ``generator_operators`` -- a dictionary ``{degree: operators}``
+      or :obj:`None` (default): if given, only those operators are
+      applied to the generators, which are then assumed to be already
+      stable under the others (the other vectors get all the operators)
+
     Return the smallest subspace of `V` containing ``generators`` and
     stable under the action of the operators.
 
@@ -144,6 +150,20 @@ class Subspace(object):
         q^6 + 3*q^5 + 5*q^4 + 6*q^3 + 5*q^2 + 3*q + 1
         sage: sage.combinat.q_analogues.q_factorial(4)
         q^6 + 3*q^5 + 5*q^4 + 6*q^3 + 5*q^2 + 3*q + 1
+
+    An operator may also return a dictionary ``{degree: vectors}``,
+    in which case the vectors are dispatched in the given degrees
+    instead of the one computed by ``add_degrees``::
+
+        sage: P = QQ['x,y']
+        sage: x,y = P.gens()
+        sage: def split(p):
+        ....:     return {(q.degree(), str(v)): [q] for v in P.gens() for q in [p.derivative(v)] if q}
+        sage: F = Subspace(generators={(3, None): [x^2*y]},
+        ....:              operators={None: [split]},
+        ....:              add_degrees=lambda d1, d2: None)
+        sage: sorted(F.dimensions().items())
+        [((0, 'x'), 1), ((0, 'y'), 1), ((1, 'x'), 2), ((1, 'y'), 1), ((2, 'x'), 1), ((2, 'y'), 1), ((3, None), 1)]
     """
 
     # Invariants:
@@ -158,6 +178,7 @@ class Subspace(object):
                  hilbert_parent=None,
                  degree=None,
                  ambient=None,
+                 generator_operators=None,
                  verbose=False):
         self._stats={}
         self._verbose=verbose
@@ -211,12 +232,21 @@ class Subspace(object):
             basis = EchelonMatrixOfVectors(ambient=self._ambient, stats=self._stats)
             for g in gens:
                 if basis.extend(g):
-                    self.todo(g, d, [])
+                    self.todo(g, d, [], generator_operators)
             self._bases[d] = basis
 
-    def todo(self, vector, d1, word):
+    def todo(self, vector, d1, word, operators=None):
+        """
+        Queue the application of the operators to ``vector`` of degree ``d1``.
+
+        By default, all the operators are applied; ``operators`` can be
+        a dictionary ``{degree: operators}`` to apply only some of them
+        (see ``generator_operators``).
+        """
+        if operators is None:
+            operators = self._operators
         todo = self._todo
-        for d2, ops in self._operators.iteritems():
+        for d2, ops in operators.iteritems():
             try:
                 d3 = self._add_degrees(d1, d2)
             except ValueError:
@@ -275,9 +305,16 @@ class Subspace(object):
         todo = self._todo
         if not todo:
             return
+        self._stats.setdefault('applications', 0)
         while todo:
             v,op,d,word = todo.pop()
             w = op(v)
+            self._stats['applications'] += 1
+            if isinstance(w, dict):
+                for d2, w2s in w.iteritems():
+                    for w2 in w2s:
+                        self.extend(w2, d2, word)
+                continue
             if not isinstance(w, (list, tuple)):
                 w = [w]
             for w2 in w:
@@ -288,54 +325,132 @@ class Subspace(object):
             # "  dimension: %s  extensions: %s"%q(self._stats["dimension"], self._stats["extend"])
 
 
+@cached_function
+def multipolarization_index(D1, n):
+    """
+    Return the multipolarization operators that may act nontrivially in degree ``D1``.
+
+    INPUT:
+
+    - ``D1`` -- a tuple of `r` nonnegative integers
+    - `n` -- a nonnegative integer: the number of columns
+
+    OUTPUT: a tuple of pairs `(D, i_2)` such that `D \leq D1`
+    componentwise, `2 \leq |D| \leq n-1`, and `0 \leq i_2 < r`.
+
+    Those index the multipolarization operators `P_{D,i_2}`
+    (see :meth:`DiagonalPolynomialRing.multi_polarization`) which do
+    not trivially vanish on polynomials of multidegree ``D1``, and
+    which are not in `gl_r`.
+
+    EXAMPLES::
+
+        sage: multipolarization_index((2,1), 3)
+        (((1, 1), 0), ((1, 1), 1), ((2, 0), 0), ((2, 0), 1))
+        sage: multipolarization_index((1,0), 3)
+        ()
+    """
+    r = len(D1)
+    return tuple((D, i2)
+                 for k in range(2, n)
+                 for D in sorted(tuple(D) for D in IntegerVectors(k, r, outer=D1))
+                 for i2 in range(r))
+
 class HighestWeightSubspace(Subspace):
-    def __init__(self, generators,
-                 add_degrees=None,
-                 degree=None,
+    r"""
+    The highest weight vectors of a `GL_r`-stable polarization closure.
+
+    INPUT:
+
+    - ``generators`` -- highest weight vectors, as a list or a dictionary
+      ``{degree: vectors}``
+    - ``ring`` -- a diagonal polynomial ring (or antisymmetric version)
+      containing the generators
+
+    Let `M` be the smallest `GL_r`-stable subspace containing the
+    generators and stable under the polarization operators. Then `M`
+    is also stable under the multipolarization operators `P_{D,i_2}`,
+    which span a `gl_r`-module of operators, and `M` is the `gl_r`
+    module generated by its highest weight vectors `M^+`. So `M^+` is
+    the smallest subspace containing the generators and stable under
+    `v \mapsto \pi(P_{D,i_2} v)` for `2 \leq |D| \leq n-1`, where `\pi`
+    splits a vector into its highest weight components (see
+    :meth:`DiagonalPolynomialRing.highest_weight_vectors_decomposition`).
+    The operators of degree `1` are in `gl_r` and can be skipped.
+
+    The components are dispatched in their own dominant multidegrees,
+    and only the operators that can act nontrivially in the degree of
+    a vector are applied (see :func:`multipolarization_index`).
+
+    The dimension of `M^+` in degree `D` is the multiplicity of the
+    irreducible `GL_r` module of highest weight `D` in `M`.
+
+    The operators strictly decrease the total degree. If only the
+    multiplicities in total degree at least ``min_total_degree`` are
+    needed, the operators producing vectors of lower total degree are
+    not applied.
+
+    EXAMPLES::
+
+        sage: P = DiagonalPolynomialRing(QQ, 3, 2)
+        sage: x = P.variables()
+        sage: Delta = apply_young_idempotent(x[0,0]^2*x[0,1], Partition([1,1,1]))
+        sage: F = HighestWeightSubspace([Delta], P)
+        sage: sorted((tuple(d), dim) for d, dim in F.dimensions().items())
+        [((1, 1), 1), ((3, 0), 1)]
+        sage: F = HighestWeightSubspace([Delta], P, min_total_degree=3)
+        sage: sorted((tuple(d), dim) for d, dim in F.dimensions().items())
+        [((3, 0), 1)]
+
+    On a ring with antisymmetries, the vectors are antisymmetric
+    normal forms (see :class:`DiagonalAntisymmetricPolynomialRing`),
+    and so are the images of the multipolarizations::
+
+        sage: mu = Partition([2,1,1])
+        sage: P = DiagonalAntisymmetricPolynomialRing(QQ, 4, 3, antisymmetries=antisymmetries_of_tableau(mu))
+        sage: generators = {}
+        sage: for gen in DerivativeHarmonicSpace(QQ, 4, use_antisymmetry=True).basis_by_shape(mu):
+        ....:     generators.setdefault(P.multidegree(P(gen)), []).append(P(gen))
+        sage: F = polarizationSpace(P, generators, row_symmetry="multipolarization")
+        sage: F.hilbert_polynomial()
+        s[1, 1] + s[2, 1] + s[3] + s[3, 1] + s[4] + s[5]
+        sage: F.hilbert_polynomial() == polarizationSpace(P, generators, row_symmetry="permutation").hilbert_polynomial()
+        True
+    """
+    def __init__(self, generators, ring,
                  hilbert_parent=None,
-                 antisymmetries=None,
-                 ambient=None,
+                 min_total_degree=0,
                  verbose=False):
+        self._ring = ring
+        self._min_total_degree = min_total_degree
         Subspace.__init__(self, generators,
-                 degree=degree,
-                 add_degrees=add_degrees,
+                 degree=ring.multidegree,
+                 add_degrees=None,
                  hilbert_parent=hilbert_parent,
-                 ambient=ambient,
                  verbose=verbose)
-        self._antisymmetries=antisymmetries
 
-    @cached_method
-    def finalize(self):
-        R = self._ambient
-        r = R._r
-        assert all( not any(d[1:])
-                    for d in self._bases.keys() )
-        maxd = max(d[0] for d in self._bases.keys() )
-        degrees = [tuple(D) for D in IntegerListsLex(max_sum=maxd, length=r, max_slope=0)]
-        for D2 in degrees:
-            # Apply multi polarization operators from subspaces of higher degree
-            for D1 in self._bases.keys():
-                D = e_polarization_degrees(D1, D2)
-                if not D:
-                    continue
-                i, D = D
-                if sum(D) == 1:
-                    continue
-                for p in self._bases[D1].vectors():
-                    q = R.multi_polarization(p, D, i, antisymmetries=self._antisymmetries)
-                    self.extend(q, D2)
-            if D2 not in self._bases: # no vector of this degree was found
+    def todo(self, vector, d1, word, operators=None):
+        todo = self._todo
+        # Total degree of the images of P_{D,i2} is sum(d1) - sum(D) + 1
+        max_degree = sum(d1) - self._min_total_degree + 1
+        for D, i2 in multipolarization_index(tuple(d1), self._ring._n):
+            if sum(D) > max_degree:
                 continue
-            # Intersect with highest weight space
-            basis = self._bases[D2]
-            operators = [functools.partial(R.polarization, i1=i1, i2=i2, d=1,
-                                           antisymmetries=self._antisymmetries)
-                         for i1 in range(1, R._r)
-                         for i2 in range(i1)]
-            highest_weight_space = annihilator_basis(basis._basis, operators, action=lambda b, op: op(b), ambient=R)
-            self._bases[D2] = MatrixOfVectors( # Could possibly be EchelonMatrixOfVectors?
-                highest_weight_space,
-                ambient=R,
-                )
-        return "finished"
+            todo.append((vector, functools.partial(self._highest_weight_components, D=D, i2=i2), None, word))
 
+    def _highest_weight_components(self, p, D, i2):
+        """
+        Return the highest weight components of `P_{D,i_2} p` by multidegree.
+        """
+        R = self._ring
+        antisymmetries = getattr(R, "_antisymmetries", None)
+        if antisymmetries:
+            # p is an antisymmetric normal form, not an antisymmetric polynomial
+            q = R.multi_polarization(p, D, i2, antisymmetries=antisymmetries)
+        else:
+            q = R.multi_polarization(p, D, i2)
+        result = {}
+        if q:
+            for v, word in R.highest_weight_vectors_decomposition(q):
+                result.setdefault(R.multidegree(v), []).append(v)
+        return result
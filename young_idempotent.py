@@ -3,6 +3,7 @@
 
 from sage.combinat.partition import Partition, Partitions
 from sage.combinat.permutation import Permutation
+from sage.misc.cachefunc import cached_function
 
 from sage.calculus.functional import derivative
 
@@ -14,6 +15,73 @@ from antisymmetric_utilities import *
 ##############################################################################
 
 
+@cached_function
+def young_idempotent_permutations(t, N):
+    r"""
+    Return the permutations of the row and column stabilizers of `t`
+    as index arrays acting on exponent vectors of length `N`.
+
+    INPUT::
+    - `t` -- a standard tableau with `n` cells
+    - `N` -- a multiple of `n`: the number of variables of the polynomial ring
+
+    OUTPUT: a pair ``(rows, columns)`` where ``rows`` is a tuple of
+    index arrays and ``columns`` a tuple of pairs ``(index array, sign)``.
+
+    An index array `s` encodes the action of a permutation `\sigma` of
+    the columns of the `N/n \times n` matrix of variables on exponent
+    vectors: the exponent vector `e` is mapped to `(e[s[k]])_k`.
+
+    This is computed once for all for each tableau and cached.
+
+    EXAMPLES::
+
+        sage: t = StandardTableau([[1,2],[3]])
+        sage: rows, columns = young_idempotent_permutations(t, 3)
+        sage: sorted(rows)
+        [(0, 1, 2), (1, 0, 2)]
+        sage: sorted(columns)
+        [((0, 1, 2), 1), ((2, 1, 0), -1)]
+        sage: rows, columns = young_idempotent_permutations(t, 6)
+        sage: sorted(rows)
+        [(0, 1, 2, 3, 4, 5), (1, 0, 2, 4, 3, 5)]
+    """
+    n = t.size()
+    def index_array(sigma):
+        source = [None] * N
+        for j in range(0, N, n):
+            for i in range(n):
+                source[sigma(i+1)-1+j] = i+j
+        return tuple(source)
+    rows = tuple(index_array(sigma) for sigma in t.row_stabilizer())
+    columns = tuple((index_array(sigma), sigma.sign()) for sigma in t.column_stabilizer())
+    return rows, columns
+
+def _act_on_terms(terms, permutations):
+    """
+    Return the dictionary of the sum of the images of ``terms`` under ``permutations``
+
+    INPUT::
+    - ``terms`` -- an iterable of pairs ``(exponent, coefficient)``
+    - ``permutations`` -- an iterable of pairs ``(index array, sign)``
+
+    See :func:`young_idempotent_permutations`.
+
+    EXAMPLES::
+
+        sage: sorted(_act_on_terms([((2,1,0), 3)], [((0,1,2), 1), ((1,0,2), -1)]).items())
+        [((1, 2, 0), -3), ((2, 1, 0), 3)]
+        sage: _act_on_terms([((1,1,0), 3)], [((0,1,2), 1), ((1,0,2), -1)])
+        {}
+    """
+    result = {}
+    for exponent, c in terms:
+        exponent = tuple(exponent)
+        for source, sign in permutations:
+            key = tuple([exponent[k] for k in source])
+            result[key] = result.get(key, 0) + sign * c
+    return {key: c for key, c in result.iteritems() if c}
+
 def apply_young_idempotent(p, t, use_antisymmetry=False):
     """
     Apply the Young idempotent indexed by `t` on the polynomial `p`
@@ -28,6 +96,12 @@ def apply_young_idempotent(p, t, use_antisymmetry=False):
     being associated to the `i`-th variable (starting at `i=1`)
     of the polynomial ring containing `p`.
 
+    The computation is done in the group algebra: the permutations of
+    the stabilizers are precomputed once for all for `t` (see
+    :func:`young_idempotent_permutations`), and act directly on the
+    exponent vectors of `p`; the terms are accumulated in a single
+    dictionary.
+
     .. TODO:: normalize result
 
     EXAMPLES::
@@ -56,6 +130,53 @@ def apply_young_idempotent(p, t, use_antisymmetry=False):
         sage: p = x*y*z^2
         sage: apply_young_idempotent(p, t)
         -2*x^2*y*z + 2*x*y*z^2
+
+    With several rows of variables, the permutations act
+    simultaneously on all rows::
+
+        sage: load("diagonal_polynomial_ring.py")
+        sage: P = DiagonalPolynomialRing(QQ, 3, 2)
+        sage: X = P.algebra_generators()
+        sage: p = X[0,0]^2*X[1,1]
+        sage: apply_young_idempotent(p, t) == _apply_young_idempotent_by_substitution(p, t)
+        True
+
+    Benchmark against the substitution based implementation::
+
+        sage: P = DiagonalPolynomialRing(QQ, 6, 2)                                # not tested
+        sage: X = P.algebra_generators()                                          # not tested
+        sage: p = X[0,0]^5*X[0,1]^4*X[0,2]^3*X[1,1]^2*X[1,3]                      # not tested
+        sage: for mu in Partitions(6):                                            # not tested
+        ....:     %timeit apply_young_idempotent(p, mu)
+        ....:     %timeit _apply_young_idempotent_by_substitution(p, mu)
+    """
+    if isinstance(t, Partition):
+        t = t.initial_tableau()
+    R = p.parent()
+    if t.size() == 1:
+        return p
+    rows, columns = young_idempotent_permutations(t, R.ngens())
+    d = _act_on_terms(p.dict().iteritems(), [(source, 1) for source in rows])
+    if use_antisymmetry:
+        antisymmetries = antisymmetries_of_tableau(t)
+        return antisymmetric_normal(R(d), t.size(), 1, antisymmetries)
+    return R(_act_on_terms(d.iteritems(), columns))
+
+def _apply_young_idempotent_by_substitution(p, t, use_antisymmetry=False):
+    """
+    Apply the Young idempotent indexed by `t` on the polynomial `p`
+    by substitution of the variables.
+
+    This is the former implementation of :func:`apply_young_idempotent`,
+    kept for testing and benchmarking purposes.
+
+    EXAMPLES::
+
+        sage: x,y,z = QQ['x,y,z'].gens()
+        sage: _apply_young_idempotent_by_substitution(x^2*y, Partition([2,1]))
+        x^2*y + x*y^2 - y^2*z - y*z^2
+        sage: _ == apply_young_idempotent(x^2*y, Partition([2,1]))
+        True
     """
     if isinstance(t, Partition):
         t = t.initial_tableau()
@@ -148,3 +269,98 @@ def make_deriv_comp_young2(X, k, mu):
     def f(p):
         return apply_young_idempotent(sum(X[i]*p.derivative(X[i],k) for i in range(0,len(X))), mu)
     return f
+
+def isotypic_split(p, n):
+    """
+    Return the nonzero projections of `p` on the `S_n` isotypic components.
+
+    INPUT:
+        - `p` -- a polynomial
+        - `n` -- an integer; the symmetric group `S_n` acts on the columns
+          of variables
+
+    OUTPUT: a list of pairs ``(nu, q)`` where `q` is the image of `p`
+    under the Young idempotent of the initial tableau of shape ``nu``
+
+    EXAMPLES::
+
+        sage: x,y,z = QQ['x,y,z'].gens()
+        sage: isotypic_split(x^2*y, 3)
+        [([3], x^2*y + x*y^2 + x^2*z + y^2*z + x*z^2 + y*z^2),
+         ([2, 1], x^2*y + x*y^2 - y^2*z - y*z^2),
+         ([1, 1, 1], x^2*y - x*y^2 - x^2*z + y^2*z + x*z^2 - y*z^2)]
+        sage: isotypic_split(x+y+z, 3)
+        [([3], 6*x + 6*y + 6*z)]
+    """
+    result = []
+    for nu in Partitions(n):
+        q = apply_young_idempotent(p, nu)
+        if q:
+            result.append((nu, q))
+    return result
+
+def make_deriv_comp_young_split(x, n, degree):
+    """
+    Return a function which corresponds to a partial derivative in `x`
+    composed with the projections on all isotypic components.
+
+    INPUT:
+        - `x` -- a variable for the derivation
+        - `n` -- an integer
+        - `degree` -- a function returning the degree of a polynomial
+
+    The returned function maps a polynomial `p` to the dictionary
+    ``{(degree(q), nu): [q]}`` where `q` runs through the nonzero
+    projections of the derivative of `p` (see :func:`isotypic_split`).
+    The derivative is computed only once for all isotypic components.
+
+    EXAMPLES::
+
+        sage: load("diagonal_polynomial_ring.py")
+        sage: P = DiagonalPolynomialRing(QQ,3,1)
+        sage: X = P.algebra_generators()
+        sage: f = make_deriv_comp_young_split(X[0,0], 3, P.multidegree)
+        sage: sorted(f(X[0,0]^2).items())
+        [(((1,), [2, 1]), [2*x00 - 2*x02]), (((1,), [3]), [4*x00 + 4*x01 + 4*x02])]
+    """
+    def f(p):
+        return _split_by_degree(derivative(p,x), n, degree)
+    return f
+
+def make_deriv_comp_young2_split(X, k, n, degree):
+    """
+    Return a function which corresponds to the operator $\sum_i X_i partial_{x_i}]^k$
+    composed with the projections on all isotypic components.
+
+    See :func:`make_deriv_comp_young_split` and :func:`make_deriv_comp_young2`.
+    """
+    def f(p):
+        return _split_by_degree(sum(X[i]*p.derivative(X[i],k) for i in range(0,len(X))), n, degree)
+    return f
+
+def _split_by_degree(p, n, degree):
+    """
+    Return the nonzero projections of `p` on the `S_n` isotypic components, by degree and shape.
+
+    INPUT:
+        - `p` -- a polynomial
+        - `n` -- an integer
+        - `degree` -- a function returning the degree of a polynomial
+
+    OUTPUT: a dictionary ``{(degree(q), nu): [q]}``, where ``(nu, q)``
+    runs through :func:`isotypic_split`; it is empty if `p` is zero
+
+    EXAMPLES::
+
+        sage: x,y,z = QQ['x,y,z'].gens()
+        sage: _split_by_degree(x+y+z, 3, lambda q: q.degree())
+        {(1, [3]): [6*x + 6*y + 6*z]}
+        sage: _split_by_degree(x-x, 3, lambda q: q.degree())
+        {}
+    """
+    result = {}
+    if not p:
+        return result
+    for nu, q in isotypic_split(p, n):
+        result.setdefault((degree(q), nu), []).append(q)
+    return result